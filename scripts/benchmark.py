@@ -1,147 +1,550 @@
-import time
-import shutil
-import random
-import string
+"""
+Benchmark suite: scan, dedupe, organize and cleanup scenarios over seeded
+synthetic trees, with JSON results and a regression check against a baseline.
+
+Usage:
+  python scripts/benchmark.py [--scenario NAME ...] [--repeat 3] [--scale 1.0]
+                              [--seed 1] [--output results.json]
+  python scripts/benchmark.py --compare baseline.json [--results results.json]
+                              [--threshold 0.15]
+
+Every run of a scenario builds its tree afresh from the seed in one child
+process and is measured in another, so peak RSS and I/O counters belong to
+that run alone (a child's peak RSS starts from its parent's at fork time,
+which is why the driver itself never holds the tree data).
+Reported per scenario (median over repeats):
+
+  wall_s, cpu_s     elapsed and CPU time; CPU includes reaped hash workers
+  peak_rss_kb       max resident set of the child or any of its workers
+  bytes_read        bytes returned by read() calls (/proc/self/io rchar)
+  disk_read_bytes   bytes actually fetched from storage (read_bytes)
+  syscalls          filesystem calls counted through Python-level wrappers in
+                    the measuring process, plus read/write syscall totals
+                    (syscr/syscw) that also cover hash workers
+
+Counters that the platform does not provide are reported as null. With
+--compare, a metric more than --threshold above the baseline is a regression
+and the exit status is 1.
+"""
+
+import argparse
+import builtins
+import gc
+import json
+import os
 import platform
-import matplotlib.pyplot as plt
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import replace
 from pathlib import Path
-from concurrent.futures import Executor
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
 from unittest.mock import patch
-from smart_file_organizer.container import ServiceContainer
-from smart_file_organizer.use_cases.scanner import DirectoryScanner
+
+from generate_tree import PROFILES, generate
+from scan_syscalls import COUNTS, CountingFileSystem, _counted
+from smart_file_organizer.core.entities import FileNode
+from smart_file_organizer.core.rules import DateRule, ExtensionRule
+from smart_file_organizer.core.table import FileTable
+from smart_file_organizer.infra.fs_real import RealFileSystem
+from smart_file_organizer.infra.hashing import HashService
 from smart_file_organizer.use_cases.dedupe import DuplicateFinder
+from smart_file_organizer.use_cases.organizer import Organizer
+from smart_file_organizer.use_cases.scanner import DirectoryScanner
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None  # type: ignore[assignment]
+
+FORMAT_VERSION = 1
+# Metrics checked by --compare; syscalls are compared by their total
+COMPARED = ("wall_s", "cpu_s", "peak_rss_kb", "bytes_read", "syscalls")
+# Differences below these are noise, whatever the ratio
+NOISE_FLOOR = {"wall_s": 0.01, "cpu_s": 0.01, "peak_rss_kb": 2048}
+EXTENSIONS = ("jpg", "png", "pdf", "txt", "mp4", "zip", "docx", "csv", "")
+
+
+# --- Syscall counting -----------------------------------------------------
+
+
+def counting_patches() -> List[Any]:
+    calls = {
+        "stat": "stat",
+        "lstat": "lstat",
+        "open": "open",
+        "rename": "rename",
+        "mkdir": "mkdir",
+        "rmdir": "rmdir",
+        "unlink": "unlink",
+        "remove": "unlink",
+    }
+    patches = [
+        patch(f"os.{fn}", _counted(name, getattr(os, fn))) for fn, name in calls.items()
+    ]
+    patches.append(patch("builtins.open", _counted("open", builtins.open)))
+    return patches
+
+
+def read_proc_io() -> Dict[str, int]:
+    """This process's I/O counters, including reaped children (Linux only)."""
+    try:
+        with open("/proc/self/io") as f:
+            return {k: int(v) for k, v in (line.split(":") for line in f)}
+    except OSError:
+        return {}
 
-# --- Configuration ---
-ROOT_DIR = Path("./benchmark_data")
-FILE_COUNT = 5000
-FILE_SIZE_KB = 50
 
+def child_usage() -> Any:
+    return resource.getrusage(resource.RUSAGE_CHILDREN) if resource else None
 
-def get_system_info():
-    """Retrieves basic system information for the graph."""
-    try:
-        info = f"OS: {platform.system()} {platform.release()}"
-        info += f"\nMachine: {platform.machine()}"
-        info += f"\nProcessor: {platform.processor() or 'Unknown'}"
-        info += f"\nPython: {platform.python_version()}"
-        return info
-    except Exception:
-        return "System Info Unavailable"
-
-
-def generate_dummy_data():
-    if ROOT_DIR.exists():
-        shutil.rmtree(ROOT_DIR)
-    ROOT_DIR.mkdir()
-
-    print(f"Generating {FILE_COUNT} files...")
-    content = b"A" * (FILE_SIZE_KB * 1024)
-
-    # Create some duplicates
-    for i in range(FILE_COUNT):
-        p = ROOT_DIR / f"file_{i}.dat"
-        # Make every 10th file a duplicate of the previous one
-        if i > 0 and i % 10 == 0:
-            shutil.copy(ROOT_DIR / f"file_{i-1}.dat", p)
+
+# --- Tree builders --------------------------------------------------------
+
+
+def write_files(folder: Path, count: int, rng: random.Random, prefix: str) -> None:
+    folder.mkdir(parents=True, exist_ok=True)
+    for i in range(count):
+        ext = rng.choice(EXTENSIONS)
+        name = f"{prefix}{i}.{ext}" if ext else f"{prefix}{i}"
+        (folder / name).write_bytes(b"x" * rng.randrange(0, 64))
+
+
+def build_flat(root: Path, rng: random.Random, scale: float) -> None:
+    write_files(root, int(20000 * scale), rng, "file")
+
+
+def build_deep(root: Path, rng: random.Random, scale: float) -> None:
+    folder = root
+    for level in range(max(1, int(200 * scale))):
+        folder = folder / f"level{level}"
+        write_files(folder, 25, rng, "file")
+
+
+def build_wide(root: Path, rng: random.Random, scale: float) -> None:
+    for d in range(max(1, int(2000 * scale))):
+        write_files(root / f"group{d % 40}" / f"dir{d}", 10, rng, "file")
+
+
+def build_duplicates(
+    root: Path,
+    rng: random.Random,
+    files: int,
+    size: int,
+    duplicate_ratio: float,
+) -> None:
+    """
+    Files of one size, so every one survives size grouping; duplicate_ratio
+    of them copy an earlier file, the rest differ only in their last bytes.
+    """
+    root.mkdir(parents=True, exist_ok=True)
+    base = rng.randbytes(size - 8)
+    written: List[Path] = []
+    for i in range(files):
+        path = root / f"dir{i % 50}" / f"blob{i}.dat"
+        path.parent.mkdir(exist_ok=True)
+        if written and rng.random() < duplicate_ratio:
+            shutil.copyfile(rng.choice(written), path)
         else:
-            # Add random suffix to ensure uniqueness otherwise
-            suffix = "".join(random.choices(string.ascii_letters, k=10)).encode()
-            p.write_bytes(content + suffix)
+            path.write_bytes(base + i.to_bytes(8, "little"))
+            written.append(path)
 
 
-def run_dedupe(parallel: bool) -> float:
-    container = ServiceContainer(dry_run=True)
-    scanner = DirectoryScanner(container.fs)
-    files = list(scanner.scan(ROOT_DIR))
+def build_realistic(root: Path, rng: random.Random, scale: float) -> None:
+    """Heavy-tailed sizes, nesting, duplicates and hardlinks (sparse files)."""
+    profile = PROFILES["realistic"]
+    profile = replace(profile, files=max(2, int(profile.files * scale)))
+    generate(root, profile, seed=rng.randrange(2**31))
 
-    start = time.time()
 
-    if parallel:
-        # Run normally (uses ProcessPoolExecutor)
-        finder = DuplicateFinder(container.hasher)
-        finder.find_duplicates(files)
-    else:
-        # Force serial execution by patching ProcessPoolExecutor
-        class SerialExecutor(Executor):
-            def map(self, fn, *iterables, **kwargs):
-                return map(fn, *iterables)
+def build_cleanup(root: Path, rng: random.Random, scale: float) -> None:
+    for d in range(max(1, int(3000 * scale))):
+        folder = root / f"a{d % 10}" / f"b{d % 100}" / f"c{d}"
+        folder.mkdir(parents=True, exist_ok=True)
+        if rng.random() < 0.1:
+            (folder / "keep.txt").write_bytes(b"x")
 
-            def shutdown(self, wait=True):
-                pass
 
-        with patch(
-            "smart_file_organizer.use_cases.dedupe.ProcessPoolExecutor",
-            return_value=SerialExecutor(),
-        ):
-            finder = DuplicateFinder(container.hasher)
-            finder.find_duplicates(files)
+# --- Scenarios ------------------------------------------------------------
 
-    return time.time() - start
 
+class Scenario(NamedTuple):
+    description: str
+    build: Callable[[Path, random.Random, float], None]
+    # Unmeasured preparation in the child; its result is passed to run()
+    prepare: Callable[[Path, RealFileSystem], Any]
+    run: Callable[[Path, RealFileSystem, Any], None]
 
-def plot_results(serial_time, parallel_time):
-    labels = ["Serial", "Parallel"]
-    times = [serial_time, parallel_time]
 
-    sys_info = get_system_info()
+def no_prepare(root: Path, fs: RealFileSystem) -> Any:
+    return None
 
-    plt.figure(figsize=(10, 6))
-    bars = plt.bar(labels, times, color=["#ff9999", "#66b3ff"])
 
-    plt.ylabel("Time (seconds)")
-    plt.title(
-        f"Deduplication Performance ({FILE_COUNT} files @ {FILE_SIZE_KB}KB)",
-        fontsize=14,
-    )
+def run_scan(root: Path, fs: RealFileSystem, state: Any) -> None:
+    for _ in DirectoryScanner(fs).scan(root):
+        pass
 
-    # Add text labels on top of bars
-    for bar in bars:
-        yval = bar.get_height()
-        plt.text(
-            bar.get_x() + bar.get_width() / 2,
-            yval + 0.05,
-            f"{yval:.2f}s",
-            ha="center",
-            va="bottom",
-            fontweight="bold",
-        )
 
-    # Add system info box
-    plt.figtext(
-        0.15,
-        0.02,
-        sys_info,
-        fontsize=9,
-        bbox={"facecolor": "orange", "alpha": 0.2, "pad": 5},
-    )
+def scan_files(root: Path, fs: RealFileSystem) -> Any:
+    return list(DirectoryScanner(fs).scan(root))
 
-    # Adjust layout to make room for text
-    plt.subplots_adjust(bottom=0.2)
 
-    plt.savefig("benchmark_result.png")
-    print("Graph saved to benchmark_result.png")
+def run_dedupe(root: Path, fs: RealFileSystem, files: Any) -> None:
+    DuplicateFinder(HashService()).find_duplicates(files)
 
 
-def main():
-    try:
-        generate_dummy_data()
+def run_organize_plan(root: Path, fs: RealFileSystem, files: Any) -> None:
+    Organizer(fs).plan_organization(files, ExtensionRule(), root)
 
-        print("Running Serial Benchmark...")
-        t_serial = run_dedupe(parallel=False)
-        print(f"Serial Time: {t_serial:.2f}s")
 
-        print("Running Parallel Benchmark...")
-        t_parallel = run_dedupe(parallel=True)
-        print(f"Parallel Time: {t_parallel:.2f}s")
+def plan_organize(root: Path, fs: RealFileSystem) -> Any:
+    organizer = Organizer(fs, workers=4)
+    return organizer, organizer.plan_organization(
+        scan_files(root, fs), ExtensionRule(), root
+    )
 
-        speedup = t_serial / t_parallel
-        print(f"Speedup: {speedup:.2f}x")
 
-        plot_results(t_serial, t_parallel)
+def run_organize_execute(root: Path, fs: RealFileSystem, state: Any) -> None:
+    organizer, plan = state
+    organizer.execute_plan(plan)
+
+
+def run_cleanup(root: Path, fs: RealFileSystem, state: Any) -> None:
+    Organizer(fs).cleanup_empty_dirs(root)
+
+
+def mtimes_build(rows: int) -> Callable[[Path, random.Random, float], None]:
+    """No files on disk: only the row count and seed for mtime_table."""
+
+    def build(root: Path, rng: random.Random, scale: float) -> None:
+        root.mkdir(parents=True, exist_ok=True)
+        count = max(1, int(rows * scale))
+        (root / "rows").write_text(f"{count} {rng.randrange(2**31)}")
+
+    return build
+
+
+def mtime_table(root: Path, fs: RealFileSystem) -> Any:
+    """An in-memory scan result with mtimes spread over twenty years."""
+    count, seed = map(int, (root / "rows").read_text().split())
+    rng = random.Random(seed)
+    table = FileTable()
+    for i in range(count):
+        table.append(str(root), f"f{i}", 0, rng.uniform(1.1e9, 1.73e9))
+    return table
+
+
+def run_date_batch(root: Path, fs: RealFileSystem, table: Any) -> None:
+    DateRule().get_destinations(table, root)
+
+
+def run_date_single(root: Path, fs: RealFileSystem, table: Any) -> None:
+    # One node per file, as planning did before the batch API
+    rule, path = DateRule(), root / "f"
+    for mtime in table.mtimes:
+        rule.get_destination(FileNode(path, 0, mtime), root)
+
+
+def dedupe_build(
+    files: int, size: int, ratio: float
+) -> Callable[[Path, random.Random, float], None]:
+    def build(root: Path, rng: random.Random, scale: float) -> None:
+        build_duplicates(root, rng, max(2, int(files * scale)), size, ratio)
+
+    return build
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    "scan-flat": Scenario(
+        "20k files in one directory", build_flat, no_prepare, run_scan
+    ),
+    "scan-deep": Scenario(
+        "200 nested levels of 25 files", build_deep, no_prepare, run_scan
+    ),
+    "scan-wide": Scenario(
+        "2000 directories of 10 files", build_wide, no_prepare, run_scan
+    ),
+    "dedupe-small-10": Scenario(
+        "5000 x 4 KiB files, 10% duplicates",
+        dedupe_build(5000, 4096, 0.1),
+        scan_files,
+        run_dedupe,
+    ),
+    "dedupe-small-50": Scenario(
+        "5000 x 4 KiB files, 50% duplicates",
+        dedupe_build(5000, 4096, 0.5),
+        scan_files,
+        run_dedupe,
+    ),
+    "dedupe-large-50": Scenario(
+        "24 x 16 MiB files, 50% duplicates",
+        dedupe_build(24, 16 * 1024 * 1024, 0.5),
+        scan_files,
+        run_dedupe,
+    ),
+    "organize-plan": Scenario(
+        "plan 20k files by extension", build_flat, scan_files, run_organize_plan
+    ),
+    "organize-execute": Scenario(
+        "move 2000 directories of 10 files into place",
+        build_wide,
+        plan_organize,
+        run_organize_execute,
+    ),
+    "scan-realistic": Scenario(
+        "10k files of the 'realistic' generator profile",
+        build_realistic,
+        no_prepare,
+        run_scan,
+    ),
+    "dedupe-realistic": Scenario(
+        "10k files of the 'realistic' generator profile",
+        build_realistic,
+        scan_files,
+        run_dedupe,
+    ),
+    "date-rule-5m": Scenario(
+        "bucket 5M mtimes into months with DateRule.get_destinations",
+        mtimes_build(5_000_000),
+        mtime_table,
+        run_date_batch,
+    ),
+    "date-rule-5m-single": Scenario(
+        "the same 5M mtimes, one get_destination call per file",
+        mtimes_build(5_000_000),
+        mtime_table,
+        run_date_single,
+    ),
+    "cleanup": Scenario(
+        "remove 3000 nested directories, 10% non-empty",
+        build_cleanup,
+        no_prepare,
+        run_cleanup,
+    ),
+}
+
+
+# --- Measurement ----------------------------------------------------------
+
+
+def measure(name: str, root: Path) -> Dict[str, Any]:
+    """Runs one scenario over a built tree in this process and measures it."""
+    scenario = SCENARIOS[name]
+    # DirEntry stats are counted with the os.lstat() calls
+    fs = CountingFileSystem(entry_stat_key="lstat")
+    state = scenario.prepare(root, fs)
+    gc.collect()
+
+    COUNTS.clear()
+    patches = counting_patches()
+    io_before, children_before = read_proc_io(), child_usage()
+    cpu_before = time.process_time()
+    for p in patches:
+        p.start()
+    try:
+        start = time.perf_counter()
+        with open(os.devnull, "w") as quiet, patch("sys.stdout", quiet):
+            scenario.run(root, fs, state)
+        wall = time.perf_counter() - start
+    finally:
+        for p in reversed(patches):
+            p.stop()
+    cpu = time.process_time() - cpu_before
+    io_after, children_after = read_proc_io(), child_usage()
+
+    peak_rss: Optional[int] = None
+    if resource is not None:
+        cpu += (children_after.ru_utime - children_before.ru_utime) + (
+            children_after.ru_stime - children_before.ru_stime
+        )
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        unit = 1024 if sys.platform == "darwin" else 1
+        peak_rss = (
+            max(
+                resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                children_after.ru_maxrss,
+            )
+            // unit
+        )
 
+    def io_delta(key: str) -> Optional[int]:
+        if key not in io_before:
+            return None
+        return io_after[key] - io_before[key]
+
+    syscalls: Dict[str, Optional[int]] = dict(sorted(COUNTS.items()))
+    syscalls["read"] = io_delta("syscr")
+    syscalls["write"] = io_delta("syscw")
+    return {
+        "wall_s": wall,
+        "cpu_s": cpu,
+        "peak_rss_kb": peak_rss,
+        "bytes_read": io_delta("rchar"),
+        "disk_read_bytes": io_delta("read_bytes"),
+        "syscalls": syscalls,
+    }
+
+
+def run_once(name: str, scale: float, seed: int) -> Dict[str, Any]:
+    """Builds a fresh tree and measures the scenario on it, each in a child."""
+    workdir = Path(tempfile.mkdtemp(prefix=f"bench_{name}_")).resolve()
+    try:
+        root, out = workdir / "tree", workdir / "result.json"
+        for step in (
+            ["--build", name, str(root), str(scale), str(seed)],
+            ["--measure", name, str(root), str(out)],
+        ):
+            subprocess.run(
+                [sys.executable, __file__, *step],
+                check=True,
+                stdout=subprocess.DEVNULL,
+            )
+        result: Dict[str, Any] = json.loads(out.read_text())
+        return result
     finally:
-        if ROOT_DIR.exists():
-            shutil.rmtree(ROOT_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def median(values: List[Any]) -> Any:
+    present = [v for v in values if v is not None]
+    return statistics.median(present) if present else None
+
+
+def summarize(samples: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Median of each metric; syscall counts are medians per call."""
+    calls = sorted({k for s in samples for k in s["syscalls"]})
+    return {
+        "runs": len(samples),
+        "wall_s": median([s["wall_s"] for s in samples]),
+        "wall_s_min": min(s["wall_s"] for s in samples),
+        "wall_s_max": max(s["wall_s"] for s in samples),
+        "cpu_s": median([s["cpu_s"] for s in samples]),
+        "peak_rss_kb": median([s["peak_rss_kb"] for s in samples]),
+        "bytes_read": median([s["bytes_read"] for s in samples]),
+        "disk_read_bytes": median([s["disk_read_bytes"] for s in samples]),
+        "syscalls": {c: median([s["syscalls"].get(c) for s in samples]) for c in calls},
+    }
+
+
+def run_suite(names: List[str], repeat: int, scale: float, seed: int) -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+    for name in names:
+        samples = [run_once(name, scale, seed) for _ in range(repeat)]
+        results[name] = summarize(samples)
+        print_result(name, results[name])
+    return {
+        "version": FORMAT_VERSION,
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "repeat": repeat,
+            "scale": scale,
+            "seed": seed,
+        },
+        "scenarios": results,
+    }
+
+
+# --- Reporting ------------------------------------------------------------
+
+
+def total_syscalls(result: Dict[str, Any]) -> Optional[float]:
+    counts = [v for v in result["syscalls"].values() if v is not None]
+    return sum(counts) if counts else None
+
+
+def metric(result: Dict[str, Any], key: str) -> Optional[float]:
+    value = total_syscalls(result) if key == "syscalls" else result.get(key)
+    return None if value is None else float(value)
+
+
+def print_result(name: str, result: Dict[str, Any]) -> None:
+    rss = result["peak_rss_kb"]
+    read = result["bytes_read"]
+    print(
+        f"{name:<20} wall {result['wall_s']:8.3f}s  cpu {result['cpu_s']:8.3f}s  "
+        f"rss {rss / 1024 if rss else 0:7.1f} MB  "
+        f"read {read / (1024 * 1024) if read else 0:9.1f} MB  "
+        f"syscalls {total_syscalls(result) or 0:>9.0f}"
+    )
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float) -> int:
+    """Prints each compared metric's change; returns the regression count."""
+    regressions = 0
+    for name, result in current["scenarios"].items():
+        base = baseline["scenarios"].get(name)
+        if base is None:
+            print(f"{name}: not in baseline")
+            continue
+        for key in COMPARED:
+            old, new = metric(base, key), metric(result, key)
+            if old is None or new is None:
+                continue
+            change = (new - old) / old if old else (1.0 if new else 0.0)
+            regressed = change > threshold and new - old > NOISE_FLOOR.get(key, 0)
+            regressions += regressed
+            flag = "  REGRESSION" if regressed else ""
+            print(
+                f"{name:<20} {key:<12} {old:>14.3f} -> {new:>14.3f} "
+                f"({change:+.1%}){flag}"
+            )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS))
+    parser.add_argument("--list", action="store_true", help="List scenarios")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", type=Path, help="Write JSON results here")
+    parser.add_argument("--compare", type=Path, help="Baseline JSON to check")
+    parser.add_argument("--results", type=Path, help="Compare these results")
+    parser.add_argument("--threshold", type=float, default=0.15)
+    parser.add_argument("--build", nargs=4, help=argparse.SUPPRESS)
+    parser.add_argument("--measure", nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.build:
+        name, root, scale, seed = args.build
+        rng = random.Random(f"{seed}:{name}")
+        SCENARIOS[name].build(Path(root), rng, float(scale))
+        return
+    if args.measure:
+        name, root, out = args.measure
+        Path(out).write_text(json.dumps(measure(name, Path(root))))
+        return
+    if args.list:
+        for name, scenario in SCENARIOS.items():
+            print(f"{name:<20} {scenario.description}")
+        return
+
+    if args.results:
+        current = json.loads(args.results.read_text())
+    else:
+        names = args.scenario or list(SCENARIOS)
+        current = run_suite(names, max(1, args.repeat), args.scale, args.seed)
+    if args.output:
+        args.output.write_text(json.dumps(current, indent=2) + "\n")
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())
+        for key in ("scale", "seed"):
+            if baseline["meta"].get(key) != current["meta"].get(key):
+                print(f"Warning: baseline {key} differs; numbers are not comparable")
+        regressions = compare(baseline, current, args.threshold)
+        print(f"{regressions} regression(s) above {args.threshold:.0%}")
+        sys.exit(1 if regressions else 0)
 
 
 if __name__ == "__main__":
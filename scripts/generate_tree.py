@@ -0,0 +1,293 @@
+"""
+Seeded synthetic file tree generator for benchmarks at production scale.
+
+Usage:
+  python scripts/generate_tree.py DEST [--profile realistic] [--files N]
+                                  [--seed 1] [--workers 4] [--dense]
+  python scripts/generate_tree.py DEST --profile-file my_profile.json
+  python scripts/generate_tree.py --list
+
+A profile describes the tree's shape (depth, fan-out, files per directory),
+its heavy-tailed size distribution, and how many files are exact duplicates,
+near duplicates (same size and leading bytes, different content further in)
+or hardlinks. The same profile and seed always produce the same tree,
+whatever the worker count.
+
+Content is derived from a per-file token rather than stored, so duplicates
+are written, not copied. Files at or above the profile's sparse threshold
+only get their first and last blocks (plus any near-duplicate marker)
+written; the rest is a hole, so a multi-terabyte apparent tree fits in a
+few gigabytes. Pass --dense to write every byte when disk reads matter.
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, replace
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+# Bytes at each end of a file that are always written; matches the dedupe
+# prefilter's sample size so near duplicates share their whole head sample.
+BLOCK = 4096
+# Files are split over a fixed number of shards, each with its own random
+# stream, so the output does not depend on how many workers fill them.
+SHARDS = 64
+# Dense files are written in pieces of this size
+CHUNK = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class Profile:
+    files: int = 10_000
+    # Directory shape: no directory is deeper than max_depth below the
+    # root or has more than fanout subdirectories.
+    max_depth: int = 6
+    fanout: int = 8
+    files_per_dir: int = 50
+    # Log-normal sizes: half of all files are below size_median
+    size_median: int = 16 * 1024
+    size_sigma: float = 2.0
+    max_size: int = 4 * 1024**3
+    empty_ratio: float = 0.01
+    duplicate_ratio: float = 0.1
+    near_duplicate_ratio: float = 0.05
+    hardlink_ratio: float = 0.01
+    sparse_threshold: int = 64 * 1024
+    extensions: Tuple[str, ...] = (
+        "jpg", "png", "pdf", "txt", "log", "mp4", "zip", "docx", "csv", "",
+    )  # fmt: skip
+
+
+PROFILES: Dict[str, Profile] = {
+    "small": Profile(files=1_000, max_depth=3, fanout=4, files_per_dir=20),
+    "realistic": Profile(),
+    "media": Profile(
+        files=20_000,
+        size_median=4 * 1024 * 1024,
+        size_sigma=1.5,
+        max_size=64 * 1024**3,
+        duplicate_ratio=0.2,
+        extensions=("jpg", "raw", "mp4", "mov", "heic"),
+    ),
+    "million": Profile(files=1_000_000, max_depth=8, fanout=12, files_per_dir=100),
+}
+
+
+@dataclass
+class TreeStats:
+    files: int = 0
+    dirs: int = 0
+    duplicates: int = 0
+    near_duplicates: int = 0
+    hardlinks: int = 0
+    apparent_bytes: int = 0
+    written_bytes: int = 0
+    seconds: float = 0.0
+
+    def add(self, other: "TreeStats") -> None:
+        for name in ("files", "duplicates", "near_duplicates", "hardlinks"):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        self.apparent_bytes += other.apparent_bytes
+        self.written_bytes += other.written_bytes
+
+
+def load_profile(path: Path) -> Profile:
+    """Reads a profile from JSON; missing fields keep their defaults."""
+    data = json.loads(path.read_text())
+    if "extensions" in data:
+        data["extensions"] = tuple(data["extensions"])
+    return Profile(**data)
+
+
+def plan_directories(profile: Profile, rng: random.Random) -> List[str]:
+    """
+    Relative directory paths, parents first. Each new directory hangs off a
+    random one that still has room, so the tree grows both wide and deep.
+    """
+    count = max(1, math.ceil(profile.files / max(1, profile.files_per_dir)))
+    dirs = [""]
+    depth = [0]
+    children = [0]
+    # Directories that may still take a child; swap-removed when full
+    open_dirs = [0] if profile.max_depth > 0 else []
+    while len(dirs) < count and open_dirs:
+        slot = rng.randrange(len(open_dirs))
+        parent = open_dirs[slot]
+        children[parent] += 1
+        if children[parent] >= profile.fanout:
+            open_dirs[slot] = open_dirs[-1]
+            open_dirs.pop()
+
+        index = len(dirs)
+        name = f"d{children[parent]:03d}"
+        dirs.append(os.path.join(dirs[parent], name) if dirs[parent] else name)
+        depth.append(depth[parent] + 1)
+        children.append(0)
+        if depth[index] < profile.max_depth:
+            open_dirs.append(index)
+    return dirs
+
+
+def file_content(
+    size: int, token: int, marker: int, sparse_threshold: int
+) -> Iterator[Tuple[int, bytes]]:
+    """
+    (offset, data) pieces making up a file. The token fixes the head and
+    tail blocks, so equal tokens and sizes mean equal files; a non-zero
+    marker overwrites 16 bytes past the head block to make a near duplicate.
+    """
+    stream = random.Random(token)
+    if size < max(sparse_threshold, 2 * BLOCK + 1):
+        for offset in range(0, size, CHUNK):
+            yield offset, stream.randbytes(min(CHUNK, size - offset))
+    else:
+        yield 0, stream.randbytes(BLOCK)
+        yield size - BLOCK, stream.randbytes(BLOCK)
+    if marker and size > BLOCK + 16:
+        offset = random.Random(marker).randrange(BLOCK, size - 16)
+        yield offset, (marker % 2**128).to_bytes(16, "little")
+
+
+def write_file(path: str, size: int, pieces: Iterator[Tuple[int, bytes]]) -> int:
+    written = 0
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        if size:
+            os.ftruncate(fd, size)  # Everything not written stays a hole
+        for offset, data in pieces:
+            written += os.pwrite(fd, data, offset)
+    finally:
+        os.close(fd)
+    return written
+
+
+def draw_size(profile: Profile, rng: random.Random) -> int:
+    if rng.random() < profile.empty_ratio:
+        return 0
+    size = rng.lognormvariate(math.log(max(1, profile.size_median)), profile.size_sigma)
+    return max(1, min(profile.max_size, int(size)))
+
+
+def fill_shard(
+    dest: str, profile: Profile, dirs: List[str], shard: int, seed: int
+) -> TreeStats:
+    """Creates every file of one shard; references never cross shards."""
+    rng = random.Random(f"{seed}:shard:{shard}")
+    stats = TreeStats()
+    # (size, token) of files written so far, and their paths for hardlinks
+    originals: List[Tuple[int, int]] = []
+    written: List[str] = []
+    token_base = (seed << 40) + (shard << 32)
+
+    for index in range(shard, profile.files, SHARDS):
+        directory = os.path.join(dest, rng.choice(dirs))
+        ext = rng.choice(profile.extensions)
+        name = f"f{index:08d}.{ext}" if ext else f"f{index:08d}"
+        path = os.path.join(directory, name)
+
+        roll = rng.random()
+        if written and roll < profile.hardlink_ratio:
+            os.link(rng.choice(written), path)
+            stats.hardlinks += 1
+            continue
+        roll -= profile.hardlink_ratio
+        marker = 0
+        if originals and roll < profile.duplicate_ratio:
+            size, token = rng.choice(originals)
+            stats.duplicates += 1
+        elif (
+            originals and roll < profile.duplicate_ratio + profile.near_duplicate_ratio
+        ):
+            size, token = rng.choice(originals)
+            if size > BLOCK + 16:
+                marker = token_base + index + 1
+                stats.near_duplicates += 1
+            else:  # Too small to differ past the head: an exact copy
+                stats.duplicates += 1
+        else:
+            size, token = draw_size(profile, rng), token_base + index
+            originals.append((size, token))
+
+        stats.written_bytes += write_file(
+            path, size, file_content(size, token, marker, profile.sparse_threshold)
+        )
+        stats.apparent_bytes += size
+        stats.files += 1
+        written.append(path)
+    return stats
+
+
+def generate(
+    dest: Path, profile: Profile, seed: int = 1, workers: int = 1
+) -> TreeStats:
+    """Builds the tree under dest (created if missing) and returns its stats."""
+    start = time.perf_counter()
+    dirs = plan_directories(profile, random.Random(f"{seed}:dirs"))
+    for directory in dirs:
+        os.makedirs(os.path.join(dest, directory), exist_ok=True)
+
+    stats = TreeStats(dirs=len(dirs))
+    shards = range(min(SHARDS, max(1, profile.files)))
+    args = (str(dest), profile, dirs)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(fill_shard, *args, s, seed) for s in shards]
+            for future in futures:
+                stats.add(future.result())
+    else:
+        for shard in shards:
+            stats.add(fill_shard(*args, shard, seed))
+    stats.seconds = time.perf_counter() - start
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("dest", type=Path, nargs="?")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="realistic")
+    parser.add_argument("--profile-file", type=Path, help="JSON profile")
+    parser.add_argument("--files", type=int, help="Override the file count")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--dense", action="store_true", help="No sparse files")
+    parser.add_argument("--list", action="store_true", help="Show profiles")
+    args = parser.parse_args()
+
+    if args.list:
+        for name, profile in PROFILES.items():
+            print(f"{name}: {json.dumps(asdict(profile))}")
+        return
+    if args.dest is None:
+        parser.error("DEST is required")
+    if args.dest.exists() and any(args.dest.iterdir()):
+        sys.exit(f"Refusing to generate into non-empty {args.dest}")
+
+    profile = (
+        load_profile(args.profile_file) if args.profile_file else PROFILES[args.profile]
+    )
+    if args.files is not None:
+        profile = replace(profile, files=args.files)
+    if args.dense:
+        profile = replace(profile, sparse_threshold=profile.max_size + 1)
+
+    stats = generate(args.dest, profile, args.seed, args.workers)
+    print(
+        f"Generated {stats.files} files and {stats.hardlinks} hardlinks in "
+        f"{stats.dirs} directories in {stats.seconds:.1f}s "
+        f"({stats.files / stats.seconds if stats.seconds else 0:.0f} files/s)"
+    )
+    print(
+        f"  {stats.duplicates} duplicates, {stats.near_duplicates} near duplicates; "
+        f"{stats.apparent_bytes / 1024**3:.2f} GiB apparent, "
+        f"{stats.written_bytes / 1024**3:.2f} GiB written"
+    )
+
+
+if __name__ == "__main__":
+    main()
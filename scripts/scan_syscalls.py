@@ -0,0 +1,152 @@
+"""
+Counts filesystem syscalls per file for the legacy recursive scanner (which
+resolved every file path) and the current explicit-stack scanner.
+
+Usage: python scripts/scan_syscalls.py [--dirs 200] [--files-per-dir 50] [--depth 4]
+
+Python-level wrappers are used instead of strace so the script runs anywhere:
+os.stat/os.lstat/os.readlink calls (what Path.resolve() issues) are counted
+directly, and DirEntry.stat() is counted through a proxy entry. Each
+scandir() is counted as one open + getdents sequence.
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable, Iterator, List
+from unittest.mock import patch
+
+from smart_file_organizer.core.entities import FileNode
+from smart_file_organizer.infra.fs_real import RealFileSystem
+from smart_file_organizer.use_cases.scanner import DirectoryScanner
+
+COUNTS: Counter = Counter()
+
+
+class CountingEntry:
+    """DirEntry proxy: stat() hits the disk once, later calls use its cache."""
+
+    def __init__(self, entry: "os.DirEntry[str]", stat_key: str = "lstat (DirEntry)"):
+        self._entry = entry
+        self._statted = False
+        self._stat_key = stat_key
+        self.name = entry.name
+        self.path = entry.path
+
+    def is_dir(self, follow_symlinks: bool = True) -> bool:
+        return self._entry.is_dir(follow_symlinks=follow_symlinks)
+
+    def is_file(self, follow_symlinks: bool = True) -> bool:
+        return self._entry.is_file(follow_symlinks=follow_symlinks)
+
+    def is_symlink(self) -> bool:
+        return self._entry.is_symlink()
+
+    def stat(self, follow_symlinks: bool = True) -> os.stat_result:
+        if not self._statted:
+            COUNTS[self._stat_key] += 1
+            self._statted = True
+        return self._entry.stat(follow_symlinks=follow_symlinks)
+
+    def inode(self) -> int:
+        return self._entry.inode()
+
+
+class CountingFileSystem(RealFileSystem):
+    """Counts scandir() calls and, under `entry_stat_key`, DirEntry stats."""
+
+    def __init__(self, entry_stat_key: str = "lstat (DirEntry)"):
+        super().__init__()
+        self.entry_stat_key = entry_stat_key
+
+    def scandir(self, path: Path) -> Iterator[Any]:  # type: ignore[override]
+        COUNTS["scandir"] += 1
+        return (CountingEntry(e, self.entry_stat_key) for e in super().scandir(path))
+
+
+def _counted(name: str, fn: Callable[..., Any]) -> Callable[..., Any]:
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        COUNTS[name] += 1
+        return fn(*args, **kwargs)
+
+    return wrapper
+
+
+def legacy_scan(scanner: DirectoryScanner, path: Path) -> Iterator[FileNode]:
+    """The original recursive walk, kept here as the baseline."""
+    for entry in scanner.fs.scandir(path):
+        if entry.is_dir(follow_symlinks=False):
+            yield from legacy_scan(scanner, Path(entry.path))
+        elif entry.is_file(follow_symlinks=False):
+            stat = entry.stat()
+            yield FileNode(
+                path=Path(entry.path).resolve(),
+                size=stat.st_size,
+                mtime=stat.st_mtime,
+            )
+
+
+def build_tree(root: Path, dirs: int, files_per_dir: int, depth: int) -> int:
+    count = 0
+    for d in range(dirs):
+        parts = [f"level{i}_{d % (i + 2)}" for i in range(depth)]
+        folder = root.joinpath(*parts, f"dir{d}")
+        folder.mkdir(parents=True, exist_ok=True)
+        for f in range(files_per_dir):
+            (folder / f"file{f}.dat").write_bytes(b"x")
+            count += 1
+    return count
+
+
+def measure(label: str, walk: Callable[[], List[FileNode]], files: int) -> None:
+    COUNTS.clear()
+    with patch("os.stat", _counted("stat", os.stat)), patch(
+        "os.lstat", _counted("lstat", os.lstat)
+    ), patch("os.readlink", _counted("readlink", os.readlink)):
+        start = time.perf_counter()
+        found = walk()
+        elapsed = time.perf_counter() - start
+
+    assert len(found) == files, f"{label}: found {len(found)} of {files} files"
+    total = sum(COUNTS.values())
+    print(f"\n{label}")
+    for name, value in sorted(COUNTS.items()):
+        print(f"  {name:<18} {value:>9}  ({value / files:.2f}/file)")
+    print(f"  {'total':<18} {total:>9}  ({total / files:.2f}/file)")
+    print(f"  wall time          {elapsed:.3f}s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--dirs", type=int, default=200)
+    parser.add_argument("--files-per-dir", type=int, default=50)
+    parser.add_argument("--depth", type=int, default=4)
+    args = parser.parse_args()
+
+    root = Path(tempfile.mkdtemp(prefix="scan_syscalls_")).resolve()
+    try:
+        files = build_tree(root, args.dirs, args.files_per_dir, args.depth)
+        depth = len(root.parts) + args.depth + 1
+        print(f"Tree: {files} files at path depth ~{depth} under {root}")
+
+        scanner = DirectoryScanner(CountingFileSystem())
+        measure(
+            "Before: recursive scan with Path.resolve() per file",
+            lambda: list(legacy_scan(scanner, root)),
+            files,
+        )
+        measure(
+            "After: explicit-stack scan joined from the resolved root",
+            lambda: list(scanner._iterative_scan(root)),
+            files,
+        )
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
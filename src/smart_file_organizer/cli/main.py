@@ -1,13 +1,37 @@
 import argparse
+import os
 import sys
+import tempfile
+import time
 import logging
 import logging.handlers
 from pathlib import Path
+from typing import Dict, List, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 from ..container import ServiceContainer
-from ..core.rules import DateRule, ExtensionRule, OrganizationRule
+from ..core.entities import ChangeType
+from ..core.rules import ContentTypeRule, DateRule, ExtensionRule, OrganizationRule
+from ..core.rule_engine import parse_size
+from ..core.table import FileTable
 from ..use_cases.organizer import Organizer
 from ..use_cases.scanner import DirectoryScanner
-from ..use_cases.dedupe import DuplicateFinder
+from ..use_cases.similarity import (
+    DEFAULT_MIN_RATIO,
+    DEFAULT_MIN_SIZE,
+    SimilarityFinder,
+)
+from ..use_cases.dedupe import DEFAULT_SAMPLE_SIZE, PREFILTER_STAGES, DuplicateFinder
+from ..infra.chunking import DEFAULT_CHUNK_SIZE
+from ..infra.hash_cache import default_cache_dir
+from ..infra.journal import PlanJournal, default_journal_dir
+from ..infra.hashing import (
+    CONFIRMING_ALGORITHMS,
+    DEFAULT_ALGORITHM,
+    FAST_ALGORITHMS,
+)
+from ..infra.metrics import MetricsRegistry
+from ..infra.rule_config import load_rules
+from ..infra.sniffing import ContentSniffer
 
 
 def setup_logging(verbose: bool) -> None:
@@ -35,21 +59,67 @@ def setup_logging(verbose: bool) -> None:
     root_logger.addHandler(file_handler)
 
 
+def prefilter_stages(value: str) -> List[str]:
+    """Parses --prefilter: comma-separated stage names, or 'none'."""
+    if value == "none":
+        return []
+    stages = [stage.strip() for stage in value.split(",")]
+    unknown = [stage for stage in stages if stage not in PREFILTER_STAGES]
+    if unknown:
+        raise argparse.ArgumentTypeError(
+            f"unknown stage {unknown[0]!r} (choose from "
+            f"{', '.join(PREFILTER_STAGES)}, or 'none')"
+        )
+    return stages
+
+
+def snapshot_dir(args: argparse.Namespace) -> Optional[Path]:
+    """Where incremental scans keep their snapshot, or None for a full walk."""
+    if not (args.incremental or getattr(args, "changes", False)):
+        return None
+    return Path(getattr(args, "cache_dir", None) or default_cache_dir())
+
+
+def print_changes(scanner: DirectoryScanner, root_path: Path) -> None:
+    """Prints the diff stream against the previous snapshot."""
+    counts: Dict[ChangeType, int] = {change_type: 0 for change_type in ChangeType}
+    for change in scanner.scan_changes(root_path):
+        counts[change.change_type] += 1
+        print(f"[{change.change_type.name}] {change.node.path}")
+
+    print(
+        f"\nChanges: {counts[ChangeType.ADDED]} added, "
+        f"{counts[ChangeType.REMOVED]} removed, "
+        f"{counts[ChangeType.MODIFIED]} modified"
+    )
+
+
 def handle_scan(args: argparse.Namespace) -> None:
     """Handler for the 'scan' subcommand."""
     dry_run = not args.execute
-    container = ServiceContainer(dry_run=dry_run)
+    container = ServiceContainer(
+        dry_run=dry_run, snapshot_dir=snapshot_dir(args), metrics=args.metrics
+    )
 
     root_path = Path(args.root).resolve()
     print(f"--- Smart File Organizer ---")
     print(f"Mode: {'DRY RUN (Safe)' if dry_run else 'EXECUTE (Live)'}")
     print(f"Target: {root_path}\n")
 
-    scanner = DirectoryScanner(container.fs)
+    scanner = DirectoryScanner(
+        container.fs,
+        workers=args.scan_workers,
+        snapshot=container.scan_snapshot,
+        metrics=container.metrics,
+    )
     count = 0
     total_size = 0
 
     try:
+        if args.changes:
+            print_changes(scanner, root_path)
+            return
+
         for node in scanner.scan(root_path):
             count += 1
             total_size += node.size
@@ -61,82 +131,225 @@ def handle_scan(args: argparse.Namespace) -> None:
         print(f"\n\nScan Complete.")
         print(f"Total Files: {count}")
         print(f"Total Size: {total_size / (1024*1024):.2f} MB")
+        if scanner.snapshot is not None:
+            print(
+                f"Directories: {scanner.dirs_listed} listed, "
+                f"{scanner.dirs_reused} reused from snapshot"
+            )
 
         if scanner.errors:
             print(f"\n[WARNING] Encountered {len(scanner.errors)} permission errors.")
 
     except KeyboardInterrupt:
         print("\nAborted by user.")
-
-    dry_run = not args.execute
-    container = ServiceContainer(dry_run=dry_run)
-    root_path = Path(args.root).resolve()
-
-    scanner = DirectoryScanner(container.fs)
-    count = 0
-    for node in scanner.scan(root_path):
-        count += 1
-        print(f"\rScanning... Found {count} files", end="", flush=True)
-    print(f"\nTotal Files: {count}")
+    finally:
+        container.close()
 
 
 def handle_dedupe(args: argparse.Namespace) -> None:
     """Handler for the 'dedupe' subcommand."""
-    container = ServiceContainer(dry_run=True)
+    cache_dir = None if args.no_cache else Path(args.cache_dir or default_cache_dir())
+    # Only reads: the real filesystem, without a dry-run overlay to fill
+    container = ServiceContainer(
+        dry_run=False,
+        cache_dir=cache_dir,
+        hash_algorithm=args.hash,
+        snapshot_dir=snapshot_dir(args),
+        metrics=args.metrics,
+    )
     root_path = Path(args.root).resolve()
 
     print(f"--- Duplicate Detector ---")
     print(f"Target: {root_path}")
+    fast_pass = f" (fast pass: {args.fast_hash})" if args.fast_hash else ""
+    print(f"Hash Algorithm: {args.hash}{fast_pass}")
     print("Step 1: Scanning directory tree...")
 
-    scanner = DirectoryScanner(container.fs)
-    all_files = list(scanner.scan(root_path))
-    print(f"Found {len(all_files)} files. analyzing...")
+    # Sizes drive the grouping: replayed files are stat()ed again
+    scanner = DirectoryScanner(
+        container.fs,
+        workers=args.scan_workers,
+        snapshot=container.scan_snapshot,
+        metrics=container.metrics,
+        refresh_replayed=True,
+    )
+    group_count = 0
+    total_wasted = 0
 
-    finder = DuplicateFinder(container.hasher)
-    duplicates = finder.find_duplicates(all_files)
+    try:
+        cache = container.hash_cache
+        finder = DuplicateFinder(
+            container.hasher,
+            cache=cache,
+            prefilter=args.prefilter,
+            sample_size=args.sample_size,
+            fast_algorithm=args.fast_hash,
+            pipeline=args.pipeline,
+            metrics=container.metrics,
+        )
+
+        # The scan is consumed lazily; groups are printed as they are confirmed
+        for file_hash, group in finder.iter_duplicates(scanner.scan(root_path)):
+            group_count += 1
+            wasted_size = group[0].size * (len(group) - 1)
+            total_wasted += wasted_size
+
+            print(f"\n[Hash: {file_hash[:8]}...] Size: {group[0].size} bytes")
+            for node in group:
+                print(f"  - {node.path}")
+
+        # Hardlinks share one copy of the data, so they never count as waste
+        for names in finder.hardlink_sets:
+            print(
+                f"\n[Hardlinks: inode {names[0].ino}] Size: {names[0].size} bytes "
+                "(not wasted space)"
+            )
+            for node in names:
+                print(f"  - {node.path}")
+
+        if cache is not None:
+            print(f"\nHash cache: {cache.hits} hits, {cache.misses} misses")
+            cache.prune(args.cache_max_age_days * 86400)
+    finally:
+        container.close()
 
     print(f"\n--- Results ---")
-    if not duplicates:
+    if finder.hardlink_sets:
+        print(f"Hardlink Sets: {len(finder.hardlink_sets)}")
+    if not group_count:
         print("No duplicates found.")
         return
 
-    total_wasted = 0
-    for file_hash, group in duplicates.items():
-        wasted_size = group[0].size * (len(group) - 1)
-        total_wasted += wasted_size
+    print(f"Total Wasted Space: {total_wasted / (1024*1024):.2f} MB")
+    print(f"Duplicate Groups: {group_count}")
 
-        print(f"\n[Hash: {file_hash[:8]}...] Size: {group[0].size} bytes")
-        for node in group:
-            print(f"  - {node.path}")
 
-    print(f"\nTotal Wasted Space: {total_wasted / (1024*1024):.2f} MB")
-    print(f"Duplicate Groups: {len(duplicates)}")
+def handle_similar(args: argparse.Namespace) -> None:
+    """Handler for the 'similar' subcommand."""
+    # Without a cache the index lives in a scratch directory for this run
+    scratch = tempfile.TemporaryDirectory() if args.no_cache else None
+    cache_dir = Path(scratch.name if scratch else args.cache_dir or default_cache_dir())
+    container = ServiceContainer(
+        dry_run=False,  # Only reads, like dedupe
+        cache_dir=cache_dir,
+        snapshot_dir=snapshot_dir(args),
+        metrics=args.metrics,
+    )
+    root_path = Path(args.root).resolve()
+
+    try:
+        index = container.chunk_index
+        assert index is not None
+        finder = SimilarityFinder(
+            index,
+            chunk_size=args.chunk_size,
+            min_ratio=args.min_ratio,
+            min_size=args.min_size,
+            metrics=container.metrics,
+        )
+    except ValueError as exc:
+        container.close()
+        if scratch is not None:
+            scratch.cleanup()
+        print(exc)
+        return
+
+    print(f"--- Similar File Detector ---")
+    print(f"Target: {root_path}")
+    print(f"Chunk Size: {args.chunk_size} bytes (average)")
+    print("Step 1: Scanning directory tree...")
+
+    # Sizes drive the grouping: replayed files are stat()ed again
+    scanner = DirectoryScanner(
+        container.fs,
+        workers=args.scan_workers,
+        snapshot=container.scan_snapshot,
+        metrics=container.metrics,
+        refresh_replayed=True,
+    )
+    try:
+        pairs = finder.find_similar(scanner.scan(root_path))
+        for pair in pairs:
+            print(
+                f"\n[{pair.ratio:.0%} shared] "
+                f"{pair.shared_bytes / (1024*1024):.2f} MB in common"
+            )
+            print(f"  - {pair.first.path} ({pair.first.size} bytes)")
+            print(f"  - {pair.second.path} ({pair.second.size} bytes)")
+        print(
+            f"\nChunk index: {finder.files_reused} files reused, "
+            f"{finder.files_chunked} chunked"
+        )
+        if scratch is None:
+            index.prune(args.cache_max_age_days * 86400)
+    finally:
+        container.close()
+        if scratch is not None:
+            scratch.cleanup()
+
+    print(f"\n--- Results ---")
+    if not pairs:
+        print(f"No files share {args.min_ratio:.0%} or more of their content.")
+        return
+    print(f"Similar Pairs: {len(pairs)}")
 
 
 def handle_organize(args: argparse.Namespace) -> None:
     dry_run = not args.execute
-    container = ServiceContainer(dry_run=dry_run)
+    # Sniffed types are memoised in the hash cache; nothing opens it otherwise
+    container = ServiceContainer(
+        dry_run=dry_run,
+        cache_dir=default_cache_dir() if args.by_content else None,
+        snapshot_dir=snapshot_dir(args),
+        metrics=args.metrics,
+    )
+
+    rule: OrganizationRule
+    if args.rules:
+        try:
+            rule = load_rules(Path(args.rules))
+        except (OSError, ValueError) as exc:
+            print(f"Cannot load rules: {exc}")
+            return
+        strategy = f"Rules from {args.rules}"
+    elif args.by_content:
+        sniffer = ContentSniffer(container.hash_cache, metrics=container.metrics)
+        rule = ContentTypeRule(sniffer)
+        strategy = "Sort by Content Type"
+    elif args.by_ext:
+        rule = ExtensionRule()
+        strategy = "Sort by Extension"
+    else:
+        try:
+            tz = ZoneInfo(args.timezone) if args.timezone else None
+        except (ZoneInfoNotFoundError, ValueError):
+            print(f"Unknown timezone: {args.timezone}")
+            return
+        rule = DateRule(tz=tz)
+        strategy = f"Sort by Date (Year/Month, {args.timezone or 'local time'})"
+
     root_path = Path(args.root).resolve()
 
     print(f"--- File Organizer ---")
     print(f"Mode: {'DRY RUN' if dry_run else 'LIVE EXECUTION'}")
     print(f"Target: {root_path}")
-
-    rule: OrganizationRule
-    if args.by_ext:
-        rule = ExtensionRule()
-        print("Strategy: Sort by Extension")
-    else:
-        rule = DateRule()
-        print("Strategy: Sort by Date (Year/Month)")
+    print(f"Strategy: {strategy}")
 
     print("Scanning...")
-    scanner = DirectoryScanner(container.fs)
-    files = list(scanner.scan(root_path))
-
-    organizer = Organizer(container.fs)
-    plan = organizer.plan_organization(files, rule, root_path)
+    scanner = DirectoryScanner(
+        container.fs,
+        workers=args.scan_workers,
+        snapshot=container.scan_snapshot,
+        metrics=container.metrics,
+    )
+    organizer = Organizer(
+        container.fs, workers=args.move_workers, metrics=container.metrics
+    )
+    try:
+        files = FileTable.from_nodes(scanner.scan(root_path))
+        plan = organizer.plan_organization(files, rule, root_path)
+    finally:
+        container.close()
 
     print(f"Proposed Actions: {len(plan)}")
 
@@ -146,12 +359,113 @@ def handle_organize(args: argparse.Namespace) -> None:
             print("Operation aborted.")
             return
 
-    organizer.execute_plan(plan)
+    journal = None
+    if not dry_run and plan and not args.no_journal:
+        journal_path = Path(args.journal or new_journal_path())
+        try:
+            journal = PlanJournal(journal_path)
+            journal.begin(plan, root_path)
+        except (OSError, ValueError) as exc:
+            if journal is not None:
+                journal.close()
+            print(f"Cannot start journal: {exc}")
+            print(
+                "Nothing was moved. Finish or revert that run with "
+                f"'resume' or 'undo' (--journal {journal_path}), "
+                "or pass a new --journal path."
+            )
+            return
+        print(f"Journal: {journal_path}")
+
+    try:
+        organizer.execute_plan(plan, journal)
+    finally:
+        if journal is not None:
+            journal.close()
 
     if args.cleanup:
         print("Cleaning up empty directories...")
-        organizer.cleanup_empty_dirs(root_path)
+        removed = organizer.cleanup_empty_dirs(
+            root_path, touched_only=args.cleanup_touched
+        )
+        print(f"Removed {removed} empty directories.")
+
+    print("Done.")
+
+
+def new_journal_path() -> Path:
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    return default_journal_dir() / f"organize-{stamp}-{os.getpid()}.jsonl"
+
+
+def open_journal(args: argparse.Namespace, dry_run: bool) -> Optional[PlanJournal]:
+    """Opens --journal, or the newest journal; dry runs never write to it."""
+    path = Path(args.journal) if args.journal else None
+    if path is None:
+        path = PlanJournal.latest(default_journal_dir())
+    if path is None or not path.exists():
+        print("No journal found.")
+        return None
+    print(f"Journal: {path}")
+    return PlanJournal(path, read_only=dry_run)
+
+
+def handle_resume(args: argparse.Namespace) -> None:
+    """Handler for the 'resume' subcommand."""
+    dry_run = not args.execute
+    container = ServiceContainer(dry_run=dry_run, metrics=args.metrics)
+
+    print(f"--- Resume Plan ---")
+    print(f"Mode: {'DRY RUN' if dry_run else 'LIVE EXECUTION'}")
+    journal = open_journal(args, dry_run)
+    if journal is None:
+        return
+
+    try:
+        outstanding = journal.outstanding()
+        if not outstanding:
+            print("Nothing to resume.")
+            return
+        if not dry_run:
+            confirm = input(f"Resume {len(outstanding)} outstanding actions? [y/N]: ")
+            if confirm.lower() != "y":
+                print("Operation aborted.")
+                return
+
+        organizer = Organizer(
+            container.fs, workers=args.move_workers, metrics=container.metrics
+        )
+        organizer.resume_plan(journal)
+    finally:
+        journal.close()
+    print("Done.")
+
+
+def handle_undo(args: argparse.Namespace) -> None:
+    """Handler for the 'undo' subcommand."""
+    dry_run = not args.execute
+    container = ServiceContainer(dry_run=dry_run, metrics=args.metrics)
+
+    print(f"--- Undo Plan ---")
+    print(f"Mode: {'DRY RUN' if dry_run else 'LIVE EXECUTION'}")
+    journal = open_journal(args, dry_run)
+    if journal is None:
+        return
 
+    try:
+        completed = journal.completed()
+        if not completed:
+            print("Nothing to undo.")
+            return
+        if not dry_run:
+            confirm = input(f"Move {len(completed)} files back? [y/N]: ")
+            if confirm.lower() != "y":
+                print("Operation aborted.")
+                return
+
+        Organizer(container.fs, metrics=container.metrics).undo_plan(journal)
+    finally:
+        journal.close()
     print("Done.")
 
 
@@ -161,24 +475,159 @@ def main() -> None:
         "--verbose", "-v", action="store_true", help="Enable detailed logging"
     )
     parser.add_argument("--execute", action="store_true", help="DISABLE Dry Run mode")
+    parser.add_argument(
+        "--stats",
+        choices=["json"],
+        default=None,
+        help="Print per-stage timings, counters and histograms at exit",
+    )
+    parser.add_argument(
+        "--prometheus-file",
+        type=str,
+        default=None,
+        help="Write the same metrics as a Prometheus textfile (for cron runs "
+        "scraped by node_exporter's textfile collector)",
+    )
 
     subparsers = parser.add_subparsers(dest="command", required=True)
 
+    # Options shared by every subcommand that walks the tree
+    scan_options = argparse.ArgumentParser(add_help=False)
+    scan_options.add_argument(
+        "--scan-workers",
+        type=int,
+        default=1,
+        help="Threads used to walk directories in parallel (default: 1)",
+    )
+    scan_options.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Replay directories whose mtime is unchanged since the last "
+        "incremental run instead of listing them again. dedupe and similar "
+        "still stat() every replayed file; scan and organize do not, so a "
+        "file rewritten in place shows its old size until its directory "
+        "changes",
+    )
+
     scan_parser = subparsers.add_parser(
-        "scan", help="Scan directory and list statistics"
+        "scan", help="Scan directory and list statistics", parents=[scan_options]
     )
     scan_parser.add_argument(
         "--root", type=str, default=".", help="Root directory to scan"
     )
+    scan_parser.add_argument(
+        "--changes",
+        action="store_true",
+        help="Print files added, removed or modified since the last "
+        "incremental run (implies --incremental)",
+    )
     scan_parser.set_defaults(func=handle_scan)
 
-    dedupe_parser = subparsers.add_parser("dedupe", help="Find duplicate files")
+    dedupe_parser = subparsers.add_parser(
+        "dedupe", help="Find duplicate files", parents=[scan_options]
+    )
     dedupe_parser.add_argument(
         "--root", type=str, default=".", help="Root directory to scan"
     )
+    dedupe_parser.add_argument(
+        "--cache-dir",
+        type=str,
+        default=None,
+        help=f"Hash cache location (default: {default_cache_dir()})",
+    )
+    dedupe_parser.add_argument(
+        "--no-cache", action="store_true", help="Hash every candidate from scratch"
+    )
+    dedupe_parser.add_argument(
+        "--cache-max-age-days",
+        type=float,
+        default=30.0,
+        help="Prune cache rows not seen for this many days (default: 30)",
+    )
+    dedupe_parser.add_argument(
+        "--prefilter",
+        type=prefilter_stages,
+        default=",".join(PREFILTER_STAGES),
+        help="Partial-hash stages run before the full hash: 'head' (first "
+        "block), 'tail' (last block plus one from the middle), or 'none' "
+        f"(default: {','.join(PREFILTER_STAGES)})",
+    )
+    dedupe_parser.add_argument(
+        "--sample-size",
+        type=int,
+        default=DEFAULT_SAMPLE_SIZE,
+        help=f"Bytes read per prefilter sample (default: {DEFAULT_SAMPLE_SIZE})",
+    )
+    dedupe_parser.add_argument(
+        "--hash",
+        choices=list(CONFIRMING_ALGORITHMS),
+        default=DEFAULT_ALGORITHM,
+        help=f"Algorithm that confirms duplicates (default: {DEFAULT_ALGORITHM})",
+    )
+    dedupe_parser.add_argument(
+        "--fast-hash",
+        choices=list(FAST_ALGORITHMS),
+        default=None,
+        help="Cheap whole-file checksum (e.g. crc32) that splits groups "
+        "before the confirming hash",
+    )
+    dedupe_parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="Hash candidates while the walk is still running "
+        "(skips --prefilter and --fast-hash)",
+    )
     dedupe_parser.set_defaults(func=handle_dedupe)
 
-    org_parser = subparsers.add_parser("organize", help="Organize files into folders")
+    similar_parser = subparsers.add_parser(
+        "similar",
+        help="Find files that share most of their content",
+        parents=[scan_options],
+    )
+    similar_parser.add_argument(
+        "--root", type=str, default=".", help="Root directory to scan"
+    )
+    similar_parser.add_argument(
+        "--min-ratio",
+        type=float,
+        default=DEFAULT_MIN_RATIO,
+        help="Shared bytes, as a fraction of the larger file, for a pair to "
+        f"be reported (default: {DEFAULT_MIN_RATIO})",
+    )
+    similar_parser.add_argument(
+        "--min-size",
+        type=parse_size,
+        default=DEFAULT_MIN_SIZE,
+        help="Skip files smaller than this, e.g. 100MB (default: 1MB)",
+    )
+    similar_parser.add_argument(
+        "--chunk-size",
+        type=parse_size,
+        default=DEFAULT_CHUNK_SIZE,
+        help="Average chunk size, a power of two of at least 1KB " "(default: 64KB)",
+    )
+    similar_parser.add_argument(
+        "--cache-dir",
+        type=str,
+        default=None,
+        help=f"Chunk index location (default: {default_cache_dir()})",
+    )
+    similar_parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Keep the chunk index for this run only",
+    )
+    similar_parser.add_argument(
+        "--cache-max-age-days",
+        type=float,
+        default=30.0,
+        help="Prune index entries not seen for this many days (default: 30)",
+    )
+    similar_parser.set_defaults(func=handle_similar)
+
+    org_parser = subparsers.add_parser(
+        "organize", help="Organize files into folders", parents=[scan_options]
+    )
     org_parser.add_argument("--root", type=str, default=".", help="Root directory")
     org_parser.add_argument(
         "--by-ext", action="store_true", help="Sort by file extension"
@@ -189,14 +638,100 @@ def main() -> None:
         default=True,
         help="Sort by modification date (Default)",
     )
+    org_parser.add_argument(
+        "--by-content",
+        action="store_true",
+        help="Sort by file type, read from magic bytes when the extension "
+        "is missing or ambiguous",
+    )
+    org_parser.add_argument(
+        "--timezone",
+        metavar="NAME",
+        help="Timezone for --by-date months, e.g. UTC or Europe/London "
+        "(default: local time)",
+    )
+    org_parser.add_argument(
+        "--rules",
+        metavar="FILE",
+        help="Route files with the rules in a TOML or JSON file "
+        "(overrides --by-ext/--by-date)",
+    )
     org_parser.add_argument(
         "--cleanup", action="store_true", help="Remove empty directories after move"
     )
+    org_parser.add_argument(
+        "--cleanup-touched",
+        action="store_true",
+        help="With --cleanup, only check directories that lost files in this run",
+    )
+    org_parser.add_argument(
+        "--move-workers",
+        type=int,
+        default=4,
+        help="Threads used to execute moves concurrently (default: 4)",
+    )
+    org_parser.add_argument(
+        "--journal",
+        type=str,
+        default=None,
+        help=f"Write-ahead journal for --execute (default: new file in "
+        f"{default_journal_dir()})",
+    )
+    org_parser.add_argument(
+        "--no-journal", action="store_true", help="Do not journal executed moves"
+    )
     org_parser.set_defaults(func=handle_organize)
 
+    journal_option = argparse.ArgumentParser(add_help=False)
+    journal_option.add_argument(
+        "--journal",
+        type=str,
+        default=None,
+        help="Journal to replay (default: the most recent one)",
+    )
+
+    resume_parser = subparsers.add_parser(
+        "resume",
+        help="Finish an interrupted organize run from its journal",
+        parents=[journal_option],
+    )
+    resume_parser.add_argument(
+        "--move-workers",
+        type=int,
+        default=4,
+        help="Threads used to execute moves concurrently (default: 4)",
+    )
+    resume_parser.set_defaults(func=handle_resume)
+
+    undo_parser = subparsers.add_parser(
+        "undo",
+        help="Move files from a journaled organize run back",
+        parents=[journal_option],
+    )
+    undo_parser.set_defaults(func=handle_undo)
+
     args = parser.parse_args()
     setup_logging(args.verbose)
-    args.func(args)
+
+    # Only a requested report pays for instrumentation
+    enabled = bool(args.stats or args.prometheus_file)
+    args.metrics = MetricsRegistry(enabled=enabled)
+    try:
+        with args.metrics.timer(
+            "command_seconds", "Wall time of the whole command", command=args.command
+        ):
+            args.func(args)
+    finally:
+        report_metrics(args)
+
+
+def report_metrics(args: argparse.Namespace) -> None:
+    """Dumps the run's metrics in the formats asked for."""
+    metrics: MetricsRegistry = args.metrics
+    if args.prometheus_file:
+        metrics.write_prometheus(Path(args.prometheus_file))
+    if args.stats == "json":
+        print(metrics.to_json())
 
 
 if __name__ == "__main__":
@@ -1,15 +1,35 @@
+from pathlib import Path
 from typing import Optional
 from .infra.interfaces import FileSystemProvider
 from .infra.fs_real import RealFileSystem
 from .infra.fs_dryrun import DryRunFileSystem
-from .infra.hashing import HashService
+from .infra.chunk_index import ChunkIndex
+from .infra.hashing import DEFAULT_ALGORITHM, HashService
+from .infra.hash_cache import HashCache
+from .infra.metrics import NULL_METRICS, MetricsRegistry
+from .infra.scan_snapshot import ScanSnapshot
 
 
 class ServiceContainer:
-    def __init__(self, dry_run: bool = True):
+    def __init__(
+        self,
+        dry_run: bool = True,
+        cache_dir: Optional[Path] = None,
+        hash_algorithm: str = DEFAULT_ALGORITHM,
+        snapshot_dir: Optional[Path] = None,
+        metrics: Optional[MetricsRegistry] = None,
+    ):
         self.dry_run = dry_run
+        self.cache_dir = cache_dir
+        self.hash_algorithm = hash_algorithm
+        self.snapshot_dir = snapshot_dir
+        # Disabled unless a registry is handed in: instruments are no-ops
+        self.metrics = metrics if metrics is not None else NULL_METRICS
         self._fs_provider: Optional[FileSystemProvider] = None
         self._hash_service: Optional[HashService] = None
+        self._hash_cache: Optional[HashCache] = None
+        self._chunk_index: Optional[ChunkIndex] = None
+        self._scan_snapshot: Optional[ScanSnapshot] = None
 
     @property
     def fs(self) -> FileSystemProvider:
@@ -24,6 +44,39 @@ class ServiceContainer:
     @property
     def hasher(self) -> HashService:
         if self._hash_service is None:
-            self._hash_service = HashService()
+            self._hash_service = HashService(self.hash_algorithm, metrics=self.metrics)
         assert self._hash_service is not None
         return self._hash_service
+
+    @property
+    def hash_cache(self) -> Optional[HashCache]:
+        """Persistent digest cache, or None when caching is disabled."""
+        if self._hash_cache is None and self.cache_dir is not None:
+            self._hash_cache = HashCache(self.cache_dir)
+        return self._hash_cache
+
+    @property
+    def chunk_index(self) -> Optional[ChunkIndex]:
+        """Chunk index for similarity search, or None when caching is disabled."""
+        if self._chunk_index is None and self.cache_dir is not None:
+            self._chunk_index = ChunkIndex(self.cache_dir)
+        return self._chunk_index
+
+    @property
+    def scan_snapshot(self) -> Optional[ScanSnapshot]:
+        """Directory snapshot for incremental scans, or None when disabled."""
+        if self._scan_snapshot is None and self.snapshot_dir is not None:
+            self._scan_snapshot = ScanSnapshot(self.snapshot_dir)
+        return self._scan_snapshot
+
+    def close(self) -> None:
+        """Releases resources held by lazily created services."""
+        if self._hash_cache is not None:
+            self._hash_cache.close()
+            self._hash_cache = None
+        if self._chunk_index is not None:
+            self._chunk_index.close()
+            self._chunk_index = None
+        if self._scan_snapshot is not None:
+            self._scan_snapshot.close()
+            self._scan_snapshot = None
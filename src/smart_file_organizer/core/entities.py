@@ -1,7 +1,7 @@
 from dataclasses import dataclass
 from enum import Enum, auto
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Tuple
 
 
 @dataclass(frozen=True)
@@ -12,6 +12,45 @@ class FileNode:
     size: int
     mtime: float
     hash: Optional[str] = None
+    dev: int = 0  # 0 when the platform does not report inode identity
+    ino: int = 0
+    nlink: int = 1
+
+    @property
+    def inode_key(self) -> Optional[Tuple[int, int]]:
+        """(st_dev, st_ino) when known; names sharing it are hardlinks."""
+        if not self.ino:
+            return None
+        return (self.dev, self.ino)
+
+
+class ChangeType(Enum):
+    ADDED = auto()
+    REMOVED = auto()
+    MODIFIED = auto()
+
+
+@dataclass(frozen=True)
+class FileChange:
+    """A file that differs from the previous scan snapshot."""
+
+    change_type: ChangeType
+    node: FileNode  # The current node, or the last known one when REMOVED
+
+
+@dataclass(frozen=True)
+class SimilarPair:
+    """Two files that share a large part of their content."""
+
+    first: FileNode
+    second: FileNode
+    shared_bytes: int
+
+    @property
+    def ratio(self) -> float:
+        """Shared bytes as a fraction of the larger file."""
+        larger = max(self.first.size, self.second.size)
+        return self.shared_bytes / larger if larger else 0.0
 
 
 class ActionType(Enum):
@@ -0,0 +1,264 @@
+import fnmatch
+import os
+import re
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Pattern, Sequence, Tuple
+from .entities import FileNode
+from .rules import OrganizationRule
+
+_SIZE_UNITS = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+_SIZE_RE = re.compile(r"\s*(\d+(?:\.\d+)?)\s*([KMGT]?)(?:I?B)?\s*", re.IGNORECASE)
+_DAY = 86400.0
+
+_RULE_KEYS = {
+    "name",
+    "dest",
+    "extensions",
+    "glob",
+    "regex",
+    "path_prefix",
+    "min_size",
+    "max_size",
+    "min_age_days",
+    "max_age_days",
+}
+
+
+def parse_size(value: Any) -> int:
+    """Bytes from an int or a string such as "512", "10MB" or "1.5 GiB"."""
+    if isinstance(value, bool):
+        raise ValueError(f"Invalid size: {value!r}")
+    if isinstance(value, int):
+        return value
+    match = _SIZE_RE.fullmatch(str(value))
+    if match is None:
+        raise ValueError(f"Invalid size: {value!r}")
+    return int(float(match.group(1)) * _SIZE_UNITS[match.group(2).upper()])
+
+
+def _normalise_ext(ext: str) -> str:
+    return ext.lower().lstrip(".")
+
+
+def _strings(name: str, key: str, value: Any) -> List[str]:
+    """A condition given as one string or a list of them."""
+    if isinstance(value, str):
+        return [value]
+    if isinstance(value, list) and all(isinstance(v, str) for v in value):
+        return value
+    raise ValueError(f"{name}: '{key}' must be a string or a list of strings")
+
+
+def _days(name: str, key: str, value: Any) -> float:
+    if not isinstance(value, bool) and isinstance(value, (int, float, str)):
+        try:
+            return float(value)
+        except ValueError:
+            pass
+    raise ValueError(f"{name}: '{key}' must be a number of days, got {value!r}")
+
+
+def _destination(name: str, value: Any) -> str:
+    """The rule's folder, which must stay inside the organized root."""
+    if not isinstance(value, str):
+        raise ValueError(f"{name}: 'dest' must be a string")
+    path = Path(value)
+    if path.anchor or ".." in path.parts:
+        raise ValueError(
+            f"{name}: 'dest' must be a relative path inside the root, got {value!r}"
+        )
+    return value
+
+
+class CompiledRule:
+    """One routing rule with its conditions reduced to plain comparisons."""
+
+    __slots__ = (
+        "order",
+        "name",
+        "dest",
+        "extensions",
+        "pattern",
+        "path_prefix",
+        "min_size",
+        "max_size",
+        "min_mtime",
+        "max_mtime",
+    )
+
+    def __init__(self, order: int, spec: Mapping[str, Any], now: float):
+        if not isinstance(spec, Mapping):
+            raise ValueError(f"rule {order + 1}: expected a table of conditions")
+        unknown = set(spec) - _RULE_KEYS
+        name = str(spec.get("name") or f"rule {order + 1}")
+        if unknown:
+            raise ValueError(f"{name}: unknown keys {sorted(unknown)}")
+        if "dest" not in spec:
+            raise ValueError(f"{name}: missing 'dest'")
+
+        self.order = order
+        self.name = name
+        self.dest = _destination(name, spec["dest"])
+        self.extensions: Optional[Tuple[str, ...]] = None
+        if spec.get("extensions") is not None:
+            exts = _strings(name, "extensions", spec["extensions"])
+            self.extensions = tuple(_normalise_ext(e) for e in exts)
+
+        # Globs and regexes on the file name are folded into one pattern
+        patterns: List[str] = []
+        if spec.get("glob") is not None:
+            for glob in _strings(name, "glob", spec["glob"]):
+                patterns.append(fnmatch.translate(glob))
+        if "regex" in spec:
+            if not isinstance(spec["regex"], str):
+                raise ValueError(f"{name}: 'regex' must be a string")
+            patterns.append(spec["regex"])
+        self.pattern: Optional[str] = None
+        if patterns:
+            self.pattern = "|".join(f"(?:{p})" for p in patterns)
+            try:
+                re.compile(self.pattern)
+            except re.error as exc:
+                raise ValueError(f"{name}: invalid pattern: {exc}") from None
+
+        prefix = spec.get("path_prefix")
+        if prefix is not None and not isinstance(prefix, str):
+            raise ValueError(f"{name}: 'path_prefix' must be a string")
+        self.path_prefix: Optional[str] = (
+            os.path.normpath(str(prefix)).strip(os.sep) if prefix else None
+        )
+        try:
+            self.min_size = parse_size(spec["min_size"]) if "min_size" in spec else None
+            self.max_size = parse_size(spec["max_size"]) if "max_size" in spec else None
+        except ValueError as exc:
+            raise ValueError(f"{name}: {exc}") from None
+        # Ages become mtime bounds once, against the time of compilation
+        self.max_mtime = (
+            now - _days(name, "min_age_days", spec["min_age_days"]) * _DAY
+            if "min_age_days" in spec
+            else None
+        )
+        self.min_mtime = (
+            now - _days(name, "max_age_days", spec["max_age_days"]) * _DAY
+            if "max_age_days" in spec
+            else None
+        )
+
+
+class _Bound:
+    """A rule set's per-root data: destination Paths and path prefixes."""
+
+    __slots__ = ("destinations", "prefixes")
+
+    def __init__(self, rules: Sequence[CompiledRule], root: Path):
+        self.destinations = [root / rule.dest for rule in rules]
+        self.prefixes = [
+            os.path.join(str(root), rule.path_prefix) + os.sep
+            if rule.path_prefix
+            else None
+            for rule in rules
+        ]
+
+
+class RuleEngine(OrganizationRule):
+    """
+    Ordered routing rules from a config file; the first rule whose
+    conditions all hold decides the destination. Files no rule matches
+    stay where they are.
+
+    Rules are compiled once. Each extension maps to the few rules that can
+    apply to it, so a file is only tested against those. The name globs and
+    regexes of all rules form one combined regex: a single match finds the
+    first rule whose name pattern holds and rules out every earlier one.
+    Destination Paths are built once per root, so routing a file creates
+    no new objects beyond the lookups themselves.
+    """
+
+    def __init__(self, specs: Sequence[Mapping[str, Any]], now: Optional[float] = None):
+        now = time.time() if now is None else now
+        self.rules = [CompiledRule(i, spec, now) for i, spec in enumerate(specs)]
+
+        # Extension -> candidate rules in order; any other extension only
+        # sees the rules without an extension condition.
+        self._any_ext = [r for r in self.rules if r.extensions is None]
+        self._by_ext: Dict[str, List[CompiledRule]] = {}
+        for ext in {e for r in self.rules for e in r.extensions or ()}:
+            self._by_ext[ext] = [
+                r for r in self.rules if r.extensions is None or ext in r.extensions
+            ]
+
+        named = [r for r in self.rules if r.pattern is not None]
+        self._patterns: Dict[int, Pattern[str]] = {
+            r.order: re.compile(r.pattern, re.IGNORECASE)
+            for r in named
+            if r.pattern is not None
+        }
+        self._combined: Optional[Pattern[str]] = None
+        if named:
+            try:
+                self._combined = re.compile(
+                    "|".join(f"(?P<r{r.order}>{r.pattern})" for r in named),
+                    re.IGNORECASE,
+                )
+            except re.error:
+                # Clashing group names or inline flags: match rule by rule
+                self._combined = None
+        self._bound: Dict[Path, _Bound] = {}
+
+    @classmethod
+    def from_config(cls, config: Mapping[str, Any]) -> "RuleEngine":
+        """Builds an engine from a parsed config: {"rules": [{...}, ...]}."""
+        rules = config.get("rules")
+        if not isinstance(rules, list):
+            raise ValueError("Rule config needs a 'rules' list")
+        return cls(rules)
+
+    def match(self, node: FileNode, root: Path) -> Optional[CompiledRule]:
+        """The first rule that applies to the node, if any."""
+        bound = self._bound.get(root)
+        if bound is None:
+            bound = self._bound[root] = _Bound(self.rules, root)
+
+        name = node.path.name
+        candidates = self._by_ext.get(_normalise_ext(node.path.suffix), self._any_ext)
+        first_named = -1  # Order of the first rule whose name pattern matches
+        for rule in candidates:
+            if rule.pattern is not None:
+                if first_named == -1:
+                    first_named = self._first_named(name)
+                if rule.order < first_named:
+                    continue
+                if rule.order > first_named:
+                    if not self._patterns[rule.order].fullmatch(name):
+                        continue
+            if rule.min_size is not None and node.size < rule.min_size:
+                continue
+            if rule.max_size is not None and node.size > rule.max_size:
+                continue
+            if rule.max_mtime is not None and node.mtime > rule.max_mtime:
+                continue
+            if rule.min_mtime is not None and node.mtime < rule.min_mtime:
+                continue
+            prefix = bound.prefixes[rule.order]
+            if prefix is not None and not str(node.path).startswith(prefix):
+                continue
+            return rule
+        return None
+
+    def get_destination(self, node: FileNode, root: Path) -> Path:
+        rule = self.match(node, root)
+        if rule is None:
+            return node.path.parent
+        return self._bound[root].destinations[rule.order]
+
+    def _first_named(self, name: str) -> int:
+        if self._combined is None:
+            for order, pattern in self._patterns.items():
+                if pattern.fullmatch(name):
+                    return order
+            return len(self.rules)
+        found = self._combined.fullmatch(name)
+        if found is None or found.lastgroup is None:
+            return len(self.rules)
+        return int(found.lastgroup[1:])
@@ -1,7 +1,26 @@
 from abc import ABC, abstractmethod
-from datetime import datetime
+from bisect import bisect_right
+from datetime import datetime, tzinfo
 from pathlib import Path
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
 from .entities import FileNode
+from .table import FileTable
+
+try:
+    import numpy as np
+except ImportError:  # Optional: speeds up bucketing of large batches
+    np = None  # type: ignore[assignment, unused-ignore]
+
+# Batches at least this long are bucketed with numpy, when it is installed
+NUMPY_MIN_BATCH = 4096
+
+# Extensions that say nothing about what a file holds
+AMBIGUOUS_EXTENSIONS: FrozenSet[str] = frozenset(
+    {"bin", "dat", "data", "tmp", "part", "download", "crdownload", "file"}
+)
+
+# Maps a batch of paths to their detected types (e.g. "pdf"), None if unknown
+Sniffer = Callable[[Sequence[Path]], List[Optional[str]]]
 
 
 class OrganizationRule(ABC):
@@ -12,6 +31,14 @@ class OrganizationRule(ABC):
         """Returns the target folder for a given file."""
         pass
 
+    def get_destinations(self, nodes: Sequence[FileNode], root: Path) -> List[Path]:
+        """
+        Target folders for a batch of files, in order. Rules that can share
+        work across a batch override this; equal destinations may be the
+        same Path object.
+        """
+        return [self.get_destination(node, root) for node in nodes]
+
 
 class ExtensionRule(OrganizationRule):
     """Sorts files into folders by extension (e.g., /Images/jpg/)."""
@@ -22,12 +49,146 @@ class ExtensionRule(OrganizationRule):
             return root / "Misc"
         return root / ext.upper()
 
+    def get_destinations(self, nodes: Sequence[FileNode], root: Path) -> List[Path]:
+        folders: Dict[str, Path] = {}
+        result = []
+        for node in nodes:
+            suffix = node.path.suffix
+            folder = folders.get(suffix)
+            if folder is None:
+                folder = folders[suffix] = self.get_destination(node, root)
+            result.append(folder)
+        return result
+
+
+class ContentTypeRule(ExtensionRule):
+    """
+    Sorts files into folders by type like ExtensionRule, but takes the type
+    from the file's content when the extension is missing or ambiguous
+    (upload_3f2a, blob.bin, report.2). Other files are routed by their
+    extension without touching the disk. Files whose content matches no
+    known type go where ExtensionRule would put them.
+    """
+
+    def __init__(self, sniff: Sniffer, ambiguous: Iterable[str] = AMBIGUOUS_EXTENSIONS):
+        self.sniff = sniff
+        self.ambiguous = frozenset(ext.lower().lstrip(".") for ext in ambiguous)
+
+    def needs_sniffing(self, node: FileNode) -> bool:
+        ext = node.path.suffix.lower().lstrip(".")
+        return not ext or ext in self.ambiguous or ext.isdigit()
+
+    def get_destination(self, node: FileNode, root: Path) -> Path:
+        return self.get_destinations([node], root)[0]
+
+    def get_destinations(self, nodes: Sequence[FileNode], root: Path) -> List[Path]:
+        folders: Dict[str, Path] = {}
+        result: List[Path] = []
+        # Files to sniff, all in one call: their positions and paths
+        pending: List[int] = []
+        paths: List[Path] = []
+        for node in nodes:
+            if self.needs_sniffing(node):
+                pending.append(len(result))
+                paths.append(node.path)
+            suffix = node.path.suffix
+            folder = folders.get(suffix)
+            if folder is None:
+                folder = folders[suffix] = super().get_destination(node, root)
+            result.append(folder)
+
+        if paths:
+            by_kind: Dict[str, Path] = {}
+            for index, kind in zip(pending, self.sniff(paths)):
+                if kind:
+                    folder = by_kind.get(kind)
+                    if folder is None:
+                        folder = by_kind[kind] = root / kind.upper()
+                    result[index] = folder
+        return result
+
 
 class DateRule(OrganizationRule):
-    """Sorts files by Year/Month (e.g., /2023/10/)."""
+    """
+    Sorts files by Year/Month (e.g., /2023/10/) of their modification time,
+    in the given timezone (local time by default).
+
+    Batches are bucketed against the start times of the months they span:
+    one binary search per file (numpy's searchsorted over the whole mtime
+    column for large batches) and one shared Path per month, instead of a
+    datetime, two strings and a Path per file.
+    """
+
+    def __init__(self, tz: Optional[tzinfo] = None):
+        self.tz = tz
+        # Month starts as timestamps, ascending, and their (year, month)
+        self._bounds: List[float] = []
+        self._months: List[Tuple[int, int]] = []
+        self._folders: Dict[Tuple[Path, int, int], Path] = {}
 
     def get_destination(self, node: FileNode, root: Path) -> Path:
-        dt = datetime.fromtimestamp(node.mtime)
-        year = str(dt.year)
-        month = f"{dt.month:02d}"
-        return root / year / month
+        dt = datetime.fromtimestamp(node.mtime, self.tz)
+        return self._folder(root, dt.year, dt.month)
+
+    def get_destinations(self, nodes: Sequence[FileNode], root: Path) -> List[Path]:
+        if not nodes:
+            return []
+        # A FileTable hands over its mtime column without building nodes
+        mtimes: Sequence[float] = (
+            nodes.mtimes
+            if isinstance(nodes, FileTable)
+            else [node.mtime for node in nodes]
+        )
+        try:
+            self._cover(min(mtimes), max(mtimes))
+        except (OverflowError, OSError, ValueError):
+            # Dates the month table cannot span: file by file, as before
+            return super().get_destinations(nodes, root)
+
+        if np is not None and len(mtimes) >= NUMPY_MIN_BATCH:
+            column = np.asarray(mtimes, dtype=np.float64)
+            bounds = np.asarray(self._bounds, dtype=np.float64)
+            slots = (np.searchsorted(bounds, column, side="right") - 1).tolist()
+        else:
+            bounds_list = self._bounds
+            slots = [bisect_right(bounds_list, mtime) - 1 for mtime in mtimes]
+
+        folders: List[Optional[Path]] = [None] * len(self._months)
+        result = []
+        for slot in slots:
+            folder = folders[slot]
+            if folder is None:
+                year, month = self._months[slot]
+                folder = folders[slot] = self._folder(root, year, month)
+            result.append(folder)
+        return result
+
+    def _folder(self, root: Path, year: int, month: int) -> Path:
+        key = (root, year, month)
+        folder = self._folders.get(key)
+        if folder is None:
+            folder = self._folders[key] = root / str(year) / f"{month:02d}"
+        return folder
+
+    def _cover(self, low: float, high: float) -> None:
+        """Extends the month table so that it spans [low, high]."""
+        if self._bounds and self._bounds[0] <= low and high < self._bounds[-1]:
+            return
+        first = datetime.fromtimestamp(low, self.tz)
+        last = datetime.fromtimestamp(high, self.tz)
+        if self._months:
+            first = min(first, self._month_start(*self._months[0]))
+            last = max(last, self._month_start(*self._months[-2]))
+
+        # One extra month start closes the range above `high`
+        end = (last.year + 1, 1) if last.month == 12 else (last.year, last.month + 1)
+        year, month = first.year, first.month
+        bounds, months = [], []
+        while (year, month) <= end:
+            bounds.append(self._month_start(year, month).timestamp())
+            months.append((year, month))
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        self._bounds, self._months = bounds, months
+
+    def _month_start(self, year: int, month: int) -> datetime:
+        return datetime(year, month, 1, tzinfo=self.tz)
@@ -0,0 +1,124 @@
+from typing import Callable, Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+
+
+class Signature(NamedTuple):
+    """
+    A file type and the (offset, bytes) pieces its header must contain.
+    Magics too short to trust on their own also name a `check` on the
+    header's fields.
+    """
+
+    kind: str
+    parts: Tuple[Tuple[int, bytes], ...]
+    check: Optional[Callable[[bytes], bool]] = None
+
+
+def _sig(kind: str, magic: bytes, offset: int = 0) -> Signature:
+    return Signature(kind, ((offset, magic),))
+
+
+# Sizes of the DIB headers that follow a BMP's file header, by version
+_BMP_DIB_SIZES: FrozenSet[int] = frozenset({12, 40, 52, 56, 64, 108, 124})
+# Executables whose PE header lies further in are not recognised
+PE_HEADER_REACH = 512
+
+
+def _is_bmp(head: bytes) -> bool:
+    """Text can start with "BM" too: the DIB header size must be a real one."""
+    return int.from_bytes(head[14:18], "little") in _BMP_DIB_SIZES
+
+
+def _is_pe(head: bytes) -> bool:
+    """The DOS stub's e_lfanew must point at a "PE\\0\\0" header."""
+    if len(head) < 0x40:
+        return False
+    offset = int.from_bytes(head[0x3C:0x40], "little")
+    return offset >= 0x40 and head.startswith(b"PE\x00\x00", offset)
+
+
+# Checked in order, so specific entries come before the generic ones they
+# share bytes with (WebP before other RIFF files, HEIC before plain MP4).
+SIGNATURES: Tuple[Signature, ...] = (
+    _sig("png", b"\x89PNG\r\n\x1a\n"),
+    _sig("jpg", b"\xff\xd8\xff"),
+    _sig("gif", b"GIF87a"),
+    _sig("gif", b"GIF89a"),
+    Signature("webp", ((0, b"RIFF"), (8, b"WEBP"))),
+    Signature("wav", ((0, b"RIFF"), (8, b"WAVE"))),
+    Signature("avi", ((0, b"RIFF"), (8, b"AVI "))),
+    # File size, then four reserved zero bytes
+    Signature("bmp", ((0, b"BM"), (6, b"\x00\x00\x00\x00")), _is_bmp),
+    _sig("tiff", b"II*\x00"),
+    _sig("tiff", b"MM\x00*"),
+    _sig("ico", b"\x00\x00\x01\x00"),
+    _sig("psd", b"8BPS"),
+    _sig("heic", b"ftypheic", 4),
+    _sig("heic", b"ftypheix", 4),
+    _sig("heic", b"ftypmif1", 4),
+    _sig("mov", b"ftypqt  ", 4),
+    _sig("m4a", b"ftypM4A ", 4),
+    _sig("mp4", b"ftyp", 4),
+    _sig("mkv", b"\x1a\x45\xdf\xa3"),
+    _sig("flac", b"fLaC"),
+    _sig("ogg", b"OggS"),
+    _sig("mp3", b"ID3"),
+    _sig("mp3", b"\xff\xfb"),
+    _sig("mp3", b"\xff\xf3"),
+    _sig("pdf", b"%PDF-"),
+    _sig("ps", b"%!PS"),
+    _sig("rtf", b"{\\rtf"),
+    _sig("zip", b"PK\x03\x04"),
+    _sig("zip", b"PK\x05\x06"),
+    _sig("gz", b"\x1f\x8b"),
+    _sig("bz2", b"BZh"),
+    _sig("xz", b"\xfd7zXZ\x00"),
+    _sig("zst", b"\x28\xb5\x2f\xfd"),
+    _sig("7z", b"7z\xbc\xaf\x27\x1c"),
+    _sig("rar", b"Rar!\x1a\x07"),
+    _sig("tar", b"ustar", 257),
+    _sig("sqlite", b"SQLite format 3\x00"),
+    Signature("exe", ((0, b"MZ"),), _is_pe),
+    _sig("elf", b"\x7fELF"),
+    _sig("class", b"\xca\xfe\xba\xbe"),
+    _sig("wasm", b"\x00asm"),
+    _sig("xml", b"<?xml"),
+    _sig("html", b"<!DOCTYPE html"),
+    _sig("html", b"<!doctype html"),
+    _sig("html", b"<html"),
+)
+
+# Bytes a file must offer for every signature to be checkable
+SNIFF_BYTES = max(
+    PE_HEADER_REACH,
+    max(offset + len(magic) for s in SIGNATURES for offset, magic in s.parts),
+)
+
+# Signatures anchored at offset 0, by their first byte; the rest (ftyp
+# brands, tar) are tried for every header after those.
+_BY_FIRST_BYTE: Dict[int, List[Signature]] = {}
+_UNANCHORED: List[Signature] = []
+for _signature in SIGNATURES:
+    _offset, _magic = _signature.parts[0]
+    if _offset == 0:
+        _BY_FIRST_BYTE.setdefault(_magic[0], []).append(_signature)
+    else:
+        _UNANCHORED.append(_signature)
+
+
+def identify(head: bytes) -> Optional[str]:
+    """The type whose signature the header matches, or None."""
+    if not head:
+        return None
+    for signature in _BY_FIRST_BYTE.get(head[0], ()):
+        if _matches(head, signature):
+            return signature.kind
+    for signature in _UNANCHORED:
+        if _matches(head, signature):
+            return signature.kind
+    return None
+
+
+def _matches(head: bytes, signature: Signature) -> bool:
+    if not all(head.startswith(magic, offset) for offset, magic in signature.parts):
+        return False
+    return signature.check is None or signature.check(head)
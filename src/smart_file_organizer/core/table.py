@@ -0,0 +1,111 @@
+import os
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Sequence, Union, overload
+from .entities import FileNode
+
+
+class FileTable(Sequence[FileNode]):
+    """
+    Compact, column-oriented collection of scanned files.
+
+    Sizes, mtimes and inode identity live in typed arrays; each path is stored as an interned
+    directory id plus a slice of one shared UTF-8 name buffer. A row costs a
+    few dozen bytes instead of a FileNode with its own Path object, and
+    FileNode views are only built when a row is read.
+    """
+
+    def __init__(self) -> None:
+        self.sizes = array("q")
+        self.mtimes = array("d")
+        self.devs = array("Q")
+        self.inos = array("Q")
+        self.nlinks = array("q")
+        self.dir_ids = array("q")
+        # Row i's name is _names[name_offsets[i]:name_offsets[i + 1]]
+        self.name_offsets = array("q", [0])
+        self._names = bytearray()
+        self._dirs: List[str] = []
+        self._dir_index: Dict[str, int] = {}
+
+    @classmethod
+    def from_nodes(cls, nodes: Iterable[FileNode]) -> "FileTable":
+        table = cls()
+        for node in nodes:
+            table.add(node)
+        return table
+
+    def add(self, node: FileNode) -> None:
+        directory, _, name = str(node.path).rpartition(os.sep)
+        self.append(
+            directory or os.sep,
+            name,
+            node.size,
+            node.mtime,
+            node.dev,
+            node.ino,
+            node.nlink,
+        )
+
+    def append(
+        self,
+        directory: str,
+        name: str,
+        size: int,
+        mtime: float,
+        dev: int = 0,
+        ino: int = 0,
+        nlink: int = 1,
+    ) -> None:
+        dir_id = self._dir_index.get(directory)
+        if dir_id is None:
+            dir_id = len(self._dirs)
+            self._dirs.append(directory)
+            self._dir_index[directory] = dir_id
+
+        self._names += name.encode("utf-8", "surrogateescape")
+        self.name_offsets.append(len(self._names))
+        self.dir_ids.append(dir_id)
+        self.sizes.append(size)
+        self.mtimes.append(mtime)
+        self.devs.append(dev)
+        self.inos.append(ino)
+        self.nlinks.append(nlink)
+
+    def name(self, index: int) -> str:
+        start, end = self.name_offsets[index], self.name_offsets[index + 1]
+        return self._names[start:end].decode("utf-8", "surrogateescape")
+
+    def path(self, index: int) -> Path:
+        return Path(self._dirs[self.dir_ids[index]], self.name(index))
+
+    def __len__(self) -> int:
+        return len(self.sizes)
+
+    @overload
+    def __getitem__(self, index: int) -> FileNode:
+        ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[FileNode]:
+        ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[FileNode, List[FileNode]]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("FileTable index out of range")
+        return FileNode(
+            path=self.path(index),
+            size=self.sizes[index],
+            mtime=self.mtimes[index],
+            dev=self.devs[index],
+            ino=self.inos[index],
+            nlink=self.nlinks[index],
+        )
+
+    def __iter__(self) -> Iterator[FileNode]:
+        for index in range(len(self)):
+            yield self[index]
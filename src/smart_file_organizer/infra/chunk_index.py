@@ -0,0 +1,169 @@
+import sqlite3
+import time
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+from .chunking import ChunkCounts
+from .hash_cache import CacheKey
+
+# (file id, file id, bytes of chunks the two files have in common)
+SharedBytes = Tuple[int, int, int]
+
+
+class ChunkIndex:
+    """
+    Persistent SQLite store of the content-defined chunks of large files.
+
+    A file is recorded once per (st_dev, st_ino) with the size, mtime_ns and
+    average chunk size it was split with; a lookup that disagrees on any of
+    them misses and drops the stale rows, like HashCache does. Each distinct
+    chunk of a file is one row (digest, length, repeat count), so the index
+    grows with unique chunks rather than with file sizes, and pairs of files
+    sharing chunks are found by a join on the digest inside SQLite.
+    """
+
+    DB_NAME = "chunks.sqlite3"
+    SCHEMA_VERSION = 1
+
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = cache_dir
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.cache_dir / self.DB_NAME))
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._create_schema()
+
+    def _create_schema(self) -> None:
+        (version,) = self._conn.execute("PRAGMA user_version").fetchone()
+        if version != self.SCHEMA_VERSION:
+            # Only a cache: older layouts are dropped rather than migrated.
+            self._conn.execute("DROP TABLE IF EXISTS chunks")
+            self._conn.execute("DROP TABLE IF EXISTS files")
+            self._conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS files (
+                id INTEGER PRIMARY KEY,
+                dev INTEGER NOT NULL,
+                ino INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                avg_size INTEGER NOT NULL,
+                last_seen REAL NOT NULL,
+                UNIQUE (dev, ino)
+            )
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS chunks (
+                file_id INTEGER NOT NULL REFERENCES files (id) ON DELETE CASCADE,
+                digest BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (file_id, digest)
+            ) WITHOUT ROWID
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS chunks_by_digest ON chunks (digest)"
+        )
+        self._conn.commit()
+
+    def lookup(self, key: CacheKey, avg_size: int) -> Optional[int]:
+        """The id of the file's chunk list, or None if missing or stale."""
+        row = self._conn.execute(
+            "SELECT id, size, mtime_ns, avg_size FROM files WHERE dev = ? AND ino = ?",
+            (key.dev, key.ino),
+        ).fetchone()
+        if row is None:
+            return None
+        file_id, size, mtime_ns, stored_avg = row
+        # Both writes ride along with the next commit (store, join or close)
+        if (size, mtime_ns, stored_avg) != (key.size, key.mtime_ns, avg_size):
+            self._conn.execute("DELETE FROM files WHERE id = ?", (file_id,))
+            return None
+        self._conn.execute(
+            "UPDATE files SET last_seen = ? WHERE id = ?", (time.time(), file_id)
+        )
+        return int(file_id)
+
+    def store(self, key: CacheKey, avg_size: int, chunks: ChunkCounts) -> int:
+        """Records a file's chunks, replacing older ones. Returns its id."""
+        with self._conn:
+            self._conn.execute(
+                "DELETE FROM files WHERE dev = ? AND ino = ?", (key.dev, key.ino)
+            )
+            cursor = self._conn.execute(
+                "INSERT INTO files (dev, ino, size, mtime_ns, avg_size, last_seen) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key.dev, key.ino, key.size, key.mtime_ns, avg_size, time.time()),
+            )
+            file_id = cursor.lastrowid
+            assert file_id is not None
+            self._conn.executemany(
+                "INSERT INTO chunks (file_id, digest, size, count) VALUES (?, ?, ?, ?)",
+                [
+                    (file_id, digest, length, count)
+                    for digest, (length, count) in chunks.items()
+                ],
+            )
+        return file_id
+
+    def shared_bytes(
+        self, file_ids: Sequence[int], max_fanout: Optional[int] = None
+    ) -> List[SharedBytes]:
+        """
+        Every pair among `file_ids` with at least one chunk in common, and
+        the bytes they share: a chunk counts min(repeats in either file)
+        times. Chunks held by more than `max_fanout` of the files (runs of
+        zeros, common headers) are left out, as they would pair up every
+        file with every other.
+        """
+        conn = self._conn
+        conn.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS run_files (id INTEGER PRIMARY KEY)"
+        )
+        conn.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS run_shared (digest BLOB PRIMARY KEY)"
+        )
+        try:
+            conn.executemany(
+                "INSERT OR IGNORE INTO run_files VALUES (?)", [(i,) for i in file_ids]
+            )
+            # Digests present in at least two of the files
+            conn.execute(
+                "INSERT INTO run_shared SELECT c.digest FROM chunks c "
+                "JOIN run_files r ON r.id = c.file_id "
+                "GROUP BY c.digest HAVING COUNT(*) BETWEEN 2 AND ?",
+                (max_fanout if max_fanout is not None else len(file_ids),),
+            )
+            rows = conn.execute(
+                """
+                SELECT a.file_id, b.file_id, SUM(a.size * MIN(a.count, b.count))
+                FROM run_shared s
+                JOIN chunks a ON a.digest = s.digest
+                JOIN run_files ra ON ra.id = a.file_id
+                JOIN chunks b ON b.digest = s.digest AND b.file_id > a.file_id
+                JOIN run_files rb ON rb.id = b.file_id
+                GROUP BY a.file_id, b.file_id
+                """
+            ).fetchall()
+        finally:
+            conn.execute("DELETE FROM run_files")
+            conn.execute("DELETE FROM run_shared")
+            conn.commit()
+        return [(int(a), int(b), int(shared)) for a, b, shared in rows]
+
+    def prune(self, max_age_seconds: float) -> int:
+        """Deletes files not seen for `max_age_seconds`. Returns files removed."""
+        cutoff = time.time() - max_age_seconds
+        with self._conn:
+            cursor = self._conn.execute(
+                "DELETE FROM files WHERE last_seen < ?", (cutoff,)
+            )
+        return cursor.rowcount
+
+    def close(self) -> None:
+        self._conn.commit()
+        self._conn.close()
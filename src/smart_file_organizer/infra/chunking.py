@@ -0,0 +1,137 @@
+import hashlib
+import random
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, List, NamedTuple, Tuple
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+READ_SIZE = 1024 * 1024
+# The hash is 32 bits wide, so it depends on the last 32 bytes only
+WINDOW = 32
+_M32 = 0xFFFFFFFF
+
+# One fixed random 32-bit value per byte; seeded so boundaries (and with
+# them the chunk index) stay comparable between runs and machines.
+_rng = random.Random(0x6765617263646300)
+GEAR: Tuple[int, ...] = tuple(_rng.getrandbits(32) for _ in range(256))
+del _rng
+
+# Prefilter: each byte maps to the top 5 bits of its GEAR value, and a cut
+# needs the last 2 bytes to spell ANCHOR in those symbols (1 position in
+# 1024). Its two symbols differ, so matches cannot overlap and cluster.
+ANCHOR_BITS = 10
+_ANCHOR_TABLE = bytes(g >> 27 for g in GEAR)
+ANCHOR = bytes((5, 22))
+
+Chunk = Tuple[int, bytes]  # (length, 16-byte BLAKE2b digest)
+# Digest -> (length, occurrences) of a file's distinct chunks
+ChunkCounts = Dict[bytes, Tuple[int, int]]
+
+
+class ChunkParams(NamedTuple):
+    """Cut-point settings derived from the target average chunk size."""
+
+    avg_size: int
+    min_size: int
+    max_size: int
+    bits: int
+
+    @classmethod
+    def for_average(cls, avg_size: int = DEFAULT_CHUNK_SIZE) -> "ChunkParams":
+        if avg_size < 1 << ANCHOR_BITS or avg_size & (avg_size - 1):
+            raise ValueError(
+                f"Chunk size must be a power of two >= {1 << ANCHOR_BITS}: {avg_size}"
+            )
+        bits = avg_size.bit_length() - 1
+        return cls(avg_size, avg_size // 4, avg_size * 4, bits)
+
+
+def gear_hash(window: bytes) -> int:
+    """h = (h << 1) + GEAR[byte] (mod 2**32) over the window's bytes."""
+    h = 0
+    for byte in window:
+        h = ((h << 1) + GEAR[byte]) & _M32
+    return h
+
+
+def cut_points(data: bytes, bits: int, history: int = 0) -> List[int]:
+    """
+    Positions i >= history after which a chunk may end: the 2 bytes up to
+    i match the anchor and the Gear hash of the 32 bytes up to i has its
+    top `bits - 10` bits clear, for a 1 in 2**bits chance per position. The
+    caller passes up to 31 bytes of history in front of the new data.
+
+    The anchor is found with bytes.translate and bytes.find at C speed, so
+    the rolling hash is only evaluated, in Python, where it can matter.
+    """
+    limit = 1 << (32 - (bits - ANCHOR_BITS))
+    marks = data.translate(_ANCHOR_TABLE)
+    cuts = []
+    i = marks.find(ANCHOR, max(0, history - len(ANCHOR) + 1))
+    while i >= 0:
+        end = i + len(ANCHOR)
+        if gear_hash(data[max(0, end - WINDOW) : end]) < limit:
+            cuts.append(end - 1)
+        i = marks.find(ANCHOR, i + 1)
+    return cuts
+
+
+def iter_chunks(stream: BinaryIO, params: ChunkParams) -> Iterator[Chunk]:
+    """
+    Splits a stream into content-defined chunks with a Gear rolling hash,
+    reading it once, front to back.
+
+    A chunk ends after a byte where the hash matches, but is never shorter
+    than min_size or longer than max_size. Boundaries only depend on the
+    bytes just before them, so an insertion early in a file shifts the
+    chunks after it instead of changing them.
+    """
+    min_size, max_size = params.min_size, params.max_size
+    hasher = hashlib.blake2b(digest_size=16)
+    start = 0  # Stream offset where the current chunk begins
+    offset = 0  # Stream offset of the current block
+    history = b""
+    while True:
+        block = stream.read(READ_SIZE)
+        if not block:
+            break
+        view = memoryview(block)
+        block_start = offset
+        hashed = 0  # Block bytes already fed to the hasher
+
+        def cut(end: int) -> Chunk:
+            nonlocal hasher, start, hashed
+            hasher.update(view[hashed : end - block_start])
+            chunk = (end - start, hasher.digest())
+            hasher = hashlib.blake2b(digest_size=16)
+            start, hashed = end, end - block_start
+            return chunk
+
+        base = block_start - len(history)
+        for position in cut_points(history + block, params.bits, len(history)):
+            end = base + position + 1
+            while end - start > max_size:
+                yield cut(start + max_size)
+            if end - start >= min_size:
+                yield cut(end)
+        offset += len(block)
+        while offset - start > max_size:
+            yield cut(start + max_size)
+        hasher.update(view[hashed:])
+        history = (history + block)[-(WINDOW - 1) :]
+
+    if offset > start:
+        yield offset - start, hasher.digest()
+
+
+def chunk_file(path: Path, params: ChunkParams) -> ChunkCounts:
+    """
+    The distinct content-defined chunks of a file with their repeat counts
+    (process pool entry point). Repeats are folded as the file streams by,
+    so memory follows the number of distinct chunks, not the file size.
+    """
+    counts: ChunkCounts = {}
+    with open(path, "rb", buffering=0) as f:
+        for length, digest in iter_chunks(f, params):
+            seen = counts.get(digest)
+            counts[digest] = (length, seen[1] + 1 if seen else 1)
+    return counts
@@ -1,33 +1,46 @@
 import logging
+import os
 from pathlib import Path
-from typing import Iterator, Dict, Any
+from typing import Any, Iterator
 from .interfaces import FileSystemProvider
 from .fs_real import RealFileSystem
+from .vfs import OverlayTree
 
 
 class DryRunFileSystem(FileSystemProvider):
+    """
+    Logs every mutation and applies it to an in-memory overlay of the real
+    tree instead of the disk, so later reads (exists, scandir, stat) see the
+    planned state. Directories the plan does not change are read from disk
+    as they are, and cost no memory.
+    """
+
     def __init__(self) -> None:
         self._real_fs = RealFileSystem()
         self.logger = logging.getLogger("DryRun")
-        self.virtual_state: Dict[Path, Path] = {}
+        self.vfs = OverlayTree(self._real_fs)
 
     def scandir(self, path: Path) -> Iterator[Any]:
-        return self._real_fs.scandir(path)
+        return self.vfs.scandir(path)
 
     def move(self, src: Path, dest: Path) -> None:
         self.logger.info(f"[DRY RUN] MOVE: '{src}' -> '{dest}'")
-        self.virtual_state[dest] = src
+        self.vfs.move(src, dest)
 
     def remove(self, path: Path) -> None:
         self.logger.info(f"[DRY RUN] DELETE: '{path}'")
+        self.vfs.remove(path)
 
     def exists(self, path: Path) -> bool:
-        if path in self.virtual_state:
-            return True
-        return self._real_fs.exists(path)
+        return self.vfs.exists(path)
+
+    def stat(self, path: Path) -> os.stat_result:
+        return self.vfs.stat(path)
 
     def mkdir(self, path: Path) -> None:
         self.logger.info(f"[DRY RUN] MKDIR: '{path}'")
+        self.vfs.mkdir(path)
 
     def rmdir(self, path: Path) -> None:
         self.logger.info(f"[DRY RUN] RMDIR: '{path}'")
+        self.vfs.rmdir(path)
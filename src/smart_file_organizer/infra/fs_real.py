@@ -1,16 +1,39 @@
+import errno
 import os
 import shutil
+import stat
 from pathlib import Path
-from typing import Iterator
+from typing import Iterator, Optional
 from .interfaces import FileSystemProvider
+from .transfer import TransferStats, move_across_devices
 
 
 class RealFileSystem(FileSystemProvider):
+    def __init__(self) -> None:
+        self.transfer = TransferStats()
+
     def scandir(self, path: Path) -> Iterator["os.DirEntry[str]"]:
         return os.scandir(str(path))
 
     def move(self, src: Path, dest: Path) -> None:
-        shutil.move(str(src), str(dest))
+        try:
+            os.rename(str(src), str(dest))
+            return
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+        # Regular files cross devices in kernel space; anything else
+        # (directories, symlinks, devices) keeps shutil's generic handling.
+        if stat.S_ISREG(os.lstat(src).st_mode):
+            move_across_devices(src, dest, self.transfer)
+        else:
+            shutil.move(str(src), str(dest))
+
+    def transfer_stats(self) -> Optional[TransferStats]:
+        return self.transfer
+
+    def rename(self, src: Path, dest: Path) -> None:
+        os.rename(str(src), str(dest))
 
     def remove(self, path: Path) -> None:
         os.remove(str(path))
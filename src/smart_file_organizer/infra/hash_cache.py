@@ -0,0 +1,182 @@
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+
+class CacheKey(NamedTuple):
+    """Identity of a file's content as far as the cache is concerned."""
+
+    dev: int
+    ino: int
+    size: int
+    mtime_ns: int
+
+
+def default_cache_dir() -> Path:
+    """Returns the per-user cache directory (honours XDG_CACHE_HOME)."""
+    base = os.environ.get("XDG_CACHE_HOME") or str(Path.home() / ".cache")
+    return Path(base) / "smart_file_organizer"
+
+
+class HashCache:
+    """
+    Persistent SQLite store of file digests.
+
+    Rows are keyed by (st_dev, st_ino, algorithm), so digests from different
+    algorithms never mix. Size and mtime_ns are checked on every lookup: a
+    rewritten file simply misses and its stale rows are dropped. Writes are
+    buffered and committed in batches.
+    """
+
+    DB_NAME = "hashes.sqlite3"
+    SCHEMA_VERSION = 2
+
+    def __init__(self, cache_dir: Path, batch_size: int = 1000):
+        self.cache_dir = cache_dir
+        self.batch_size = batch_size
+        self.hits = 0
+        self.misses = 0
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.cache_dir / self.DB_NAME))
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+
+        self._pending_puts: Dict[Tuple[int, int, str], Tuple[CacheKey, str]] = {}
+        self._pending_touch: List[Tuple[int, int, str]] = []
+        self._pending_delete: List[Tuple[int, int]] = []
+
+    def _create_schema(self) -> None:
+        (version,) = self._conn.execute("PRAGMA user_version").fetchone()
+        if version != self.SCHEMA_VERSION:
+            # Only a cache: older layouts are dropped rather than migrated.
+            self._conn.execute("DROP TABLE IF EXISTS hashes")
+            self._conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS hashes (
+                dev INTEGER NOT NULL,
+                ino INTEGER NOT NULL,
+                algorithm TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                digest TEXT NOT NULL,
+                last_seen REAL NOT NULL,
+                PRIMARY KEY (dev, ino, algorithm)
+            )
+            """
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def key_for(path: Path) -> CacheKey:
+        """Builds the cache key for a path with a single stat() call."""
+        st = os.stat(path)
+        return CacheKey(st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def get(self, key: CacheKey, algorithm: str) -> Optional[str]:
+        """Returns the cached digest, or None if missing or stale."""
+        ident = (key.dev, key.ino, algorithm)
+        pending = self._pending_puts.get(ident)
+        if pending is not None and pending[0] == key:
+            self.hits += 1
+            return pending[1]
+
+        row = self._conn.execute(
+            "SELECT size, mtime_ns, digest FROM hashes "
+            "WHERE dev = ? AND ino = ? AND algorithm = ?",
+            ident,
+        ).fetchone()
+
+        if row is None:
+            self.misses += 1
+            return None
+
+        size, mtime_ns, digest = row
+        if size != key.size or mtime_ns != key.mtime_ns:
+            # Same inode, different content: the row can never hit again.
+            self.invalidate(key)
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._pending_touch.append(ident)
+        self._maybe_flush()
+        return str(digest)
+
+    def put(self, key: CacheKey, algorithm: str, digest: str) -> None:
+        """Queues a digest for storage; written on the next batch flush."""
+        self._pending_puts[(key.dev, key.ino, algorithm)] = (key, digest)
+        self._maybe_flush()
+
+    def invalidate(self, key: CacheKey) -> None:
+        """Forgets every digest stored for the key's inode."""
+        for ident in [i for i in self._pending_puts if i[:2] == (key.dev, key.ino)]:
+            del self._pending_puts[ident]
+        self._pending_delete.append((key.dev, key.ino))
+        self._maybe_flush()
+
+    def prune(self, max_age_seconds: float) -> int:
+        """Deletes rows not seen for `max_age_seconds`. Returns rows removed."""
+        self.flush()
+        cutoff = time.time() - max_age_seconds
+        cursor = self._conn.execute("DELETE FROM hashes WHERE last_seen < ?", (cutoff,))
+        self._conn.commit()
+        return cursor.rowcount
+
+    def clear(self) -> None:
+        """Drops every cached digest."""
+        self._pending_puts.clear()
+        self._pending_touch.clear()
+        self._pending_delete.clear()
+        self._conn.execute("DELETE FROM hashes")
+        self._conn.commit()
+
+    def flush(self) -> None:
+        """Writes all buffered changes in a single transaction."""
+        if not (self._pending_puts or self._pending_touch or self._pending_delete):
+            return
+
+        now = time.time()
+        with self._conn:
+            if self._pending_delete:
+                self._conn.executemany(
+                    "DELETE FROM hashes WHERE dev = ? AND ino = ?",
+                    self._pending_delete,
+                )
+            if self._pending_puts:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO hashes "
+                    "(dev, ino, algorithm, size, mtime_ns, digest, last_seen) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (k.dev, k.ino, algorithm, k.size, k.mtime_ns, digest, now)
+                        for (_, _, algorithm), (k, digest) in self._pending_puts.items()
+                    ],
+                )
+            if self._pending_touch:
+                self._conn.executemany(
+                    "UPDATE hashes SET last_seen = ? "
+                    "WHERE dev = ? AND ino = ? AND algorithm = ?",
+                    [(now, *ident) for ident in self._pending_touch],
+                )
+
+        self._pending_puts.clear()
+        self._pending_touch.clear()
+        self._pending_delete.clear()
+
+    def close(self) -> None:
+        self.flush()
+        self._conn.close()
+
+    def _maybe_flush(self) -> None:
+        pending = (
+            len(self._pending_puts)
+            + len(self._pending_touch)
+            + len(self._pending_delete)
+        )
+        if pending >= self.batch_size:
+            self.flush()
@@ -1,29 +1,198 @@
 import hashlib
+import io
+import mmap
+import os
+import zlib
 from pathlib import Path
+from typing import Callable, Dict, Protocol, Sequence, Tuple, Union
+from .metrics import NULL_METRICS, MetricsRegistry
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+class Hasher(Protocol):
+    """The subset of the hashlib object API the service relies on."""
+
+    def update(self, data: Buffer, /) -> None:
+        ...
+
+    def hexdigest(self) -> str:
+        ...
+
+
+class _Checksum:
+    """hashlib-style wrapper around zlib's running checksums."""
+
+    def __init__(self, func: Callable[[Buffer, int], int], initial: int):
+        self._func = func
+        self._value = initial
+
+    def update(self, data: Buffer, /) -> None:
+        self._value = self._func(data, self._value)
+
+    def hexdigest(self) -> str:
+        return f"{self._value:08x}"
+
+
+HASH_ALGORITHMS: Dict[str, Callable[[], Hasher]] = {
+    "sha256": hashlib.sha256,
+    "blake2b": hashlib.blake2b,
+    "blake2s": hashlib.blake2s,
+    "md5": lambda: hashlib.md5(usedforsecurity=False),
+    "crc32": lambda: _Checksum(zlib.crc32, 0),
+    "adler32": lambda: _Checksum(zlib.adler32, 1),
+}
+
+# Cheap 32-bit checksums: good for splitting groups, never for confirming them.
+FAST_ALGORITHMS = ("crc32", "adler32")
+# Digests long enough to stand as proof that two files are identical
+CONFIRMING_ALGORITHMS = tuple(a for a in HASH_ALGORITHMS if a not in FAST_ALGORITHMS)
+DEFAULT_ALGORITHM = "sha256"
 
 
 class HashService:
     """Service to calculate file checksums safely and efficiently."""
 
     BLOCK_SIZE = 65536  # 64KB chunks
+    MAX_BLOCK_SIZE = 1024 * 1024
+    MMAP_THRESHOLD = 64 * 1024 * 1024  # Files this large are hashed via mmap
+    MMAP_RECHECK_BYTES = 32 * 1024 * 1024  # Mapped bytes hashed per size check
+    algorithm = DEFAULT_ALGORITHM
+
+    def __init__(
+        self,
+        algorithm: str = DEFAULT_ALGORITHM,
+        drop_cache: bool = True,
+        metrics: MetricsRegistry = NULL_METRICS,
+    ):
+        if algorithm not in HASH_ALGORITHMS:
+            raise ValueError(
+                f"Unknown hash algorithm '{algorithm}'. "
+                f"Choose from: {', '.join(HASH_ALGORITHMS)}"
+            )
+        self.algorithm = algorithm
+        self.drop_cache = drop_cache
+        self.metrics = metrics
+        self._factory = HASH_ALGORITHMS[algorithm]
+        self._files = metrics.counter(
+            "hash_files_total", "Files hashed in full", algorithm=algorithm
+        )
+        self._bytes = metrics.counter(
+            "hash_bytes_total", "Bytes hashed in full", algorithm=algorithm
+        )
+        self._reads = metrics.counter(
+            "fs_syscalls_total", "Filesystem calls issued", op="read"
+        )
 
     def get_hash(self, path: Path) -> str:
         """
-        Calculates SHA-256 hash of a file using buffered reading.
+        Calculates the configured hash (SHA-256 by default) of a file.
         Returns the hex digest string.
+
+        Small and medium files are read with readinto() into one reused
+        buffer; large files are hashed straight out of an mmap. The kernel
+        is told the read is sequential, and the pages are dropped afterwards
+        so a dedupe run does not evict everyone else's page cache.
         """
-        hasher = hashlib.sha256()
+        hasher = self._factory()
 
         try:
-            with open(path, "rb") as f:
-                while True:
-                    data = f.read(self.BLOCK_SIZE)
-                    if not data:
-                        break
-                    hasher.update(data)
+            timer = self.metrics.timer(
+                "hash_file_seconds", "Time to hash one file", algorithm=self.algorithm
+            )
+            with timer, open(path, "rb", buffering=0) as f:
+                fd = f.fileno()
+                size = os.fstat(fd).st_size
+                _fadvise(fd, "POSIX_FADV_SEQUENTIAL")
+                try:
+                    if size < self.MMAP_THRESHOLD:
+                        self._reads.inc(self._hash_readinto(f, size, hasher))
+                    elif not self._hash_mmap(fd, size, hasher):
+                        # Resized under the mmap: start over with plain reads
+                        hasher = self._factory()
+                        f.seek(0)
+                        self._reads.inc(self._hash_readinto(f, size, hasher))
+                finally:
+                    if self.drop_cache:
+                        _fadvise(fd, "POSIX_FADV_DONTNEED")
+            self._files.inc()
+            self._bytes.inc(size)
             return hasher.hexdigest()
         except OSError:
             # If file becomes inaccessible during read, return empty or handle upstream
             # For now, we return a distinct marker or re-raise.
             # Re-raising is safer so the scanner knows it failed.
             raise
+
+    def get_sample_hash(self, path: Path, ranges: Sequence[Tuple[int, int]]) -> str:
+        """
+        Calculates the configured hash over selected (offset, length) windows
+        of a file. Used as a cheap prefilter: differing samples prove
+        differing files.
+        """
+        hasher = self._factory()
+
+        with open(path, "rb", buffering=0) as f:
+            fd = f.fileno()
+            for offset, length in ranges:
+                hasher.update(os.pread(fd, length, offset))
+        return hasher.hexdigest()
+
+    def block_size_for(self, size: int) -> int:
+        """Larger files get larger reads: fewer syscalls, same memory bound."""
+        if size <= self.BLOCK_SIZE:
+            return self.BLOCK_SIZE
+        if size < 16 * 1024 * 1024:
+            return 4 * self.BLOCK_SIZE
+        return self.MAX_BLOCK_SIZE
+
+    def _hash_readinto(self, f: io.FileIO, size: int, hasher: Hasher) -> int:
+        """Hashes the file through one reused buffer; returns the read count."""
+        buffer = bytearray(self.block_size_for(size))
+        view = memoryview(buffer)
+        reads = 0
+        while True:
+            count = f.readinto(view)
+            reads += 1
+            if not count:
+                break
+            hasher.update(view[:count])
+        return reads
+
+    def _hash_mmap(self, fd: int, size: int, hasher: Hasher) -> bool:
+        """
+        Hashes the file out of an mmap. Touching a page past the end of a
+        file truncated meanwhile raises SIGBUS, which kills the process
+        rather than raising OSError, so the size is checked again after
+        mapping and then once per MMAP_RECHECK_BYTES hashed, rather than
+        before every block. Returns False, with the hasher only
+        partly fed, as soon as it no longer matches: the caller starts over
+        with plain reads. A shrink between two checks can still bring the
+        process down; DuplicateFinder retries the batch in a fresh worker.
+        """
+        block = self.block_size_for(size)
+        blocks_per_check = max(1, self.MMAP_RECHECK_BYTES // block)
+        try:
+            mapped = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+        except ValueError:  # Emptied since the first fstat
+            return False
+        with mapped:
+            if hasattr(mmap, "MADV_SEQUENTIAL"):
+                mapped.madvise(mmap.MADV_SEQUENTIAL)
+            with memoryview(mapped) as view:
+                for index, offset in enumerate(range(0, len(view), block)):
+                    if index % blocks_per_check == 0:
+                        if os.fstat(fd).st_size != len(view):
+                            return False
+                    hasher.update(view[offset : offset + block])
+        return True
+
+
+def _fadvise(fd: int, advice: str) -> None:
+    """Best-effort posix_fadvise; a no-op where the platform lacks it."""
+    if not hasattr(os, "posix_fadvise"):
+        return
+    try:
+        os.posix_fadvise(fd, 0, 0, getattr(os, advice))
+    except OSError:
+        pass
@@ -1,6 +1,8 @@
+import os
 from abc import ABC, abstractmethod
-from typing import Iterator, Any
+from typing import Iterator, Any, Optional
 from pathlib import Path
+from .transfer import TransferStats
 
 
 class FileSystemProvider(ABC):
@@ -26,6 +28,22 @@ class FileSystemProvider(ABC):
         """Check if a path exists."""
         pass
 
+    def stat(self, path: Path) -> os.stat_result:
+        """Return metadata for a path without following symlinks."""
+        return os.stat(path, follow_symlinks=False)
+
+    def device_of(self, path: Path) -> int:
+        """Return the id of the filesystem holding a path."""
+        return self.stat(path).st_dev
+
+    def rename(self, src: Path, dest: Path) -> None:
+        """Move a file within one filesystem (plain move unless overridden)."""
+        self.move(src, dest)
+
+    def transfer_stats(self) -> Optional[TransferStats]:
+        """Cross-device copy totals, for providers that copy data."""
+        return None
+
     @abstractmethod
     def mkdir(self, path: Path) -> None:
         """Create directory recursively."""
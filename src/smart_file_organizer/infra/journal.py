@@ -0,0 +1,166 @@
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+from ..core.entities import ActionRecord, ActionType
+from .hash_cache import default_cache_dir
+
+
+def default_journal_dir() -> Path:
+    """Journals live next to the other per-user caches."""
+    return default_cache_dir() / "journals"
+
+
+class PlanJournal:
+    """
+    Append-only JSON-lines write-ahead log of an execution plan.
+
+    The whole plan is written and fsynced before the first move. Outcomes
+    ("done", "fail", "undo") are appended and fsynced in batches, so a move
+    costs one buffered line rather than one fsync. After a crash, the last
+    unsynced outcomes are simply missing; resume treats an action whose
+    source is gone and whose destination exists as done.
+
+    A read-only journal tracks outcomes in memory but never writes, which
+    is what dry runs of resume and undo need.
+    """
+
+    def __init__(self, path: Path, batch_size: int = 1000, read_only: bool = False):
+        self.path = path
+        self.batch_size = batch_size
+        self.read_only = read_only
+        self.root: Optional[Path] = None
+        self.actions: List[ActionRecord] = []
+        self.done: Set[int] = set()
+        self.failed: Set[int] = set()
+        self.undone: Set[int] = set()
+        self._ids: Dict[Tuple[Path, Optional[Path]], int] = {}
+        self._buffer: List[str] = []
+        self._fd: Optional[int] = None
+
+        if self.path.exists():
+            self._load()
+
+    @classmethod
+    def latest(cls, directory: Path) -> Optional[Path]:
+        """Most recently written journal in a directory, if any."""
+        journals = sorted(directory.glob("*.jsonl"), key=lambda p: p.stat().st_mtime)
+        return journals[-1] if journals else None
+
+    def begin(self, plan: List[ActionRecord], root: Path) -> None:
+        """Records the full plan durably; must precede any execution."""
+        if self.actions:
+            raise ValueError(f"Journal already holds a plan: {self.path}")
+        self.root = root
+        self._append({"op": "begin", "root": str(root), "created": time.time()})
+        for action in plan:
+            self._add(action)
+            self._append(
+                {
+                    "op": "plan",
+                    "id": len(self.actions) - 1,
+                    "type": action.action_type.name,
+                    "src": str(action.src_path),
+                    "dest": str(action.dest_path) if action.dest_path else None,
+                    "reason": action.reason,
+                }
+            )
+        self.flush()
+
+    def outstanding(self) -> List[ActionRecord]:
+        """Planned actions that have not completed (failed ones are retried)."""
+        return [a for i, a in enumerate(self.actions) if i not in self.done]
+
+    def completed(self) -> List[ActionRecord]:
+        """Completed actions that have not been undone, in execution order."""
+        return [
+            a
+            for i, a in enumerate(self.actions)
+            if i in self.done and i not in self.undone
+        ]
+
+    def mark_done(self, action: ActionRecord) -> None:
+        self._mark("done", action)
+
+    def mark_failed(self, action: ActionRecord, error: str) -> None:
+        self._mark("fail", action, error=error)
+
+    def mark_undone(self, action: ActionRecord) -> None:
+        self._mark("undo", action)
+
+    def flush(self) -> None:
+        """Appends buffered records and fsyncs them in one go."""
+        if self.read_only:
+            self._buffer.clear()
+        if not self._buffer:
+            return
+        if self._fd is None:
+            self._fd = self._open()
+        os.write(self._fd, "".join(self._buffer).encode("utf-8"))
+        os.fsync(self._fd)
+        self._buffer.clear()
+
+    def close(self) -> None:
+        self.flush()
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _open(self) -> int:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o600)
+        size = os.fstat(fd).st_size
+        if size and os.pread(fd, 1, size - 1) != b"\n":
+            # Terminate a torn last line so it cannot swallow the next record
+            os.write(fd, b"\n")
+        return fd
+
+    def _mark(self, op: str, action: ActionRecord, **extra: Any) -> None:
+        action_id = self._ids[(action.src_path, action.dest_path)]
+        if op == "done":
+            self.done.add(action_id)
+            self.failed.discard(action_id)
+        elif op == "fail":
+            self.failed.add(action_id)
+        else:
+            self.undone.add(action_id)
+        self._append({"op": op, "id": action_id, **extra})
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def _add(self, action: ActionRecord) -> None:
+        self._ids[(action.src_path, action.dest_path)] = len(self.actions)
+        self.actions.append(action)
+
+    def _append(self, record: Dict[str, Any]) -> None:
+        # ensure_ascii escapes undecodable (surrogate) path characters
+        self._buffer.append(json.dumps(record) + "\n")
+
+    def _load(self) -> None:
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Torn line from an interrupted write
+                op = record["op"]
+                if op == "begin":
+                    self.root = Path(record["root"])
+                elif op == "plan":
+                    dest = record["dest"]
+                    self._add(
+                        ActionRecord(
+                            action_type=ActionType[record["type"]],
+                            src_path=Path(record["src"]),
+                            dest_path=Path(dest) if dest is not None else None,
+                            reason=record["reason"],
+                        )
+                    )
+                elif op == "done":
+                    self.done.add(record["id"])
+                    self.failed.discard(record["id"])
+                elif op == "fail":
+                    self.failed.add(record["id"])
+                elif op == "undo":
+                    self.undone.add(record["id"])
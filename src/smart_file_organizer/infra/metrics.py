@@ -0,0 +1,276 @@
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+from types import TracebackType
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+)
+
+# Upper bounds (seconds) for timers; also the default for other histograms
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0, 120.0)
+PROMETHEUS_PREFIX = "smart_organizer_"
+
+Labels = Tuple[Tuple[str, str], ...]
+_M = TypeVar("_M")
+
+
+class Counter:
+    """Monotonic total; safe to increment from several threads."""
+
+    def __init__(self) -> None:
+        self.value: Union[int, float] = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: Union[int, float] = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class Histogram:
+    """Observations counted into fixed buckets, plus their count and sum."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.bounds = tuple(sorted(buckets))
+        # One slot per bound plus the implicit +Inf bucket
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        slot = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[slot] += 1
+            self.count += 1
+            self.sum += value
+
+    def cumulative(self) -> List[Tuple[float, int]]:
+        """(upper bound, observations at or below it), ending with +Inf."""
+        total = 0
+        result = []
+        for bound, count in zip(self.bounds + (math.inf,), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+class Timer:
+    """Context manager that observes its elapsed seconds into a histogram."""
+
+    __slots__ = ("_histogram", "_start")
+
+    def __init__(self, histogram: Histogram):
+        self._histogram = histogram
+        self._start = 0.0
+
+    def __enter__(self) -> "Timer":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc: Optional[BaseException],
+        tb: Optional[TracebackType],
+    ) -> None:
+        self._histogram.observe(time.perf_counter() - self._start)
+
+
+class _NullCounter(Counter):
+    def inc(self, amount: Union[int, float] = 1) -> None:
+        pass
+
+
+class _NullHistogram(Histogram):
+    def observe(self, value: float) -> None:
+        pass
+
+
+class _NullTimer(Timer):
+    def __enter__(self) -> "Timer":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc: Optional[BaseException],
+        tb: Optional[TracebackType],
+    ) -> None:
+        pass
+
+
+class MetricsRegistry:
+    """
+    Named counters and histograms, optionally labelled, dumped as JSON or
+    in the Prometheus text exposition format.
+
+    A disabled registry hands out shared no-op instruments, so code can
+    instrument itself unconditionally: the cost is one method call that
+    does nothing. Components fetch their instruments once, up front, where
+    they can; `timer()` returns a fresh Timer per call so it is safe to use
+    from several threads at once.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._help: Dict[str, str] = {}
+        self._counters: Dict[str, Dict[Labels, Counter]] = {}
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._lock = threading.Lock()
+        self._null_counter = _NullCounter()
+        self._null_histogram = _NullHistogram(())
+        self._null_timer = _NullTimer(self._null_histogram)
+
+    def counter(self, name: str, help: str = "", **labels: str) -> Counter:
+        if not self.enabled:
+            return self._null_counter
+        return self._get(self._counters, name, help, labels, Counter)
+
+    def histogram(
+        self,
+        name: str,
+        help: str = "",
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+        **labels: str,
+    ) -> Histogram:
+        if not self.enabled:
+            return self._null_histogram
+        return self._get(
+            self._histograms, name, help, labels, lambda: Histogram(buckets)
+        )
+
+    def timer(self, name: str, help: str = "", **labels: str) -> Timer:
+        """Times a block into the histogram `name` (which should end _seconds)."""
+        if not self.enabled:
+            return self._null_timer
+        return Timer(self._get(self._histograms, name, help, labels, Histogram))
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Every metric as plain data, grouped by name."""
+        result: Dict[str, Any] = {}
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                result[name] = {
+                    "type": "counter",
+                    "help": self._help.get(name, ""),
+                    "series": [
+                        {"labels": dict(labels), "value": c.value}
+                        for labels, c in sorted(series.items())
+                    ],
+                }
+            for name, hseries in sorted(self._histograms.items()):
+                result[name] = {
+                    "type": "histogram",
+                    "help": self._help.get(name, ""),
+                    "series": [
+                        {
+                            "labels": dict(labels),
+                            "count": h.count,
+                            "sum": h.sum,
+                            "buckets": {
+                                _format_bound(bound): count
+                                for bound, count in h.cumulative()
+                            },
+                        }
+                        for labels, h in sorted(hseries.items())
+                    ],
+                }
+        return result
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self) -> str:
+        """Text exposition format, as read by node_exporter's textfile collector."""
+        lines: List[str] = []
+        for name, family in sorted(self.snapshot().items()):
+            full = PROMETHEUS_PREFIX + name
+            if family["help"]:
+                lines.append(f"# HELP {full} {_escape_help(family['help'])}")
+            lines.append(f"# TYPE {full} {family['type']}")
+            for series in family["series"]:
+                labels = series["labels"]
+                if family["type"] == "counter":
+                    lines.append(f"{full}{_labels(labels)} {series['value']}")
+                    continue
+                for bound, count in series["buckets"].items():
+                    bucket = _labels({**labels, "le": bound})
+                    lines.append(f"{full}_bucket{bucket} {count}")
+                lines.append(f"{full}_sum{_labels(labels)} {series['sum']}")
+                lines.append(f"{full}_count{_labels(labels)} {series['count']}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: Path) -> None:
+        """
+        Writes the textfile atomically (temp file + rename in the same
+        directory), so the collector never reads a half-written file.
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(self.to_prometheus())
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def _get(
+        self,
+        table: Dict[str, Dict[Labels, _M]],
+        name: str,
+        help: str,
+        labels: Dict[str, str],
+        factory: Callable[[], _M],
+    ) -> _M:
+        key = tuple(sorted(labels.items()))
+        series = table.get(name)
+        metric = series.get(key) if series is not None else None
+        if metric is not None:
+            return metric
+        with self._lock:
+            series = table.setdefault(name, {})
+            metric = series.get(key)
+            if metric is None:
+                metric = series[key] = factory()
+            if help:
+                self._help.setdefault(name, help)
+        return metric
+
+
+# Shared disabled registry: the default wherever metrics are optional
+NULL_METRICS = MetricsRegistry(enabled=False)
+
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if math.isinf(bound) else repr(float(bound))
+
+
+def _escape_help(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(f'{k}="{_escape_label(str(v))}"' for k, v in labels.items())
+    return "{" + pairs + "}"
@@ -0,0 +1,30 @@
+import json
+from pathlib import Path
+from typing import Any, Dict
+from ..core.rule_engine import RuleEngine
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    tomllib = None  # type: ignore[assignment]
+
+
+def load_rule_config(path: Path) -> Dict[str, Any]:
+    """Parses a rule file: TOML for *.toml, JSON otherwise."""
+    if path.suffix.lower() == ".toml":
+        if tomllib is None:
+            raise ValueError("TOML rule files need Python 3.11+; use JSON instead")
+        with path.open("rb") as f:
+            return tomllib.load(f)
+    data = json.loads(path.read_text(encoding="utf-8"))
+    if not isinstance(data, dict):
+        raise ValueError("expected an object with a 'rules' list")
+    return data
+
+
+def load_rules(path: Path) -> RuleEngine:
+    """Reads and compiles a rule file; raises ValueError on a bad config."""
+    try:
+        return RuleEngine.from_config(load_rule_config(path))
+    except ValueError as exc:
+        raise ValueError(f"{path}: {exc}") from None
@@ -0,0 +1,206 @@
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+from ..core.entities import FileNode
+
+
+class DirRecord(NamedTuple):
+    """What one directory held the last time it was listed."""
+
+    mtime_ns: int
+    files: List[FileNode]
+    subdirs: List[str]
+
+
+class ScanSnapshot:
+    """
+    Persistent SQLite record of each scanned directory's mtime and children.
+
+    A directory's mtime changes whenever an entry is added, removed or
+    renamed in it, so a directory whose mtime still matches can be replayed
+    from here instead of listed and stat()ed again. Rows are grouped by scan
+    root; writes are buffered and committed in batches like HashCache.
+    Paths are stored as raw bytes, so undecodable names survive, and one
+    instance may be shared by the parallel scanner's threads.
+    """
+
+    DB_NAME = "snapshots.sqlite3"
+    SCHEMA_VERSION = 1
+    # Never trust an mtime this close to the listing: a change in the same
+    # clock tick would leave it unchanged.
+    RACY_WINDOW_NS = 2_000_000_000
+    UNSTABLE = -1
+
+    def __init__(self, cache_dir: Path, batch_size: int = 500):
+        self.cache_dir = cache_dir
+        self.batch_size = batch_size
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(
+            str(self.cache_dir / self.DB_NAME), check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+
+        self._lock = threading.Lock()
+        self._pending: Dict[Tuple[str, str], DirRecord] = {}
+
+    def _create_schema(self) -> None:
+        (version,) = self._conn.execute("PRAGMA user_version").fetchone()
+        if version != self.SCHEMA_VERSION:
+            self._conn.execute("DROP TABLE IF EXISTS dirs")
+            self._conn.execute("DROP TABLE IF EXISTS files")
+            self._conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS dirs (
+                root BLOB NOT NULL,
+                path BLOB NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                subdirs BLOB NOT NULL,
+                PRIMARY KEY (root, path)
+            )
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS files (
+                root BLOB NOT NULL,
+                dir BLOB NOT NULL,
+                name BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                dev INTEGER NOT NULL,
+                ino INTEGER NOT NULL,
+                nlink INTEGER NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS files_by_dir ON files (root, dir)"
+        )
+        self._conn.commit()
+
+    def get(self, root: str, path: str) -> Optional[DirRecord]:
+        """Returns the directory's last recorded listing, if any."""
+        with self._lock:
+            pending = self._pending.get((root, path))
+            if pending is not None:
+                return pending
+
+            ident = (os.fsencode(root), os.fsencode(path))
+            row = self._conn.execute(
+                "SELECT mtime_ns, subdirs FROM dirs WHERE root = ? AND path = ?",
+                ident,
+            ).fetchone()
+            if row is None:
+                return None
+            rows = self._conn.execute(
+                "SELECT name, size, mtime, dev, ino, nlink FROM files "
+                "WHERE root = ? AND dir = ?",
+                ident,
+            ).fetchall()
+
+        mtime_ns, subdirs = row
+        files = [
+            FileNode(
+                path=Path(os.path.join(path, os.fsdecode(name))),
+                size=size,
+                mtime=mtime,
+                dev=dev,
+                ino=ino,
+                nlink=nlink,
+            )
+            for name, size, mtime, dev, ino, nlink in rows
+        ]
+        names = subdirs.split(b"\0") if subdirs else []
+        return DirRecord(
+            mtime_ns, files, [os.path.join(path, os.fsdecode(n)) for n in names]
+        )
+
+    def put(self, root: str, path: str, record: DirRecord, listed_ns: int) -> None:
+        """
+        Queues a fresh listing. `listed_ns` is when it was taken; an mtime
+        inside the racy window is stored as UNSTABLE so the next run lists
+        the directory again.
+        """
+        if listed_ns - record.mtime_ns < self.RACY_WINDOW_NS:
+            record = record._replace(mtime_ns=self.UNSTABLE)
+        with self._lock:
+            self._pending[(root, path)] = record
+            if len(self._pending) >= self.batch_size:
+                self._flush()
+
+    def paths(self, root: str) -> Set[str]:
+        """Every directory recorded under the root."""
+        with self._lock:
+            self._flush()
+            rows = self._conn.execute(
+                "SELECT path FROM dirs WHERE root = ?", (os.fsencode(root),)
+            ).fetchall()
+        return {os.fsdecode(path) for (path,) in rows}
+
+    def remove(self, root: str, paths: Set[str]) -> None:
+        """Forgets directories that no longer exist."""
+        with self._lock:
+            self._flush()
+            with self._conn:
+                for path in paths:
+                    self._delete(root, path)
+
+    def clear(self, root: Optional[str] = None) -> None:
+        """Drops the snapshot of one root, or of every root."""
+        with self._lock, self._conn:
+            self._pending.clear()
+            if root is None:
+                self._conn.execute("DELETE FROM dirs")
+                self._conn.execute("DELETE FROM files")
+            else:
+                key = (os.fsencode(root),)
+                self._conn.execute("DELETE FROM dirs WHERE root = ?", key)
+                self._conn.execute("DELETE FROM files WHERE root = ?", key)
+
+    def flush(self) -> None:
+        """Writes all buffered listings in a single transaction."""
+        with self._lock:
+            self._flush()
+
+    def close(self) -> None:
+        self.flush()
+        self._conn.close()
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+
+        with self._conn:
+            for (root, path), record in self._pending.items():
+                self._delete(root, path)
+                key = (os.fsencode(root), os.fsencode(path))
+                names = b"\0".join(
+                    os.fsencode(os.path.basename(d)) for d in record.subdirs
+                )
+                self._conn.execute(
+                    "INSERT INTO dirs (root, path, mtime_ns, subdirs) "
+                    "VALUES (?, ?, ?, ?)",
+                    (*key, record.mtime_ns, names),
+                )
+                self._conn.executemany(
+                    "INSERT INTO files "
+                    "(root, dir, name, size, mtime, dev, ino, nlink) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (*key, os.fsencode(n.path.name), n.size, n.mtime)
+                        + (n.dev, n.ino, n.nlink)
+                        for n in record.files
+                    ],
+                )
+        self._pending.clear()
+
+    def _delete(self, root: str, path: str) -> None:
+        key = (os.fsencode(root), os.fsencode(path))
+        self._conn.execute("DELETE FROM dirs WHERE root = ? AND path = ?", key)
+        self._conn.execute("DELETE FROM files WHERE root = ? AND dir = ?", key)
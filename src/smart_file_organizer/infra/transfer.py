@@ -0,0 +1,178 @@
+import errno
+import os
+import shutil
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import BinaryIO, Dict
+
+# ioctl request number for FICLONE (linux/fs.h): share extents, copy nothing
+FICLONE = 0x40049409
+# Bytes requested per copy_file_range/sendfile call; the kernel moves them
+CHUNK_SIZE = 256 * 1024 * 1024
+# Errors meaning "this primitive cannot do that here", not "the copy failed"
+_UNSUPPORTED = {
+    errno.EXDEV,
+    errno.ENOSYS,
+    errno.EINVAL,
+    errno.EOPNOTSUPP,
+    getattr(errno, "ENOTSUP", errno.EOPNOTSUPP),
+    errno.ENOTTY,
+    errno.EBADF,
+}
+
+
+@dataclass
+class TransferStats:
+    """Totals for cross-device moves, safe to update from several threads."""
+
+    files: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+    methods: Dict[str, int] = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, size: int, seconds: float, method: str) -> None:
+        with self._lock:
+            self.files += 1
+            self.bytes += size
+            self.seconds += seconds
+            self.methods[method] = self.methods.get(method, 0) + 1
+
+    @property
+    def throughput(self) -> float:
+        """Bytes copied per second of copy time."""
+        return self.bytes / self.seconds if self.seconds else 0.0
+
+
+def copy_file(src: Path, dest: Path) -> str:
+    """
+    Copies a regular file's data without a userspace buffer where possible.
+    Tries a reflink clone, then copy_file_range, then sendfile, then a plain
+    buffered copy. Returns the name of the method that did the work.
+    """
+    with open(src, "rb") as fsrc, open(dest, "wb") as fdst:
+        in_fd, out_fd = fsrc.fileno(), fdst.fileno()
+        size = os.fstat(in_fd).st_size
+
+        if _reflink(in_fd, out_fd):
+            method = "reflink"
+        elif _copy_range(in_fd, out_fd, size):
+            method = "copy_file_range"
+        elif _sendfile(in_fd, out_fd, size):
+            method = "sendfile"
+        else:
+            _copy_buffered(fsrc, fdst)
+            method = "read/write"
+
+        fdst.flush()
+        # The source is unlinked next; its data must be durable here first
+        os.fsync(out_fd)
+    return method
+
+
+def move_across_devices(src: Path, dest: Path, stats: TransferStats) -> None:
+    """
+    Moves a file to another filesystem: copy, preserve metadata, verify the
+    size, make the new directory entry durable, and only then unlink the
+    source. A failed copy leaves the source untouched and removes the
+    partial destination.
+    """
+    start = time.perf_counter()
+    expected = os.stat(src).st_size
+    try:
+        method = copy_file(src, dest)
+        shutil.copystat(src, dest)
+        copied = os.stat(dest).st_size
+        if copied != expected:
+            raise OSError(
+                errno.EIO, f"Size mismatch after copy ({copied} != {expected})", src
+            )
+        # The file's data is synced; its name must be too, or a crash after
+        # the unlink below could leave neither copy
+        _fsync_dir(dest.parent)
+    except BaseException:
+        try:
+            os.unlink(dest)
+        except OSError:
+            pass
+        raise
+
+    os.unlink(src)
+    stats.record(expected, time.perf_counter() - start, method)
+
+
+def _reflink(in_fd: int, out_fd: int) -> bool:
+    try:
+        import fcntl
+    except ImportError:  # Not available on Windows
+        return False
+    try:
+        fcntl.ioctl(out_fd, FICLONE, in_fd)
+        return True
+    except OSError as e:
+        if e.errno in _UNSUPPORTED:
+            return False
+        raise
+
+
+def _copy_range(in_fd: int, out_fd: int, size: int) -> bool:
+    if not hasattr(os, "copy_file_range"):
+        return False
+    copied = 0
+    while copied < size:
+        try:
+            count = os.copy_file_range(in_fd, out_fd, CHUNK_SIZE)
+        except OSError as e:
+            # Only a refusal on the first call can be retried another way
+            if copied == 0 and e.errno in _UNSUPPORTED:
+                return False
+            raise
+        if count == 0:
+            # Some filesystems answer 0 instead of EXDEV/ENOSYS
+            if copied == 0:
+                return False
+            break
+        copied += count
+    return True
+
+
+def _sendfile(in_fd: int, out_fd: int, size: int) -> bool:
+    if not hasattr(os, "sendfile"):
+        return False
+    offset = 0
+    while offset < size:
+        try:
+            count = os.sendfile(out_fd, in_fd, offset, CHUNK_SIZE)
+        except OSError as e:
+            if offset == 0 and e.errno in _UNSUPPORTED:
+                return False
+            raise
+        if count == 0:
+            if offset == 0:
+                return False
+            break
+        offset += count
+    return True
+
+
+def _fsync_dir(path: Path) -> None:
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return  # Directories cannot be opened here (Windows)
+    try:
+        os.fsync(fd)
+    except OSError as e:
+        if e.errno not in _UNSUPPORTED:
+            raise
+    finally:
+        os.close(fd)
+
+
+def _copy_buffered(fsrc: BinaryIO, fdst: BinaryIO) -> None:
+    fsrc.seek(0)
+    fdst.seek(0)
+    fdst.truncate()
+    shutil.copyfileobj(fsrc, fdst, 8 * 1024 * 1024)
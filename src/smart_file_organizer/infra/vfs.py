@@ -0,0 +1,375 @@
+import errno
+import os
+import stat
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+from .interfaces import FileSystemProvider
+
+
+class _Node:
+    """One name in the overlay: a file or a directory."""
+
+    __slots__ = ("is_dir", "entry", "real_path", "children", "complete")
+
+    def __init__(
+        self,
+        is_dir: bool,
+        entry: Any = None,
+        real_path: Optional[str] = None,
+        complete: bool = True,
+    ):
+        self.is_dir = is_dir
+        # Real DirEntry (or VirtualEntry) the node was loaded from, if any
+        self.entry = entry
+        # Where a directory's real children live; None once they are copied in
+        self.real_path = real_path
+        # A complete directory holds its whole listing. Otherwise `children`
+        # only has the subdirectories on the way to a change, and everything
+        # else is still read from real_path.
+        self.children: Dict[str, "_Node"] = {}
+        self.complete = complete
+
+
+class _PathEntry:
+    """Stands in for the DirEntry of a real directory whose parent was not listed."""
+
+    def __init__(self, fs: FileSystemProvider, path: str):
+        self.path = path
+        self.name = os.path.basename(path)
+        self._fs = fs
+
+    def stat(self, follow_symlinks: bool = True) -> os.stat_result:
+        return self._fs.stat(Path(self.path))
+
+
+class VirtualEntry:
+    """
+    DirEntry look-alike for names that only exist in the overlay. Metadata
+    comes from the entry the data was moved from, if there was one.
+    """
+
+    def __init__(self, path: str, is_dir: bool, origin: Any = None, dev: int = 0):
+        self.path = path
+        self.name = os.path.basename(path)
+        self._is_dir = is_dir
+        self._origin = origin
+        self._dev = dev
+
+    def is_dir(self, follow_symlinks: bool = True) -> bool:
+        return self._is_dir
+
+    def is_file(self, follow_symlinks: bool = True) -> bool:
+        return not self._is_dir
+
+    def is_symlink(self) -> bool:
+        return False
+
+    def stat(self, follow_symlinks: bool = True) -> os.stat_result:
+        if self._origin is not None:
+            result: os.stat_result = self._origin.stat(follow_symlinks=follow_symlinks)
+            return result
+        now = time.time()
+        mode = (stat.S_IFDIR | 0o755) if self._is_dir else (stat.S_IFREG | 0o644)
+        return os.stat_result((mode, 0, self._dev, 1, 0, 0, 0, now, now, now))
+
+    def inode(self) -> int:
+        return 0
+
+    def __repr__(self) -> str:
+        return f"<VirtualEntry '{self.name}'>"
+
+
+class OverlayTree:
+    """
+    In-memory trie of planned filesystem changes over the real tree.
+
+    Only directories whose listing the plan changes are copied in, with one
+    scandir() just before their first change; the directories above them
+    are kept as bare nodes so paths can be followed down. Everything else
+    is passed straight through: reading a directory the plan has not
+    touched is a plain scandir() and holds nothing afterwards. Moves,
+    deletions, mkdir and rmdir only edit the trie, so scandir() and
+    exists() answer for the tree as it will be once the plan has run.
+
+    The trie is guarded by a lock, as scanners and the move pool call in
+    from several threads; disk reads happen outside it.
+    """
+
+    def __init__(self, real_fs: FileSystemProvider):
+        self.real_fs = real_fs
+        self._roots: Dict[str, _Node] = {}
+        self._root_devs: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def exists(self, path: Path) -> bool:
+        with self._lock:
+            node, real_path = self._resolve(path)
+        if real_path is not None:
+            return self.real_fs.exists(Path(real_path))
+        return node is not None
+
+    def scandir(self, path: Path) -> Iterator[Any]:
+        with self._lock:
+            node, real_path = self._resolve(path)
+            if node is not None:
+                if not node.is_dir:
+                    raise NotADirectoryError(
+                        errno.ENOTDIR, "Not a directory", str(path)
+                    )
+                if node.complete:
+                    return iter([child.entry for child in node.children.values()])
+                real_path = node.real_path
+        if real_path is None:
+            raise FileNotFoundError(
+                errno.ENOENT, "No such file or directory", str(path)
+            )
+        entries = self.real_fs.scandir(Path(real_path))
+        virtual_path = str(self._absolute(path))
+        if virtual_path == real_path:
+            return entries
+        # Below a moved directory: relabel the entries with where they will be
+        return (
+            VirtualEntry(os.path.join(virtual_path, entry.name), _is_dir(entry), entry)
+            for entry in entries
+        )
+
+    def stat(self, path: Path) -> os.stat_result:
+        with self._lock:
+            node, real_path = self._resolve(path)
+        if real_path is not None:
+            return self.real_fs.stat(Path(real_path))
+        if node is None:
+            raise FileNotFoundError(
+                errno.ENOENT, "No such file or directory", str(path)
+            )
+        if node.entry is None:
+            return self.real_fs.stat(path)  # A root
+        result: os.stat_result = node.entry.stat(follow_symlinks=False)
+        return result
+
+    def mkdir(self, path: Path) -> None:
+        """Creates the directory and any missing parents (like makedirs)."""
+        with self._lock:
+            parent, name = self._parent(path, create=True)
+            if name is None:
+                return
+            node = self._child(parent, name)
+            if node is None:
+                self._materialize(parent)
+                entry = VirtualEntry(
+                    str(self._absolute(path)), True, dev=self._dev(parent)
+                )
+                parent.children[name] = _Node(True, entry)
+            elif not node.is_dir:
+                raise FileExistsError(errno.EEXIST, "File exists", str(path))
+
+    def move(self, src: Path, dest: Path) -> None:
+        """
+        Moves a file or directory in the overlay. A source the overlay does
+        not know still produces a destination file, as dry runs always did.
+        """
+        with self._lock:
+            node = self._detach(src)
+            parent, name = self._parent(dest, create=True)
+            if name is None:
+                return
+            existing = self._child(parent, name)
+            if existing is not None and existing.is_dir and node is not None:
+                # Like shutil.move: the source lands inside an existing directory
+                parent, name = existing, src.name
+                dest = dest / name
+            self._materialize(parent)
+
+            path = str(self._absolute(dest))
+            if node is None:
+                node = _Node(False, VirtualEntry(path, False, dev=self._dev(parent)))
+            else:
+                node.entry = VirtualEntry(
+                    path, node.is_dir, node.entry, self._dev(parent)
+                )
+                if node.is_dir:
+                    self._rebase(node, path)
+            parent.children[name] = node
+
+    def remove(self, path: Path) -> None:
+        with self._lock:
+            self._detach(path)
+
+    def rmdir(self, path: Path) -> None:
+        with self._lock:
+            node = self._lookup(path)
+            if node is None:
+                return
+            if not node.is_dir:
+                raise NotADirectoryError(errno.ENOTDIR, "Not a directory", str(path))
+            self._materialize(node)
+            if node.children:
+                raise OSError(errno.ENOTEMPTY, "Directory not empty", str(path))
+            self._detach(path)
+
+    def _absolute(self, path: Path) -> Path:
+        return path if path.is_absolute() else Path(os.path.abspath(path))
+
+    def _root(self, anchor: str) -> _Node:
+        root = self._roots.get(anchor)
+        if root is None:
+            root = self._roots[anchor] = _Node(True, None, anchor, complete=False)
+            try:
+                self._root_devs[id(root)] = self.real_fs.stat(Path(anchor)).st_dev
+            except OSError:
+                self._root_devs[id(root)] = 0
+        return root
+
+    def _resolve(self, path: Path) -> Tuple[Optional[_Node], Optional[str]]:
+        """
+        Follows `path` down the trie without touching the disk. Returns its
+        node, or, once the walk leaves the trie through a directory the plan
+        has not changed, None and the real path to ask the disk about.
+        (None, None) means the path does not exist in the planned tree.
+        """
+        parts = self._absolute(path).parts
+        node = self._root(parts[0])
+        for index, name in enumerate(parts[1:], 1):
+            child = node.children.get(name)
+            if child is None:
+                if node.complete or node.real_path is None:
+                    return None, None
+                return None, os.path.join(node.real_path, *parts[index:])
+            node = child
+        return node, None
+
+    def _child(self, node: _Node, name: str) -> Optional[_Node]:
+        """
+        A child of a directory, as a node. In a directory that is not copied
+        in yet, a real subdirectory is added as a bare node (one stat()); a
+        file is only reached by copying in its directory.
+        """
+        child = node.children.get(name)
+        if child is not None or node.complete or node.real_path is None:
+            return child
+        real_path = os.path.join(node.real_path, name)
+        try:
+            is_dir = stat.S_ISDIR(self.real_fs.stat(Path(real_path)).st_mode)
+        except OSError:
+            return None
+        if not is_dir:
+            self._materialize(node)
+            return node.children.get(name)
+        entry: Any = _PathEntry(self.real_fs, real_path)
+        moved_to = self._moved_to(node)
+        if moved_to is not None:
+            entry = VirtualEntry(os.path.join(moved_to, name), True, entry)
+        child = node.children[name] = _Node(True, entry, real_path, complete=False)
+        return child
+
+    def _materialize(self, node: _Node) -> None:
+        """Copies a directory's real listing in, ahead of its first change."""
+        if node.complete:
+            return
+        listing: Dict[str, _Node] = {}
+        moved_to = self._moved_to(node)
+        if node.real_path is not None:
+            try:
+                for entry in self.real_fs.scandir(Path(node.real_path)):
+                    is_dir = _is_dir(entry)
+                    real_path = entry.path if is_dir else None
+                    if moved_to is not None:
+                        # A directory moved before it was read: relabel it
+                        entry = VirtualEntry(
+                            os.path.join(moved_to, entry.name), is_dir, entry
+                        )
+                    child = node.children.get(entry.name)
+                    if child is None:
+                        child = _Node(is_dir, entry, real_path, complete=not is_dir)
+                    else:
+                        child.entry = entry  # A bare node on the way to a change
+                    listing[entry.name] = child
+            except OSError:
+                pass  # Unreadable: nothing below it is visible
+        # Bare nodes already hold changes: they stay even if gone from disk
+        for name, child in node.children.items():
+            listing.setdefault(name, child)
+        # Published whole, so a concurrent reader never sees half a listing
+        node.children = listing
+        node.complete = True
+        node.real_path = None
+
+    def _lookup(self, path: Path) -> Optional[_Node]:
+        parts = self._absolute(path).parts
+        node = self._root(parts[0])
+        for name in parts[1:]:
+            if not node.is_dir:
+                return None
+            child = self._child(node, name)
+            if child is None:
+                return None
+            node = child
+        return node
+
+    def _parent(self, path: Path, create: bool) -> Tuple[_Node, Optional[str]]:
+        """The directory node holding `path` (made on demand) and its name."""
+        parts = self._absolute(path).parts
+        node = self._root(parts[0])
+        if len(parts) == 1:
+            return node, None
+        for index, name in enumerate(parts[1:-1], 1):
+            child = self._child(node, name)
+            if child is None or not child.is_dir:
+                if not create:
+                    raise FileNotFoundError(
+                        errno.ENOENT, "No such file or directory", str(path)
+                    )
+                self._materialize(node)
+                entry = VirtualEntry(
+                    str(Path(*parts[: index + 1])), True, dev=self._dev(node)
+                )
+                child = node.children[name] = _Node(True, entry)
+            node = child
+        return node, parts[-1]
+
+    def _detach(self, path: Path) -> Optional[_Node]:
+        try:
+            parent, name = self._parent(path, create=False)
+        except FileNotFoundError:
+            return None
+        if name is None or self._child(parent, name) is None:
+            return None
+        self._materialize(parent)
+        return parent.children.pop(name, None)
+
+    def _rebase(self, node: _Node, path: str) -> None:
+        """Re-labels the nodes already in a moved directory's subtree."""
+        for name, child in node.children.items():
+            child_path = os.path.join(path, name)
+            child.entry = VirtualEntry(
+                child_path, child.is_dir, child.entry, self._entry_dev(child)
+            )
+            if child.is_dir:
+                self._rebase(child, child_path)
+
+    @staticmethod
+    def _moved_to(node: _Node) -> Optional[str]:
+        """Where a directory will be, if the plan moves it (or a parent)."""
+        return node.entry.path if isinstance(node.entry, VirtualEntry) else None
+
+    def _dev(self, node: _Node) -> int:
+        """Device of a directory node; new children inherit it."""
+        if node.entry is None:
+            return self._root_devs.get(id(node), 0)
+        return self._entry_dev(node)
+
+    @staticmethod
+    def _entry_dev(node: _Node) -> int:
+        try:
+            return int(node.entry.stat(follow_symlinks=False).st_dev)
+        except (OSError, AttributeError):
+            return 0
+
+
+def _is_dir(entry: Any) -> bool:
+    try:
+        return bool(entry.is_dir())
+    except OSError:
+        return False
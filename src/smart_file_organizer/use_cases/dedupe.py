@@ -1,59 +1,735 @@
-from typing import List, Dict, Iterator, Iterable, Optional
+import os
+import queue
+import time
+from typing import (
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
 from collections import defaultdict
-from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
 from ..core.entities import FileNode
-from ..infra.hashing import HashService
+from ..core.table import FileTable
+from ..infra.hashing import DEFAULT_ALGORITHM, FAST_ALGORITHMS, HashService
+from ..infra.hash_cache import CacheKey, HashCache
+from ..infra.metrics import NULL_METRICS, MetricsRegistry, Timer
 
+SampleRanges = Tuple[Tuple[int, int], ...]
+SampleJob = Tuple[Path, SampleRanges, str]
+# (path, mtime, dev, ino, nlink): all a size bucket keeps for its first file
+_CompactRecord = Tuple[str, float, int, int, int]
+# (results, worker pid, seconds spent) for one batch of full hashes
+BatchResult = Tuple[List[Tuple[Path, Optional[str]]], int, float]
 
-def _hash_file_helper(path: Path) -> tuple[Path, Optional[str]]:
-    service = HashService()
+# Prefilter stages, run in order between the size filter and the full hash.
+PREFILTER_STAGES = ("head", "tail")
+DEFAULT_SAMPLE_SIZE = 4096
+
+# Small files are packed into one pool task until either limit is reached.
+DEFAULT_BATCH_BYTES = 8 * 1024 * 1024
+DEFAULT_BATCH_FILES = 256
+
+
+@dataclass
+class WorkerStats:
+    """Hashing work done by one pool process."""
+
+    files: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+
+    @property
+    def throughput(self) -> float:
+        """Bytes hashed per second of worker time."""
+        return self.bytes / self.seconds if self.seconds else 0.0
+
+
+def _hash_file_helper(
+    path: Path, algorithm: str = DEFAULT_ALGORITHM
+) -> tuple[Path, Optional[str]]:
+    service = HashService(algorithm)
     try:
         return path, service.get_hash(path)
     except OSError:
         return path, None
 
 
+def _hash_batch_helper(paths: Sequence[Path], algorithm: str) -> BatchResult:
+    start = time.perf_counter()
+    results = [_hash_file_helper(path, algorithm) for path in paths]
+    return results, os.getpid(), time.perf_counter() - start
+
+
+def _plan_batches(
+    files: Iterable[FileNode], max_bytes: int, max_files: int
+) -> List[List[FileNode]]:
+    """
+    Packs files into hashing tasks, largest first. A file at or over the
+    byte budget gets a task of its own; smaller ones share a task until
+    the budget or the file limit is reached.
+    """
+    batches: List[List[FileNode]] = []
+    current: List[FileNode] = []
+    current_bytes = 0
+
+    for node in sorted(files, key=lambda n: n.size, reverse=True):
+        if node.size >= max_bytes:
+            batches.append([node])
+            continue
+        if current and (
+            current_bytes + node.size > max_bytes or len(current) >= max_files
+        ):
+            batches.append(current)
+            current, current_bytes = [], 0
+        current.append(node)
+        current_bytes += node.size
+
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _submit_batch(
+    executor: Executor, paths: Tuple[Path, ...], algorithm: str
+) -> "Future[BatchResult]":
+    """
+    Queues a batch of full hashes. A pool a dead worker has broken takes no
+    more work; the batch then comes back failed, for _store_batch to retry.
+    """
+    try:
+        return executor.submit(_hash_batch_helper, paths, algorithm)
+    except BrokenProcessPool as exc:
+        future: "Future[BatchResult]" = Future()
+        future.set_exception(exc)
+        return future
+
+
+def _sample_file_helper(job: SampleJob) -> tuple[Path, Optional[str]]:
+    path, ranges, algorithm = job
+    service = HashService(algorithm)
+    try:
+        return path, service.get_sample_hash(path, ranges)
+    except OSError:
+        return path, None
+
+
+def _stage_ranges(stage: str, size: int, block: int) -> SampleRanges:
+    """Byte windows read by a prefilter stage for a file of the given size."""
+    if stage == "head":
+        return ((0, block),)
+    if stage == "tail":
+        # Last block plus one from the middle of the file.
+        return ((size - block, block), ((size - block) // 2, block))
+    raise ValueError(f"Unknown prefilter stage: {stage}")
+
+
 class DuplicateFinder:
-    def __init__(self, hash_service: HashService):
+    def __init__(
+        self,
+        hash_service: HashService,
+        cache: Optional[HashCache] = None,
+        prefilter: Sequence[str] = PREFILTER_STAGES,
+        sample_size: int = DEFAULT_SAMPLE_SIZE,
+        fast_algorithm: Optional[str] = None,
+        batch_bytes: int = DEFAULT_BATCH_BYTES,
+        batch_files: int = DEFAULT_BATCH_FILES,
+        metrics: MetricsRegistry = NULL_METRICS,
+        pipeline: bool = False,
+    ):
         self.hasher = hash_service
+        self.algorithm = hash_service.algorithm
+        self.fast_algorithm = fast_algorithm
+        self.cache = cache
+        self.prefilter = tuple(prefilter)
+        self.sample_size = sample_size
+        self.batch_bytes = batch_bytes
+        self.batch_files = batch_files
+        self.metrics = metrics
+        # Hash while the walk is still running (see _iter_pipelined)
+        self.pipeline = pipeline
+        self.files_seen = 0
+        self.worker_stats: Dict[int, WorkerStats] = {}
+        # Names that share one inode: reported apart, they waste no space
+        self.hardlink_sets: List[List[FileNode]] = []
+
+        if self.algorithm in FAST_ALGORITHMS:
+            raise ValueError(
+                f"'{self.algorithm}' is a 32-bit checksum and cannot confirm "
+                "duplicates; use it as fast_algorithm instead"
+            )
+        for stage in self.prefilter:
+            _stage_ranges(stage, 0, sample_size)  # Fail fast on typos
+        if fast_algorithm is not None:
+            HashService(fast_algorithm)
 
     def find_duplicates(self, files: Iterable[FileNode]) -> Dict[str, List[FileNode]]:
         """
         Identifies duplicates using parallel processing for the hashing stage.
         """
-        # Stage 1: Size Filtering (O(1))
-        size_groups: Dict[int, List[FileNode]] = defaultdict(list)
-        for node in files:
-            size_groups[node.size].append(node)
+        return dict(self.iter_duplicates(files))
 
-        # Prepare candidates for hashing
-        candidates: List[FileNode] = []
-        for size, nodes in size_groups.items():
-            if size > 0 and len(nodes) > 1:
-                candidates.extend(nodes)
+    def iter_duplicates(
+        self, files: Iterable[FileNode]
+    ) -> Iterator[Tuple[str, List[FileNode]]]:
+        """
+        Streaming variant of find_duplicates: consumes the scan lazily and
+        yields (digest, nodes) groups as soon as each one is confirmed.
+        """
+        groups_found = self.metrics.counter(
+            "dedupe_groups_total", "Duplicate groups confirmed"
+        )
+        wasted = self.metrics.counter(
+            "dedupe_wasted_bytes_total", "Bytes held by redundant copies"
+        )
+        if self.pipeline and not isinstance(files, FileTable):
+            found = self._iter_pipelined(files)
+        else:
+            found = self._iter_duplicates(files)
+        for file_hash, group in found:
+            groups_found.inc()
+            wasted.inc(group[0].size * (len(group) - 1))
+            yield file_hash, group
 
-        duplicates: Dict[str, List[FileNode]] = defaultdict(list)
+    def _stage(self, name: str) -> Timer:
+        """
+        Times one dedupe stage. A stage that yields groups also counts the
+        time its consumer spends on them.
+        """
+        return self.metrics.timer(
+            "dedupe_stage_seconds", "Wall time per dedupe stage", stage=name
+        )
 
-        # Stage 2: Parallel Hashing
-        # Map paths to nodes for easy lookup after hashing
-        path_map = {node.path: node for node in candidates}
-        paths_to_hash = [node.path for node in candidates]
+    def _survivors(self, stage: str, groups: List[List[FileNode]]) -> None:
+        self.metrics.counter(
+            "dedupe_candidates_total",
+            "Files still colliding after a stage",
+            stage=stage,
+        ).inc(sum(len(g) for g in groups))
 
-        if not paths_to_hash:
-            return {}
+    def _iter_duplicates(
+        self, files: Iterable[FileNode]
+    ) -> Iterator[Tuple[str, List[FileNode]]]:
+        # Stage 1: Size Filtering (O(1))
+        with self._stage("size"):
+            if isinstance(files, FileTable):
+                self.files_seen = len(files)
+                groups = self._table_size_groups(files)
+            else:
+                groups = self._stream_size_groups(files)
+        self.metrics.counter("dedupe_files_total", "Files considered").inc(
+            self.files_seen
+        )
+        self._survivors("size", groups)
 
         print(
-            f"Hashing {len(paths_to_hash)} candidate files using parallel processing..."
+            f"Found {self.files_seen} files, "
+            f"{sum(len(g) for g in groups)} share a size. Analyzing..."
         )
 
-        with ProcessPoolExecutor() as executor:
-            results = executor.map(_hash_file_helper, paths_to_hash)
+        # Hash each physical inode once, however many names it has
+        with self._stage("hardlinks"):
+            groups = self._collapse_hardlinks(groups)
+        self._survivors("hardlinks", groups)
+
+        # Stage 2: Cache lookup (one stat per file instead of a full read)
+        keys: Dict[Path, CacheKey] = {}
+        try:
+            with self._stage("cache"):
+                known = self._cached_digests(groups, self.algorithm, keys)
+
+            # Groups that are fully cached need no I/O at all
+            pending: List[List[FileNode]] = []
+            for group in groups:
+                if all(n.path in known for n in group):
+                    yield from self._confirmed(group, known)
+                else:
+                    pending.append(group)
+
+            if pending:
+                with ProcessPoolExecutor() as executor:
+                    # Stage 3: Partial-hash prefilter (head, then tail + middle)
+                    for stage in self.prefilter:
+                        with self._stage(stage):
+                            pending = self._run_stage(executor, stage, pending)
+                        self._survivors(stage, pending)
+
+                    # Stage 4: Optional fast whole-file checksum
+                    if self.fast_algorithm is not None:
+                        with self._stage("checksum"):
+                            pending = self._run_checksum(executor, pending, keys)
+                        self._survivors("checksum", pending)
+
+                    # Stage 5: Cryptographic hash of the surviving, uncached files
+                    with self._stage("hash"):
+                        yield from self._hash_candidates(executor, pending, known, keys)
+                self._report_workers()
+        finally:
+            if self.cache is not None:
+                self.cache.flush()
+
+    def _stream_size_groups(self, files: Iterable[FileNode]) -> List[List[FileNode]]:
+        """
+        Buckets a node stream by size without keeping the whole stream alive.
+        A size seen once holds only a compact tuple; a FileNode list is built
+        when a second file of that size arrives.
+        """
+        buckets: Dict[int, Union[_CompactRecord, List[FileNode]]] = {}
+        self.files_seen = 0
+
+        for node in files:
+            self.files_seen += 1
+            if node.size == 0:
+                continue
+            bucket = buckets.get(node.size)
+            if bucket is None:
+                buckets[node.size] = (
+                    str(node.path),
+                    node.mtime,
+                    node.dev,
+                    node.ino,
+                    node.nlink,
+                )
+            elif isinstance(bucket, tuple):
+                path, mtime, dev, ino, nlink = bucket
+                first = FileNode(
+                    path=Path(path),
+                    size=node.size,
+                    mtime=mtime,
+                    dev=dev,
+                    ino=ino,
+                    nlink=nlink,
+                )
+                buckets[node.size] = [first, node]
+            else:
+                bucket.append(node)
+
+        return [b for b in buckets.values() if isinstance(b, list)]
+
+    def _collapse_hardlinks(self, groups: List[List[FileNode]]) -> List[List[FileNode]]:
+        """
+        Keeps one representative name per (dev, ino) in each size group and
+        records the names that share it in `hardlink_sets`.
+        """
+        collapsed: List[List[FileNode]] = []
+        for group in groups:
+            names: Dict[Tuple[int, int], List[FileNode]] = {}
+            representatives: List[FileNode] = []
+            for node in group:
+                inode = node.inode_key if node.nlink > 1 else None
+                if inode is None:
+                    representatives.append(node)
+                elif inode in names:
+                    names[inode].append(node)
+                else:
+                    names[inode] = [node]
+                    representatives.append(node)
+
+            self.hardlink_sets.extend(n for n in names.values() if len(n) > 1)
+            if len(representatives) > 1:
+                collapsed.append(representatives)
+        return collapsed
+
+    @staticmethod
+    def _table_size_groups(table: FileTable) -> List[List[FileNode]]:
+        """Size grouping straight off the size column; only candidates get nodes."""
+        size_counts: Dict[int, int] = defaultdict(int)
+        for size in table.sizes:
+            size_counts[size] += 1
+
+        rows: Dict[int, List[int]] = defaultdict(list)
+        for index, size in enumerate(table.sizes):
+            if size > 0 and size_counts[size] > 1:
+                rows[size].append(index)
+
+        return [[table[i] for i in indices] for indices in rows.values()]
+
+    def _cached_digests(
+        self, groups: List[List[FileNode]], algorithm: str, keys: Dict[Path, CacheKey]
+    ) -> Dict[Path, str]:
+        """Looks up cached digests, recording each file's cache key on the way."""
+        found: Dict[Path, str] = {}
+        if self.cache is None:
+            return found
+
+        for group in groups:
+            for node in group:
+                key = keys.get(node.path)
+                if key is None:
+                    try:
+                        key = keys[node.path] = self.cache.key_for(node.path)
+                    except OSError:
+                        continue
+                cached = self.cache.get(key, algorithm)
+                if cached is not None:
+                    found[node.path] = cached
+        if self.metrics.enabled:
+            lookups = sum(len(g) for g in groups)
+            name, help = "hash_cache_lookups_total", "Digest cache lookups"
+            self.metrics.counter(name, help, result="hit").inc(len(found))
+            self.metrics.counter(name, help, result="miss").inc(lookups - len(found))
+        return found
+
+    def _hash_and_store(
+        self,
+        executor: Executor,
+        files: List[FileNode],
+        algorithm: str,
+        keys: Dict[Path, CacheKey],
+    ) -> Iterator[Tuple[Path, Optional[str]]]:
+        """
+        Hashes files on the pool in size-aware batches, yielding results as
+        each batch completes and writing fresh digests back to the cache.
+        """
+        batches = _plan_batches(files, self.batch_bytes, self.batch_files)
+        futures = {
+            _submit_batch(executor, tuple(n.path for n in batch), algorithm): batch
+            for batch in batches
+        }
+        for future in as_completed(futures):
+            yield from self._store_batch(futures[future], future, algorithm, keys)
+
+    def _store_batch(
+        self,
+        batch: List[FileNode],
+        future: "Future[BatchResult]",
+        algorithm: str,
+        keys: Dict[Path, CacheKey],
+    ) -> List[Tuple[Path, Optional[str]]]:
+        """
+        Takes a finished batch: accounts for the worker's time, writes fresh
+        digests back to the cache and returns the (path, digest) results.
+        """
+        try:
+            results, pid, seconds = future.result()
+        except BrokenProcessPool:
+            results, pid, seconds = self._retry_batch(batch, algorithm)
+        size = sum(n.size for n in batch)
+        stats = self.worker_stats.setdefault(pid, WorkerStats())
+        stats.files += len(results)
+        stats.bytes += size
+        stats.seconds += seconds
+
+        # Same series HashService feeds when it hashes in this process
+        self.metrics.counter(
+            "hash_files_total", "Files hashed in full", algorithm=algorithm
+        ).inc(len(results))
+        self.metrics.counter(
+            "hash_bytes_total", "Bytes hashed in full", algorithm=algorithm
+        ).inc(size)
+        self.metrics.histogram(
+            "hash_batch_seconds", "Worker time per batch of full hashes"
+        ).observe(seconds)
+
+        for path, file_hash in results:
+            if file_hash and self.cache is not None and path in keys:
+                self.cache.put(keys[path], algorithm, file_hash)
+        return results
+
+    def _iter_pipelined(
+        self, files: Iterable[FileNode]
+    ) -> Iterator[Tuple[str, List[FileNode]]]:
+        """
+        Overlaps the walk with hashing, so end-to-end time tends towards
+        max(scan, hash) rather than their sum. Files are bucketed by size as
+        they arrive; when a bucket gains its second member both go to the
+        pool, and later arrivals follow as they come. Small files are packed
+        into batches like the staged path does.
+
+        The prefilter stages and the fast pass split complete groups, which
+        only exist once the walk ends, so here every candidate is hashed in
+        full. Groups are yielded after the walk, each as soon as its last
+        member's digest is in.
+        """
+        buckets: Dict[int, Union[_CompactRecord, List[FileNode]]] = {}
+        known: Dict[Path, str] = {}
+        keys: Dict[Path, CacheKey] = {}
+        # Paths sent to the pool whose digests have not come back yet
+        pending: Set[Path] = set()
+        inodes: Set[Tuple[int, int]] = set()
+        finished: "queue.SimpleQueue[Tuple[List[FileNode], Future[BatchResult]]]"
+        finished = queue.SimpleQueue()
+        batch: List[FileNode] = []
+        batch_bytes = 0
+        in_flight = 0
+        self.files_seen = 0
+
+        def flush(executor: Executor) -> None:
+            nonlocal batch, batch_bytes, in_flight
+            if not batch:
+                return
+            nodes, batch, batch_bytes = batch, [], 0
+            future = _submit_batch(
+                executor, tuple(n.path for n in nodes), self.algorithm
+            )
+            in_flight += 1
+            # Runs on the pool's thread: just hand the batch back to this one
+            future.add_done_callback(lambda f: finished.put((nodes, f)))
+
+        def submit(executor: Executor, node: FileNode) -> None:
+            nonlocal batch_bytes
+            inode = node.inode_key if node.nlink > 1 else None
+            if inode is not None:
+                if inode in inodes:
+                    return  # Another name of an inode already on its way
+                inodes.add(inode)
+            if self.cache is not None:
+                try:
+                    key = keys[node.path] = self.cache.key_for(node.path)
+                    cached = self.cache.get(key, self.algorithm)
+                except OSError:
+                    cached = None
+                if cached is not None:
+                    known[node.path] = cached
+                    return
+            pending.add(node.path)
+            batch.append(node)
+            batch_bytes += node.size
+            if batch_bytes >= self.batch_bytes or len(batch) >= self.batch_files:
+                flush(executor)
+
+        def collect(block: bool) -> List[Path]:
+            """Folds in finished batches; returns the paths they settled."""
+            nonlocal in_flight
+            settled: List[Path] = []
+            while in_flight and (block or not finished.empty()):
+                nodes, future = finished.get()
+                in_flight -= 1
+                for path, file_hash in self._store_batch(
+                    nodes, future, self.algorithm, keys
+                ):
+                    pending.discard(path)
+                    if file_hash:
+                        known[path] = file_hash
+                    settled.append(path)
+                block = False
+            return settled
+
+        try:
+            with self._stage("pipeline"), ProcessPoolExecutor() as executor:
+                for node in files:
+                    self.files_seen += 1
+                    if node.size == 0:
+                        continue
+                    bucket = buckets.get(node.size)
+                    if bucket is None:
+                        buckets[node.size] = (
+                            str(node.path),
+                            node.mtime,
+                            node.dev,
+                            node.ino,
+                            node.nlink,
+                        )
+                        continue
+                    if isinstance(bucket, tuple):
+                        path, mtime, dev, ino, nlink = bucket
+                        first = FileNode(
+                            path=Path(path),
+                            size=node.size,
+                            mtime=mtime,
+                            dev=dev,
+                            ino=ino,
+                            nlink=nlink,
+                        )
+                        buckets[node.size] = [first, node]
+                        submit(executor, first)
+                    else:
+                        bucket.append(node)
+                    submit(executor, node)
+                    collect(block=False)
+                flush(executor)
+
+                groups = [b for b in buckets.values() if isinstance(b, list)]
+                print(
+                    f"Found {self.files_seen} files, "
+                    f"{sum(len(g) for g in groups)} share a size; "
+                    f"{len(pending)} still hashing..."
+                )
+                # Representatives are the first name of each inode, which
+                # is the one that was submitted
+                groups = self._collapse_hardlinks(groups)
+
+                owner: Dict[Path, int] = {}
+                remaining: List[int] = []
+                for index, group in enumerate(groups):
+                    waiting = [n.path for n in group if n.path in pending]
+                    owner.update((path, index) for path in waiting)
+                    remaining.append(len(waiting))
+                    if not waiting:
+                        yield from self._confirmed(group, known)
+
+                while in_flight:
+                    for settled in collect(block=True):
+                        index = owner.get(settled, -1)
+                        if index < 0:
+                            continue
+                        remaining[index] -= 1
+                        if not remaining[index]:
+                            yield from self._confirmed(groups[index], known)
+            self._report_workers()
+        finally:
+            if self.cache is not None:
+                self.cache.flush()
+
+    def _retry_batch(self, batch: List[FileNode], algorithm: str) -> BatchResult:
+        """
+        Hashes a batch again after a worker died under it. A worker killed
+        by a signal (SIGBUS from a file truncated under its mmap, the OOM
+        killer) breaks the whole pool and fails every batch still in it, so
+        each of those gets a fresh one-worker pool of its own. A batch that
+        brings that one down too is given up, like an unreadable file;
+        files large enough to be mapped always form a batch of their own.
+        """
+        paths = tuple(n.path for n in batch)
+        self.metrics.counter(
+            "dedupe_batch_retries_total", "Batches re-run after a worker died"
+        ).inc()
+        try:
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                return executor.submit(_hash_batch_helper, paths, algorithm).result()
+        except BrokenProcessPool:
+            print(
+                f"[WARNING] Hashing crashed twice on {paths[0]}"
+                f"{f' and {len(paths) - 1} more' if len(paths) > 1 else ''}; skipped."
+            )
+            return [(path, None) for path in paths], os.getpid(), 0.0
+
+    def _report_workers(self) -> None:
+        for pid, stats in sorted(self.worker_stats.items()):
+            print(
+                f"Worker {pid}: {stats.files} files, "
+                f"{stats.bytes / (1024 * 1024):.1f} MB "
+                f"at {stats.throughput / (1024 * 1024):.1f} MB/s"
+            )
+
+    @staticmethod
+    def _confirmed(
+        group: List[FileNode], known: Dict[Path, str]
+    ) -> Iterator[Tuple[str, List[FileNode]]]:
+        """Splits a hashed group by digest, yielding only real collisions."""
+        by_digest: Dict[str, List[FileNode]] = defaultdict(list)
+        for node in group:
+            file_hash = known.pop(node.path, None)
+            if file_hash:
+                by_digest[file_hash].append(node)
+        for file_hash, nodes in by_digest.items():
+            if len(nodes) > 1:
+                yield file_hash, nodes
+
+    def _run_stage(
+        self, executor: Executor, stage: str, groups: List[List[FileNode]]
+    ) -> List[List[FileNode]]:
+        """Splits each group by sample digest and keeps only colliding subgroups."""
+        survivors: List[List[FileNode]] = []
+        jobs: List[SampleJob] = []
+        sampled: List[List[FileNode]] = []
+        reads = 0
+
+        for group in groups:
+            size = group[0].size
+            ranges = _stage_ranges(stage, size, self.sample_size)
+            # Only worth it when the stage reads less than half the file
+            if sum(length for _, length in ranges) * 2 >= size:
+                survivors.append(group)
+                continue
+            sampled.append(group)
+            # Samples are throwaway, so they use the cheapest algorithm on offer
+            algorithm = self.fast_algorithm or self.algorithm
+            jobs.extend((node.path, ranges, algorithm) for node in group)
+            reads += len(ranges) * len(group)
+
+        if not jobs:
+            return survivors
+        self.metrics.counter(
+            "fs_syscalls_total", "Filesystem calls issued", op="pread"
+        ).inc(reads)
+
+        digests = dict(executor.map(_sample_file_helper, jobs))
+
+        kept = 0
+        for group in sampled:
+            split: Dict[str, List[FileNode]] = defaultdict(list)
+            for node in group:
+                digest = digests.get(node.path)
+                if digest:
+                    split[digest].append(node)
+            for subgroup in split.values():
+                if len(subgroup) > 1:
+                    survivors.append(subgroup)
+                    kept += len(subgroup)
+
+        print(f"Prefilter '{stage}': {len(jobs)} sampled, {kept} still collide")
+        return survivors
+
+    def _run_checksum(
+        self,
+        executor: Executor,
+        groups: List[List[FileNode]],
+        keys: Dict[Path, CacheKey],
+    ) -> List[List[FileNode]]:
+        """
+        Splits groups by a cheap whole-file checksum, so the cryptographic
+        hash only runs among files that still agree.
+        """
+        assert self.fast_algorithm is not None
+        algorithm = self.fast_algorithm
+        checksums = self._cached_digests(groups, algorithm, keys)
+        todo = [n for g in groups for n in g if n.path not in checksums]
+        for path, checksum in self._hash_and_store(executor, todo, algorithm, keys):
+            if checksum:
+                checksums[path] = checksum
+
+        survivors: List[List[FileNode]] = []
+        for group in groups:
+            split: Dict[str, List[FileNode]] = defaultdict(list)
+            for node in group:
+                if node.path in checksums:
+                    split[checksums[node.path]].append(node)
+            survivors.extend(g for g in split.values() if len(g) > 1)
+
+        kept = sum(len(g) for g in survivors)
+        print(f"Fast pass '{algorithm}': {len(todo)} read, {kept} still collide")
+        return survivors
+
+    def _hash_candidates(
+        self,
+        executor: Executor,
+        groups: List[List[FileNode]],
+        known: Dict[Path, str],
+        keys: Dict[Path, CacheKey],
+    ) -> Iterator[Tuple[str, List[FileNode]]]:
+        # A group is reported as soon as the last of its members is hashed
+        owner: Dict[Path, int] = {}
+        remaining: List[int] = []
+        to_hash: List[FileNode] = []
+        for index, group in enumerate(groups):
+            todo = [n for n in group if n.path not in known]
+            for node in todo:
+                owner[node.path] = index
+            remaining.append(len(todo))
+            to_hash.extend(todo)
+
+        for index, group in enumerate(groups):
+            if not remaining[index]:
+                yield from self._confirmed(group, known)
 
-            for path, file_hash in results:
-                if file_hash:
-                    node = path_map[path]
-                    duplicates[file_hash].append(node)
+        if not to_hash:
+            return
+        print(f"Hashing {len(to_hash)} candidate files " "using parallel processing...")
 
-        # Final Filter
-        return {k: v for k, v in duplicates.items() if len(v) > 1}
+        results = self._hash_and_store(executor, to_hash, self.algorithm, keys)
+        for path, file_hash in results:
+            if file_hash:
+                known[path] = file_hash
+            index = owner[path]
+            remaining[index] -= 1
+            if not remaining[index]:
+                yield from self._confirmed(groups[index], known)
@@ -1,112 +1,441 @@
+import errno
+import heapq
+import itertools
 import logging
-from typing import List, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Iterable, Iterator, Optional, Sequence, Set, Tuple
 from pathlib import Path
 from ..core.entities import FileNode, ActionRecord, ActionType
 from ..core.rules import OrganizationRule
 from ..infra.interfaces import FileSystemProvider
+from ..infra.journal import PlanJournal
+from ..infra.metrics import NULL_METRICS, MetricsRegistry, Timer
+from ..infra.transfer import TransferStats
 
+# Nodes handed to OrganizationRule.get_destinations at a time when planning
+# from a stream; a list or FileTable is passed whole.
+PLAN_BATCH = 65536
+
+
+class DestinationIndex:
+    """
+    Names taken in each target directory, read with one scandir() per
+    directory and updated as the plan claims names. It also remembers the
+    next counter to try per (directory, stem, suffix), so the n-th clash of
+    IMG_0001.jpg costs one set lookup instead of n exists() probes.
+    """
 
-class Organizer:
     def __init__(self, fs_provider: FileSystemProvider):
         self.fs = fs_provider
+        self._names: Dict[Path, Set[str]] = {}
+        self._next_counter: Dict[Tuple[Path, str, str], int] = {}
+
+    def names_in(self, directory: Path) -> Set[str]:
+        names = self._names.get(directory)
+        if names is None:
+            try:
+                names = {entry.name for entry in self.fs.scandir(directory)}
+            except OSError:
+                names = set()  # Not created yet: every name is free
+            self._names[directory] = names
+        return names
+
+    def claim(self, target: Path) -> Path:
+        """Returns target, or target with the first free _N suffix, and reserves it."""
+        names = self.names_in(target.parent)
+        if target.name not in names:
+            names.add(target.name)
+            return target
+
+        stem, suffix = target.stem, target.suffix
+        key = (target.parent, stem, suffix)
+        counter = self._next_counter.get(key, 1)
+        while f"{stem}_{counter}{suffix}" in names:
+            counter += 1
+
+        name = f"{stem}_{counter}{suffix}"
+        names.add(name)
+        self._next_counter[key] = counter + 1
+        return target.parent / name
+
+
+class Organizer:
+    def __init__(
+        self,
+        fs_provider: FileSystemProvider,
+        workers: int = 1,
+        metrics: MetricsRegistry = NULL_METRICS,
+    ):
+        self.fs = fs_provider
+        self.workers = max(1, workers)
+        self.metrics = metrics
         self.logger = logging.getLogger(__name__)
+        self.destinations = DestinationIndex(fs_provider)
+        self._devices: Dict[Path, Optional[int]] = {}
+        # Source directories of successful moves: the only ones that can
+        # have become empty because of this organizer.
+        self.vacated: Set[Path] = set()
 
     def plan_organization(
         self, files: Iterable[FileNode], rule: OrganizationRule, root: Path
     ) -> List[ActionRecord]:
-        """Generates a list of safe move operations based on the rule."""
-        plan = []
-        for node in files:
-            target_dir = rule.get_destination(node, root)
-            target_path = target_dir / node.path.name
+        """
+        Generates a list of safe move operations based on the rule.
+        Accepts any iterable of nodes, including a FileTable.
+        """
+        plan: List[ActionRecord] = []
+        # Fresh per plan: earlier moves may have changed the targets
+        self.destinations = DestinationIndex(self.fs)
+        with self._stage("plan"):
+            self._plan(files, rule, root, plan)
+        self.metrics.counter("organize_planned_total", "Moves planned").inc(len(plan))
+        return plan
 
-            safe_target = self._resolve_collision(target_path)
+    def _stage(self, name: str) -> Timer:
+        return self.metrics.timer(
+            "organize_stage_seconds", "Wall time per organize stage", stage=name
+        )
 
-            if safe_target.resolve() == node.path.resolve():
-                continue
+    def _plan(
+        self,
+        files: Iterable[FileNode],
+        rule: OrganizationRule,
+        root: Path,
+        plan: List[ActionRecord],
+    ) -> None:
+        reason = f"Organized by {rule.__class__.__name__}"
+        for batch in _batches(files, PLAN_BATCH):
+            targets = rule.get_destinations(batch, root)
+            for node, target_dir in zip(batch, targets):
+                target_path = target_dir / node.path.name
 
-            plan.append(
-                ActionRecord(
-                    action_type=ActionType.MOVE,
-                    src_path=node.path,
-                    dest_path=safe_target,
-                    reason=f"Organized by {rule.__class__.__name__}",
+                # Already in place (its name is taken by itself, not a clash)
+                if target_path == node.path:
+                    continue
+
+                safe_target = self._resolve_collision(target_path)
+
+                plan.append(
+                    ActionRecord(
+                        action_type=ActionType.MOVE,
+                        src_path=node.path,
+                        dest_path=safe_target,
+                        reason=reason,
+                    )
                 )
-            )
-        return plan
 
-    def execute_plan(self, plan: List[ActionRecord]) -> None:
-        """Executes the action plan using the FileSystemProvider."""
+    def execute_plan(
+        self, plan: List[ActionRecord], journal: Optional[PlanJournal] = None
+    ) -> None:
+        """
+        Executes the action plan using the FileSystemProvider.
+
+        Each destination directory is created once, up front. Moves whose
+        source and destination share a device go through fs.rename (a single
+        rename(2)); the rest fall back to fs.move. Planned destinations are
+        unique, so moves are independent and run on a bounded thread pool.
+
+        With a journal (whose plan was recorded via PlanJournal.begin), each
+        outcome is logged so an interrupted run can be resumed or undone.
+        """
+        with self._stage("execute"):
+            self._execute(plan, journal)
+
+    def _execute(
+        self, plan: List[ActionRecord], journal: Optional[PlanJournal]
+    ) -> None:
         success_count = 0
         fail_count = 0
         total_actions = len(plan)
 
         print(f"Executing {total_actions} operations...")
 
-        for index, action in enumerate(plan, 1):
-            try:
-                print(
-                    f"\rProcessing {index}/{total_actions}: {action.src_path.name[:30]}...",
-                    end="",
-                    flush=True,
-                )
+        moves = [a for a in plan if a.action_type == ActionType.MOVE and a.dest_path]
+        self._devices = {}
+        failed_dirs = self._create_directories(moves)
+        jobs: List[Tuple[ActionRecord, bool]] = []
+        for action in moves:
+            assert action.dest_path is not None
+            if action.dest_path.parent in failed_dirs:
+                fail_count += 1
+                reason = f"cannot create {action.dest_path.parent}"
+                self.logger.error(f"Failed to move {action.src_path}: {reason}")
+                if journal is not None:
+                    journal.mark_failed(action, reason)
+                continue
+            jobs.append((action, self._same_device(action)))
 
-                if action.action_type == ActionType.MOVE:
-                    if action.dest_path:
-                        self.fs.mkdir(action.dest_path.parent)
-                        self.fs.move(action.src_path, action.dest_path)
-                        success_count += 1
+        renames = sum(1 for _, fast in jobs if fast)
+        # Redrawing the progress line per file would cost more than a rename
+        step = max(1, len(jobs) // 100)
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            results = executor.map(lambda job: self._run_move(*job), jobs)
+            for index, ((action, _), error) in enumerate(zip(jobs, results), 1):
+                if error is None:
+                    success_count += 1
+                    self.vacated.add(action.src_path.parent)
+                    if journal is not None:
+                        journal.mark_done(action)
+                else:
+                    fail_count += 1
+                    if journal is not None:
+                        journal.mark_failed(action, error)
+                if index % step == 0 or index == len(jobs):
+                    print(
+                        f"\rProcessing {index}/{len(jobs)}: "
+                        f"{action.src_path.name[:30]}...",
+                        end="",
+                        flush=True,
+                    )
 
-            except (OSError, PermissionError) as e:
-                fail_count += 1
-                self.logger.error(f"Failed to move {action.src_path}: {e}")
+        if journal is not None:
+            journal.flush()
 
         # Clear progress line
         print("\r" + " " * 60 + "\r", end="")
+        moves_total = "organize_moves_total", "Executed moves by outcome"
+        self.metrics.counter(*moves_total, result="done").inc(success_count)
+        self.metrics.counter(*moves_total, result="failed").inc(fail_count)
+        self.metrics.counter(
+            "organize_same_device_total", "Moves attempted as a single rename"
+        ).inc(renames)
 
         self.logger.info(
             f"Execution Complete. Success: {success_count}, Failed: {fail_count}"
         )
         print(f"Execution Summary:")
         print(f"  - Successful Moves: {success_count}")
+        print(f"  - Same-device Renames: {renames}")
+        transfer = self.fs.transfer_stats()
+        if isinstance(transfer, TransferStats) and transfer.files:
+            methods = ", ".join(
+                f"{m}: {n}" for m, n in sorted(transfer.methods.items())
+            )
+            print(
+                f"  - Cross-device Copies: {transfer.files} "
+                f"({transfer.bytes / (1024 * 1024):.1f} MB "
+                f"at {transfer.throughput / (1024 * 1024):.1f} MB/s; {methods})"
+            )
         print(f"  - Failed Operations: {fail_count}")
 
-    def cleanup_empty_dirs(self, root: Path) -> None:
-        """Recursively removes empty directories (Bottom-Up)."""
-        self._remove_empty_recursive(root)
+    def _create_directories(self, moves: List[ActionRecord]) -> Set[Path]:
+        """Creates every distinct destination directory once; returns failures."""
+        failed: Set[Path] = set()
+        directories = {a.dest_path.parent for a in moves if a.dest_path}
+        self.metrics.counter(
+            "fs_syscalls_total", "Filesystem calls issued", op="mkdir"
+        ).inc(len(directories))
+        for directory in sorted(directories):
+            try:
+                self.fs.mkdir(directory)
+            except OSError as e:
+                failed.add(directory)
+                self.logger.error(f"Failed to create {directory}: {e}")
+        return failed
 
-    def _remove_empty_recursive(self, path: Path) -> None:
-        if not self.fs.exists(path):
-            return
+    def _same_device(self, action: ActionRecord) -> bool:
+        assert action.dest_path is not None
+        source = self._device(action.src_path.parent)
+        target = self._device(action.dest_path.parent)
+        return source is not None and source == target
 
+    def _device(self, directory: Path) -> Optional[int]:
+        """
+        Device id of a directory, cached per directory. A destination that
+        does not exist yet (dry run) lives on its nearest existing ancestor.
+        """
+        if directory in self._devices:
+            return self._devices[directory]
         try:
-            entries = list(self.fs.scandir(path))
-            for entry in entries:
-                if entry.is_dir(follow_symlinks=False):
-                    self._remove_empty_recursive(Path(entry.path))
+            device: Optional[int] = self.fs.device_of(directory)
+        except OSError:
+            parent = directory.parent
+            device = None if parent == directory else self._device(parent)
+        self._devices[directory] = device
+        return device
+
+    def _run_move(self, action: ActionRecord, same_device: bool) -> Optional[str]:
+        """Performs one move; returns None on success, else the error text."""
+        assert action.dest_path is not None
+        with self.metrics.timer("organize_move_seconds", "Time per executed move"):
+            return self._move(action, same_device)
+
+    def _move(self, action: ActionRecord, same_device: bool) -> Optional[str]:
+        assert action.dest_path is not None
+        try:
+            if same_device:
+                try:
+                    self.fs.rename(action.src_path, action.dest_path)
+                    return None
+                except OSError as e:
+                    if e.errno != errno.EXDEV:  # e.g. bind mounts share st_dev
+                        raise
+            self.fs.move(action.src_path, action.dest_path)
+            return None
+        except OSError as e:
+            self.logger.error(f"Failed to move {action.src_path}: {e}")
+            return str(e)
+
+    def resume_plan(self, journal: PlanJournal) -> None:
+        """Runs the journal's outstanding actions; no rescan, no replan."""
+        pending: List[ActionRecord] = []
+        for action in journal.outstanding():
+            dest = action.dest_path
+            if (
+                dest is not None
+                and not self.fs.exists(action.src_path)
+                and self.fs.exists(dest)
+            ):
+                # Moved before the crash; only its outcome was not synced
+                journal.mark_done(action)
+            else:
+                pending.append(action)
+
+        print(f"Resuming {len(pending)} of {len(journal.actions)} planned actions...")
+        self.execute_plan(pending, journal)
+
+    def undo_plan(self, journal: PlanJournal) -> None:
+        """Moves completed actions back, newest first, logging each reversal."""
+        success_count = 0
+        fail_count = 0
+        for action in reversed(journal.completed()):
+            dest = action.dest_path
+            if action.action_type != ActionType.MOVE or dest is None:
+                continue
+            try:
+                if self.fs.exists(action.src_path):
+                    raise FileExistsError(f"{action.src_path} exists again")
+                self.fs.mkdir(action.src_path.parent)
+                self.fs.move(dest, action.src_path)
+                journal.mark_undone(action)
+                success_count += 1
+            except OSError as e:
+                fail_count += 1
+                self.logger.error(f"Failed to undo {dest}: {e}")
+        journal.flush()
+
+        self.logger.info(
+            f"Undo Complete. Success: {success_count}, Failed: {fail_count}"
+        )
+        print(f"Undo Summary:")
+        print(f"  - Restored Files: {success_count}")
+        print(f"  - Failed Operations: {fail_count}")
+
+    def cleanup_empty_dirs(self, root: Path, touched_only: bool = False) -> int:
+        """
+        Removes empty directories bottom-up and returns how many went.
+        With touched_only, only directories vacated by executed moves (and
+        their ancestors below root) are examined instead of the whole tree.
+        """
+        with self._stage("cleanup"):
+            if touched_only:
+                removed = self._remove_empty_vacated(root, self.vacated)
+            else:
+                removed = self._remove_empty_tree(root)
+        self.metrics.counter(
+            "organize_dirs_removed_total", "Empty directories removed"
+        ).inc(removed)
+        return removed
+
+    def _remove_empty_tree(self, root: Path) -> int:
+        """
+        One post-order walk: every directory is listed exactly once and its
+        entry count is kept. A removed child decrements its parent's count,
+        so a parent whose count reaches zero is removed without re-listing.
+        """
+        if not self.fs.exists(root):
+            return 0
+
+        removed = 0
+        scandirs = self.metrics.counter(
+            "fs_syscalls_total", "Filesystem calls issued", op="scandir"
+        )
+        remaining: Dict[Path, int] = {}
+        parents: Dict[Path, Optional[Path]] = {root: None}
+        stack: List[Tuple[Path, bool]] = [(root, False)]
+        while stack:
+            path, listed = stack.pop()
+            if not listed:
+                scandirs.inc()
+                try:
+                    entries = list(self.fs.scandir(path))
+                except OSError:
+                    continue  # Skip locked folders (they stay, and so do parents)
+                remaining[path] = len(entries)
+                stack.append((path, True))
+                for entry in entries:
+                    try:
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    if is_dir:
+                        child = Path(entry.path)
+                        parents[child] = path
+                        stack.append((child, False))
+                continue
+
+            if remaining[path] == 0 and self._rmdir(path):
+                removed += 1
+                parent = parents[path]
+                if parent is not None:
+                    remaining[parent] -= 1
+        return removed
+
+    def _remove_empty_vacated(self, root: Path, vacated: Iterable[Path]) -> int:
+        """
+        Checks only the given directories, deepest first, climbing to a
+        parent only when its child was removed. Each is listed at most once.
+        """
+        removed = 0
+        scandirs = self.metrics.counter(
+            "fs_syscalls_total", "Filesystem calls issued", op="scandir"
+        )
+        # Max-heap on depth, so children are settled before their parents
+        heap = [
+            (-len(p.parts), p) for p in set(vacated) if p == root or root in p.parents
+        ]
+        heapq.heapify(heap)
+        seen: Set[Path] = set()
+        while heap:
+            _, path = heapq.heappop(heap)
+            if path in seen:
+                continue
+            seen.add(path)
+            scandirs.inc()
+            try:
+                if any(True for _ in self.fs.scandir(path)):
+                    continue
+            except OSError:
+                continue
+            if self._rmdir(path):
+                removed += 1
+                if path != root:
+                    heapq.heappush(heap, (-len(path.parent.parts), path.parent))
+        return removed
 
-            if not any(self.fs.scandir(path)):
-                self.logger.info(f"Removing empty directory: {path}")
-                self.fs.rmdir(path)
-        except (OSError, PermissionError):
-            pass  # Skip locked folders
+    def _rmdir(self, path: Path) -> bool:
+        try:
+            self.logger.info(f"Removing empty directory: {path}")
+            self.fs.rmdir(path)
+            return True
+        except OSError:
+            return False  # Skip locked folders
 
     def _resolve_collision(self, target: Path) -> Path:
         """
-        Linear probing: if file.txt exists, try file_1.txt, file_2.txt...
-        Uses the FileSystemProvider to check existence (works in Dry Run!).
+        If file.txt is taken, use file_1.txt, file_2.txt... Taken names come
+        from the destination index (one scandir per target directory via the
+        FileSystemProvider, so it works in Dry Run!) plus names already
+        claimed by this plan.
         """
-        if not self.fs.exists(target):
-            return target
+        return self.destinations.claim(target)
 
-        stem = target.stem
-        suffix = target.suffix
-        parent = target.parent
-        counter = 1
 
-        while True:
-            new_name = f"{stem}_{counter}{suffix}"
-            candidate = parent / new_name
-            if not self.fs.exists(candidate):
-                return candidate
-            counter += 1
+def _batches(files: Iterable[FileNode], size: int) -> Iterator[Sequence[FileNode]]:
+    """The files in batches: a sequence as it is, a stream `size` at a time."""
+    if isinstance(files, Sequence):
+        yield files
+        return
+    iterator = iter(files)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
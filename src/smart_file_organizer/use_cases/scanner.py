@@ -1,15 +1,67 @@
 import logging
+import queue
+import threading
+import time
+from collections import deque
 from pathlib import Path
-from typing import Iterator, List
-from ..core.entities import FileNode
+from typing import Deque, Iterable, Iterator, List, Optional, Set, Tuple, Union
+from ..core.entities import ChangeType, FileChange, FileNode
 from ..infra.interfaces import FileSystemProvider
+from ..infra.metrics import NULL_METRICS, MetricsRegistry
+from ..infra.scan_snapshot import DirRecord, ScanSnapshot
+
+
+def _diff_listings(
+    before: Iterable[FileNode], after: Iterable[FileNode]
+) -> Iterator[FileChange]:
+    """Compares two listings of the same directory."""
+    previous = {node.path: node for node in before}
+    for node in after:
+        old = previous.pop(node.path, None)
+        if old is None:
+            yield FileChange(ChangeType.ADDED, node)
+        elif (old.size, old.mtime, old.ino) != (node.size, node.mtime, node.ino):
+            yield FileChange(ChangeType.MODIFIED, node)
+    for node in previous.values():
+        yield FileChange(ChangeType.REMOVED, node)
 
 
 class DirectoryScanner:
-    def __init__(self, fs_provider: FileSystemProvider):
+    def __init__(
+        self,
+        fs_provider: FileSystemProvider,
+        workers: int = 1,
+        snapshot: Optional[ScanSnapshot] = None,
+        metrics: MetricsRegistry = NULL_METRICS,
+        refresh_replayed: bool = False,
+    ):
         self.fs = fs_provider
+        self.workers = max(1, workers)
+        self.snapshot = snapshot
+        # stat() the files of replayed directories (see _refresh)
+        self.refresh_replayed = refresh_replayed
+        self.metrics = metrics
+        self._listed = metrics.counter(
+            "scan_dirs_total", "Directories walked", source="listed"
+        )
+        self._reused = metrics.counter(
+            "scan_dirs_total", "Directories walked", source="snapshot"
+        )
+        self._scandirs = metrics.counter(
+            "fs_syscalls_total", "Filesystem calls issued", op="scandir"
+        )
+        self._stats = metrics.counter(
+            "fs_syscalls_total", "Filesystem calls issued", op="stat"
+        )
         self.logger = logging.getLogger(__name__)
         self.errors: List[str] = []
+        self.dirs_listed = 0
+        self.dirs_reused = 0
+        # Parallel walks read directories on several threads
+        self._count_lock = threading.Lock()
+        self._root = ""
+        self._visited: Set[str] = set()
+        self._changes: Optional[Deque[FileChange]] = None
 
     def scan(self, root_path: Path) -> Iterator[FileNode]:
         """
@@ -24,21 +76,201 @@ class DirectoryScanner:
             self.logger.error(f"Root path does not exist: {resolved_root}")
             return
 
-        yield from self._recursive_scan(resolved_root)
+        self._root = str(resolved_root)
+        self._visited = set()
+        with self.metrics.timer("scan_seconds", "Wall time of directory walks"):
+            if self.workers > 1:
+                walk = self._parallel_scan(resolved_root)
+            else:
+                walk = self._iterative_scan(resolved_root)
+            if self.metrics.enabled:
+                walk = self._counted(walk)
+            yield from walk
+
+        # Only a complete walk proves that unvisited directories are gone
+        if self.snapshot is not None:
+            self._forget_missing()
+
+    def scan_changes(self, root_path: Path) -> Iterator[FileChange]:
+        """
+        Walks the tree like scan() but yields only the files added, removed
+        or modified since the last snapshot (everything is ADDED on the first
+        run). Requires a snapshot.
+
+        Directories with an unchanged mtime are replayed, so a file rewritten
+        in place there (which does not touch the directory) is only reported
+        with refresh_replayed.
+        """
+        if self.snapshot is None:
+            raise ValueError("scan_changes() requires a ScanSnapshot")
+
+        changes: Deque[FileChange] = deque()
+        self._changes = changes
+        try:
+            for _ in self.scan(root_path):
+                while changes:
+                    yield changes.popleft()
+            while changes:
+                yield changes.popleft()
+        finally:
+            self._changes = None
+
+    def _counted(self, walk: Iterator[FileNode]) -> Iterator[FileNode]:
+        """Totals files and bytes locally; published once the walk ends."""
+        files = size = 0
+        try:
+            for node in walk:
+                files += 1
+                size += node.size
+                yield node
+        finally:
+            self.metrics.counter("scan_files_total", "Files found").inc(files)
+            self.metrics.counter("scan_bytes_total", "Bytes in files found").inc(size)
+            self.metrics.counter("scan_errors_total", "Unreadable entries").inc(
+                len(self.errors)
+            )
+
+    def _iterative_scan(self, root: Path) -> Iterator[FileNode]:
+        """
+        Depth-first walk driven by an explicit stack, so tree depth is not
+        bounded by the interpreter's recursion limit.
+        """
+        stack = [str(root)]
+        while stack:
+            files, subdirs = self._read_directory(stack.pop())
+            yield from files
+            # Reversed so siblings are visited in listing order
+            stack.extend(reversed(subdirs))
+
+    def _read_directory(self, path: str) -> Tuple[List[FileNode], List[str]]:
+        """
+        Lists a directory, or replays it from the snapshot when its mtime
+        shows nothing was added, removed or renamed since the last scan.
+        That costs one stat() instead of a scandir() plus a stat() per entry.
+        """
+        if self.snapshot is None:
+            return self._list_directory(path)
+
+        previous = self.snapshot.get(self._root, path)
+        self._stats.inc()
+        try:
+            mtime_ns = self.fs.stat(Path(path)).st_mtime_ns
+        except FileNotFoundError:
+            # Replayed from a stale parent; left unvisited, it is forgotten
+            return [], []
+        except OSError:
+            mtime_ns = ScanSnapshot.UNSTABLE
+        self._visited.add(path)
+
+        if (
+            previous is not None
+            and mtime_ns != ScanSnapshot.UNSTABLE
+            and previous.mtime_ns == mtime_ns
+        ):
+            with self._count_lock:
+                self.dirs_reused += 1
+            self._reused.inc()
+            if not self.refresh_replayed:
+                return previous.files, previous.subdirs
+            listed_ns = time.time_ns()
+            files = self._refresh(previous.files)
+            if files is not previous.files:
+                record = DirRecord(mtime_ns, files, previous.subdirs)
+                self.snapshot.put(self._root, path, record, listed_ns)
+                if self._changes is not None:
+                    self._changes.extend(_diff_listings(previous.files, files))
+            return files, previous.subdirs
+
+        listed_ns = time.time_ns()
+        error_count = len(self.errors)
+        files, subdirs = self._list_directory(path)
+        with self._count_lock:
+            self.dirs_listed += 1
+        # A partial listing must not be replayed as if it were complete
+        if len(self.errors) == error_count:
+            record = DirRecord(mtime_ns, files, subdirs)
+            self.snapshot.put(self._root, path, record, listed_ns)
+
+        if self._changes is not None:
+            self._changes.extend(
+                _diff_listings(previous.files if previous else [], files)
+            )
+        return files, subdirs
+
+    def _refresh(self, files: List[FileNode]) -> List[FileNode]:
+        """
+        Re-stats replayed files. Rewriting a file in place leaves its
+        directory's mtime alone, so a replay alone would report the old size
+        and mtime; callers that group or compare by size ask for this. It
+        costs a stat() per file, still no scandir(). Returns `files` itself
+        when nothing changed.
+        """
+        self._stats.inc(len(files))
+        refreshed: List[FileNode] = []
+        changed = False
+        for node in files:
+            try:
+                st = self.fs.stat(node.path)
+            except OSError:
+                changed = True  # Gone since the listing: dropped
+                continue
+            current = (st.st_size, st.st_mtime, st.st_ino)
+            if current == (node.size, node.mtime, node.ino):
+                refreshed.append(node)
+                continue
+            changed = True
+            refreshed.append(
+                FileNode(
+                    path=node.path,
+                    size=st.st_size,
+                    mtime=st.st_mtime,
+                    dev=st.st_dev,
+                    ino=st.st_ino,
+                    nlink=st.st_nlink,
+                )
+            )
+        return refreshed if changed else files
+
+    def _forget_missing(self) -> None:
+        """Drops snapshot entries for directories the last walk did not reach."""
+        assert self.snapshot is not None
+        missing = self.snapshot.paths(self._root) - self._visited
+        if self._changes is not None:
+            for path in missing:
+                record = self.snapshot.get(self._root, path)
+                if record is not None:
+                    self._changes.extend(_diff_listings(record.files, []))
+        self.snapshot.remove(self._root, missing)
 
-    def _recursive_scan(self, path: Path) -> Iterator[FileNode]:
+    def _list_directory(self, path: str) -> Tuple[List[FileNode], List[str]]:
+        """
+        Reads one directory level: returns its files and its subdirectories.
+
+        Child paths are the `DirEntry.path` strings (directory + name), which
+        are already absolute because the root is resolved once in scan().
+        Resolving each file again would cost an lstat per path component.
+        """
+        files: List[FileNode] = []
+        subdirs: List[str] = []
+        self._listed.inc()
+        self._scandirs.inc()
         try:
-            for entry in self.fs.scandir(path):
+            for entry in self.fs.scandir(Path(path)):
                 try:
                     if entry.is_dir(follow_symlinks=False):
-                        yield from self._recursive_scan(Path(entry.path))
+                        subdirs.append(entry.path)
 
                     elif entry.is_file(follow_symlinks=False):
-                        stat = entry.stat()
-                        yield FileNode(
-                            path=Path(entry.path).resolve(),
-                            size=stat.st_size,
-                            mtime=stat.st_mtime,
+                        stat = entry.stat()  # Cached on the DirEntry
+                        files.append(
+                            FileNode(
+                                path=Path(entry.path),
+                                size=stat.st_size,
+                                mtime=stat.st_mtime,
+                                dev=stat.st_dev,
+                                ino=stat.st_ino,
+                                nlink=stat.st_nlink,
+                            )
                         )
                 except (PermissionError, OSError) as e:
                     self.errors.append(f"Access denied: {entry.path}")
@@ -47,3 +279,66 @@ class DirectoryScanner:
         except (PermissionError, OSError) as e:
             self.errors.append(f"Cannot access directory: {path}")
             self.logger.warning(f"Cannot traverse {path}: {e}")
+
+        self._stats.inc(len(files))
+        return files, subdirs
+
+    def _parallel_scan(self, root: Path) -> Iterator[FileNode]:
+        """
+        Walks the tree with a pool of threads sharing one directory queue.
+        Workers push subdirectories back onto the queue, so idle threads pick
+        up whatever branch is pending. Directory listings are latency-bound
+        (NFS, cold caches), so threads overlap the round-trips despite the GIL.
+        """
+        work: "queue.LifoQueue[Optional[str]]" = queue.LifoQueue()
+        results: "queue.Queue[Union[List[FileNode], Exception, None]]" = queue.Queue()
+        lock = threading.Lock()
+        stop = threading.Event()
+        pending = 1  # Directories queued or in progress
+
+        def worker() -> None:
+            nonlocal pending
+            while True:
+                path = work.get()
+                if path is None or stop.is_set():
+                    return
+                try:
+                    files, subdirs = self._read_directory(path)
+                except Exception as e:  # Surface bugs instead of hanging
+                    results.put(e)
+                    return
+                # Publish files while this directory still counts as pending,
+                # so the end marker can never overtake them.
+                if files:
+                    results.put(files)
+                with lock:
+                    pending += len(subdirs) - 1
+                    finished = pending == 0
+                for subdir in subdirs:
+                    work.put(subdir)
+                if finished:
+                    results.put(None)
+
+        work.put(str(root))
+        threads = [
+            threading.Thread(target=worker, name=f"scan-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                batch = results.get()
+                if batch is None:
+                    break
+                if isinstance(batch, Exception):
+                    raise batch
+                yield from batch
+        finally:
+            # Also runs when the consumer abandons the generator early
+            stop.set()
+            for _ in threads:
+                work.put(None)
+            for thread in threads:
+                thread.join()
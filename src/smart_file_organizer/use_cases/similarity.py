@@ -0,0 +1,132 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from ..core.entities import FileNode, SimilarPair
+from ..infra.chunk_index import ChunkIndex
+from ..infra.chunking import DEFAULT_CHUNK_SIZE, ChunkCounts, ChunkParams, chunk_file
+from ..infra.hash_cache import CacheKey, HashCache
+from ..infra.metrics import NULL_METRICS, MetricsRegistry
+
+DEFAULT_MIN_RATIO = 0.5
+DEFAULT_MIN_SIZE = 1024 * 1024
+# Chunks held by more files than this are ignored when pairing files up
+DEFAULT_MAX_FANOUT = 1024
+
+
+class SimilarityFinder:
+    """
+    Finds pairs of files that are mostly, but not necessarily entirely,
+    identical: VM images, database dumps or archives that differ in a few
+    blocks.
+
+    Each file is split into content-defined chunks (see infra.chunking) in
+    one sequential read, on a process pool. The chunk lists go to an on-disk
+    ChunkIndex, which also spares unchanged files from being read again on
+    the next run; the pairs and their shared bytes come from a join in that
+    index, so memory stays independent of how much data is compared.
+    """
+
+    def __init__(
+        self,
+        index: ChunkIndex,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        min_ratio: float = DEFAULT_MIN_RATIO,
+        min_size: int = DEFAULT_MIN_SIZE,
+        max_fanout: Optional[int] = DEFAULT_MAX_FANOUT,
+        workers: Optional[int] = None,
+        metrics: MetricsRegistry = NULL_METRICS,
+    ):
+        self.index = index
+        self.params = ChunkParams.for_average(chunk_size)
+        self.min_ratio = min_ratio
+        self.min_size = min_size
+        self.max_fanout = max_fanout
+        self.workers = workers
+        self.metrics = metrics
+        self.files_chunked = 0
+        self.files_reused = 0
+        self.bytes_chunked = 0
+
+    def find_similar(self, files: Iterable[FileNode]) -> List[SimilarPair]:
+        """Pairs at or above min_ratio, most similar first."""
+        # Hardlinked names share their data: only one of them is compared
+        candidates: List[FileNode] = []
+        inodes: Set[Tuple[int, int]] = set()
+        for node in files:
+            if node.size < self.min_size:
+                continue
+            inode = node.inode_key
+            if inode is not None:
+                if inode in inodes:
+                    continue
+                inodes.add(inode)
+            candidates.append(node)
+
+        print(f"Found {len(candidates)} files of {self.min_size} bytes or more.")
+        avg_size = self.params.avg_size
+        by_id: Dict[int, FileNode] = {}
+        pending: List[Tuple[FileNode, CacheKey]] = []
+        with self.metrics.timer(
+            "similar_stage_seconds", "Wall time per similarity stage", stage="index"
+        ):
+            for node in candidates:
+                try:
+                    key = HashCache.key_for(node.path)
+                except OSError:
+                    continue
+                file_id = self.index.lookup(key, avg_size)
+                if file_id is None:
+                    pending.append((node, key))
+                else:
+                    by_id[file_id] = node
+        self.files_reused = len(by_id)
+
+        with self.metrics.timer("similar_stage_seconds", stage="chunk"):
+            for node, key, chunks in self._chunk(pending):
+                by_id[self.index.store(key, avg_size, chunks)] = node
+                self.files_chunked += 1
+                self.bytes_chunked += key.size
+
+        with self.metrics.timer("similar_stage_seconds", stage="join"):
+            shared = self.index.shared_bytes(list(by_id), self.max_fanout)
+
+        pairs = [SimilarPair(by_id[a], by_id[b], nbytes) for a, b, nbytes in shared]
+        pairs = [pair for pair in pairs if pair.ratio >= self.min_ratio]
+        pairs.sort(key=lambda pair: (-pair.ratio, str(pair.first.path)))
+
+        self.metrics.counter(
+            "similar_files_total", "Files compared by chunks", source="index"
+        ).inc(self.files_reused)
+        self.metrics.counter("similar_files_total", source="read").inc(
+            self.files_chunked
+        )
+        self.metrics.counter(
+            "similar_bytes_chunked_total", "Bytes split into chunks"
+        ).inc(self.bytes_chunked)
+        return pairs
+
+    def _chunk(
+        self, pending: List[Tuple[FileNode, CacheKey]]
+    ) -> Iterator[Tuple[FileNode, CacheKey, ChunkCounts]]:
+        """Chunks the files, in parallel when there is more than one."""
+        if not pending:
+            return
+        if len(pending) == 1 or self.workers == 1:
+            for node, key in pending:
+                try:
+                    yield node, key, chunk_file(node.path, self.params)
+                except OSError:
+                    continue
+            return
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            futures = {
+                executor.submit(chunk_file, node.path, self.params): (node, key)
+                for node, key in pending
+            }
+            for future in as_completed(futures):
+                # Dropped once handled, so only unstored chunk maps stay alive
+                node, key = futures.pop(future)
+                try:
+                    chunks = future.result()
+                except OSError:
+                    continue
+                yield node, key, chunks
@@ -0,0 +1,174 @@
+import hashlib
+import io
+import os
+import random
+from unittest.mock import patch
+import pytest
+from smart_file_organizer.core.entities import FileNode
+from smart_file_organizer.infra import chunking
+from smart_file_organizer.infra.chunk_index import ChunkIndex
+from smart_file_organizer.infra.chunking import (
+    ANCHOR,
+    ChunkParams,
+    chunk_file,
+    gear_hash,
+    iter_chunks,
+)
+from smart_file_organizer.infra.hash_cache import CacheKey, HashCache
+from smart_file_organizer.use_cases.similarity import SimilarityFinder
+
+
+def naive_chunks(data, params):
+    """Byte-by-byte reference for iter_chunks."""
+    limit = 1 << (32 - (params.bits - chunking.ANCHOR_BITS))
+    table = chunking._ANCHOR_TABLE
+    chunks, start = [], 0
+    for end in range(1, len(data) + 1):
+        anchored = data[max(0, end - len(ANCHOR)) : end].translate(table) == ANCHOR
+        match = anchored and gear_hash(data[max(0, end - 32) : end]) < limit
+        size = end - start
+        if size >= params.max_size or (match and size >= params.min_size):
+            digest = hashlib.blake2b(data[start:end], digest_size=16).digest()
+            chunks.append((size, digest))
+            start = end
+    if start < len(data):
+        digest = hashlib.blake2b(data[start:], digest_size=16).digest()
+        chunks.append((len(data) - start, digest))
+    return chunks
+
+
+def test_chunks_match_the_reference_across_read_boundaries():
+    rng = random.Random(3)
+    # A zero run forces max_size cuts in the middle
+    data = rng.randbytes(300_000) + bytes(60_000) + rng.randbytes(200_000)
+    params = ChunkParams.for_average(4096)
+    expected = naive_chunks(data, params)
+
+    assert sum(size for size, _ in expected) == len(data)
+    assert len(expected) > 50
+    for read_size in (1000, 4096, 65536):
+        with patch.object(chunking, "READ_SIZE", read_size):
+            assert list(iter_chunks(io.BytesIO(data), params)) == expected
+
+
+def test_an_insertion_only_changes_nearby_chunks():
+    rng = random.Random(7)
+    data = rng.randbytes(1 << 20)
+    edited = data[:300_000] + b"inserted" + data[300_000:]
+    params = ChunkParams.for_average(4096)
+
+    before = {digest for _, digest in iter_chunks(io.BytesIO(data), params)}
+    after = [digest for _, digest in iter_chunks(io.BytesIO(edited), params)]
+    assert len(after) - sum(d in before for d in after) <= 2
+
+
+def test_chunk_params_and_repeat_counts(tmp_path):
+    assert ChunkParams.for_average(65536) == (65536, 16384, 262144, 16)
+    for bad in (1000, 512, 3 << 12):
+        with pytest.raises(ValueError):
+            ChunkParams.for_average(bad)
+
+    block = random.Random(1).randbytes(4096)
+    path = tmp_path / "repeats"
+    path.write_bytes(block * 64)  # Cuts repeat with the block
+    counts = chunk_file(path, ChunkParams.for_average(1024))
+    assert sum(size * n for size, n in counts.values()) == 64 * 4096
+    assert max(n for _, n in counts.values()) > 1
+
+
+def test_chunk_index_reuses_fresh_entries_and_drops_stale_ones(tmp_path):
+    path = tmp_path / "f"
+    path.write_bytes(b"x")
+    key = HashCache.key_for(path)
+    index = ChunkIndex(tmp_path / "cache")
+    file_id = index.store(key, 4096, {b"a" * 16: (10, 2)})
+
+    assert index.lookup(key, 4096) == file_id
+    assert index.lookup(key, 8192) is None  # Split with other settings
+    assert index.lookup(key, 4096) is None  # ... so the row is gone
+    index.close()
+
+
+def test_chunk_index_shared_bytes_counts_repeats_and_skips_fanout(tmp_path):
+    index = ChunkIndex(tmp_path)
+    common, zeros = b"c" * 16, b"0" * 16
+    ids = [
+        index.store(
+            CacheKey(0, ino, 100, 0),
+            4096,
+            {common: (10, repeats), zeros: (5, 1), bytes([ino]) * 16: (20, 1)},
+        )
+        for ino, repeats in ((1, 3), (2, 2), (3, 1))
+    ]
+    a, b, c = ids
+
+    shared = {(x, y): n for x, y, n in index.shared_bytes(ids)}
+    assert shared == {(a, b): 20 + 5, (a, c): 10 + 5, (b, c): 10 + 5}
+    # The zero chunk is in all three files: past a fan-out of 2 it is ignored
+    shared = {(x, y): n for x, y, n in index.shared_bytes(ids, max_fanout=2)}
+    assert shared == {}
+    assert index.shared_bytes([a, b], max_fanout=2) == [(a, b, 25)]
+    index.close()
+
+
+def test_similarity_finder_pairs_edited_copies_and_reuses_the_index(tmp_path):
+    root = tmp_path / "data"
+    root.mkdir()
+    rng = random.Random(11)
+    base = rng.randbytes(512 * 1024)
+    (root / "a.img").write_bytes(base)
+    (root / "b.img").write_bytes(base[:100_000] + b"patch" + base[100_000:])
+    (root / "c.img").write_bytes(rng.randbytes(512 * 1024))
+    os.link(root / "a.img", root / "a-link.img")
+    (root / "small").write_bytes(base[:1000])
+
+    def nodes():
+        return [
+            FileNode(p, st.st_size, 0, dev=st.st_dev, ino=st.st_ino)
+            for p in sorted(root.iterdir())
+            for st in [p.stat()]
+        ]
+
+    index = ChunkIndex(tmp_path / "cache")
+    finder = SimilarityFinder(index, chunk_size=4096, min_size=64 * 1024, workers=1)
+    pairs = finder.find_similar(nodes())
+    assert [(p.first.path.name, p.second.path.name) for p in pairs] == [
+        ("a-link.img", "b.img")
+    ]
+    assert 0.95 < pairs[0].ratio < 1
+    assert (finder.files_chunked, finder.files_reused) == (3, 0)
+
+    again = SimilarityFinder(index, chunk_size=4096, min_size=64 * 1024)
+    with patch("smart_file_organizer.use_cases.similarity.chunk_file") as chunk:
+        assert again.find_similar(nodes()) == pairs
+    chunk.assert_not_called()
+    assert again.files_reused == 3
+    index.close()
+
+
+def test_similarity_finder_releases_chunk_maps_once_stored(tmp_path):
+    import gc
+    import weakref
+    from concurrent.futures import ThreadPoolExecutor
+
+    class Chunks(dict):
+        pass  # Unlike dict, can be weakly referenced
+
+    pending = [
+        (FileNode(tmp_path / f"{i}", 1, 0), CacheKey(0, i, 1, 0)) for i in range(4)
+    ]
+    finder = SimilarityFinder(ChunkIndex(tmp_path / "cache"), workers=2)
+    alive = []
+    with patch(
+        "smart_file_organizer.use_cases.similarity.ProcessPoolExecutor",
+        ThreadPoolExecutor,
+    ), patch(
+        "smart_file_organizer.use_cases.similarity.chunk_file",
+        side_effect=lambda path, params: Chunks(),
+    ):
+        for _, _, chunks in finder._chunk(pending):
+            alive.append(weakref.ref(chunks))
+            del chunks
+            gc.collect()
+            assert sum(ref() is not None for ref in alive) <= 1
+    finder.index.close()
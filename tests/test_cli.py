@@ -1,6 +1,9 @@
+import json
+import random
 from pathlib import Path
 import sys
 from unittest.mock import patch
+import pytest
 from smart_file_organizer.cli.main import main
 from smart_file_organizer.core.entities import FileNode
 
@@ -33,7 +36,8 @@ def test_cli_dedupe(capsys):
             MockScanner.return_value.scan.return_value = []
 
             # Setup Dedupe
-            MockDedupe.return_value.find_duplicates.return_value = {}
+            MockDedupe.return_value.iter_duplicates.return_value = iter([])
+            MockDedupe.return_value.hardlink_sets = []
 
             main()
 
@@ -42,6 +46,27 @@ def test_cli_dedupe(capsys):
     assert "No duplicates found" in captured.out
 
 
+def test_cli_dedupe_rejects_unknown_prefilter_stages(capsys):
+    argv = ["smart-organizer", "dedupe", "--prefilter", "head,middle"]
+    with patch.object(sys, "argv", argv), patch(
+        "smart_file_organizer.cli.main.DuplicateFinder"
+    ) as MockDedupe:
+        with pytest.raises(SystemExit) as exc:
+            main()
+    assert exc.value.code == 2
+    assert "unknown stage 'middle'" in capsys.readouterr().err
+    MockDedupe.assert_not_called()
+
+
+def test_cli_dedupe_keeps_checksums_to_the_fast_pass(capsys):
+    for flag, value in (("--hash", "crc32"), ("--fast-hash", "sha256")):
+        argv = ["smart-organizer", "dedupe", flag, value]
+        with patch.object(sys, "argv", argv), pytest.raises(SystemExit) as exc:
+            main()
+        assert exc.value.code == 2
+        assert "invalid choice" in capsys.readouterr().err
+
+
 def test_cli_organize_dry_run(capsys):
     """Test 'organize' command in dry run (default)."""
     with patch.object(
@@ -113,3 +138,173 @@ def test_cli_verbose_and_errors(capsys):
 
     out = capsys.readouterr().out
     assert "[WARNING] Encountered 1 permission errors" in out
+
+
+def test_cli_dedupe_reports_streamed_groups(capsys):
+    group = [FileNode(Path("/a"), 1024 * 1024, 0), FileNode(Path("/b"), 1024 * 1024, 0)]
+    argv = ["smart-organizer", "dedupe", "--root", ".", "--no-cache"]
+    with patch.object(sys, "argv", argv):
+        with patch("smart_file_organizer.cli.main.DirectoryScanner"), patch(
+            "smart_file_organizer.cli.main.DuplicateFinder"
+        ) as MockDedupe:
+            MockDedupe.return_value.iter_duplicates.return_value = iter(
+                [("abcdef0123", group)]
+            )
+            MockDedupe.return_value.hardlink_sets = []
+            main()
+
+    out = capsys.readouterr().out
+    assert "[Hash: abcdef01...]" in out
+    assert "Total Wasted Space: 1.00 MB" in out
+    assert "Duplicate Groups: 1" in out
+
+
+def test_cli_dedupe_reports_hardlinks_apart(capsys):
+    names = [FileNode(Path("/a"), 10, 0, ino=5), FileNode(Path("/b"), 10, 0, ino=5)]
+    argv = ["smart-organizer", "dedupe", "--root", ".", "--no-cache"]
+    with patch.object(sys, "argv", argv):
+        with patch("smart_file_organizer.cli.main.DirectoryScanner"), patch(
+            "smart_file_organizer.cli.main.DuplicateFinder"
+        ) as MockDedupe:
+            MockDedupe.return_value.iter_duplicates.return_value = iter([])
+            MockDedupe.return_value.hardlink_sets = [names]
+            main()
+
+    out = capsys.readouterr().out
+    assert "[Hardlinks: inode 5]" in out
+    assert "Hardlink Sets: 1" in out
+    assert "No duplicates found." in out
+
+
+def test_cli_organize_journal_then_undo(tmp_path, capsys):
+    (tmp_path / "doc.txt").write_text("doc")
+    journal = tmp_path / "run.jsonl"
+    organize = ["smart-organizer", "--execute", "organize", "--root", str(tmp_path)]
+    organize += ["--by-ext", "--journal", str(journal)]
+
+    with patch("builtins.input", return_value="y"):
+        with patch.object(sys, "argv", organize):
+            main()
+        assert (tmp_path / "TXT" / "doc.txt").exists()
+
+        resume = ["smart-organizer", "resume", "--journal", str(journal)]
+        with patch.object(sys, "argv", resume):
+            main()
+        assert "Nothing to resume." in capsys.readouterr().out
+
+        undo = ["smart-organizer", "--execute", "undo", "--journal", str(journal)]
+        with patch.object(sys, "argv", undo):
+            main()
+
+    assert (tmp_path / "doc.txt").read_text() == "doc"
+    assert "Restored Files: 1" in capsys.readouterr().out
+
+
+def test_cli_organize_refuses_a_journal_that_holds_a_plan(tmp_path, capsys):
+    root = tmp_path / "data"
+    root.mkdir()
+    (root / "a.txt").write_text("a")
+    journal = tmp_path / "run.jsonl"
+    organize = ["smart-organizer", "--execute", "organize", "--root", str(root)]
+    organize += ["--by-ext", "--journal", str(journal)]
+
+    with patch("builtins.input", return_value="y"):
+        with patch.object(sys, "argv", organize):
+            main()
+        (root / "b.txt").write_text("b")
+        capsys.readouterr()
+        with patch.object(sys, "argv", organize):
+            main()
+
+    out = capsys.readouterr().out
+    assert "Cannot start journal" in out
+    assert "'resume' or 'undo'" in out
+    assert (root / "b.txt").exists()
+    assert "b.txt" not in journal.read_text()
+
+
+def test_cli_stats_json_and_prometheus_file(tmp_path, capsys):
+    (tmp_path / "a.txt").write_text("same")
+    (tmp_path / "b.txt").write_text("same")
+    prom = tmp_path / "metrics" / "run.prom"
+    argv = ["smart-organizer", "--stats", "json", "--prometheus-file", str(prom)]
+    argv += ["scan", "--root", str(tmp_path)]
+    with patch.object(sys, "argv", argv):
+        main()
+
+    out = capsys.readouterr().out
+    stats = json.loads(out[out.index("\n{") :])
+    assert stats["scan_files_total"]["series"][0]["value"] == 2
+    assert stats["command_seconds"]["series"][0]["labels"] == {"command": "scan"}
+    assert "smart_organizer_scan_files_total 2" in prom.read_text()
+
+
+def test_cli_organize_with_rule_file(tmp_path, capsys):
+    root = tmp_path / "root"
+    root.mkdir()
+    (root / "a.pdf").write_bytes(b"x")
+    (root / "b.txt").write_bytes(b"y")
+    rules = tmp_path / "rules.json"
+    rules.write_text(json.dumps({"rules": [{"extensions": ["pdf"], "dest": "Docs"}]}))
+
+    argv = ["smart-organizer", "organize", "--root", str(root), "--rules", str(rules)]
+    with patch.object(sys, "argv", argv):
+        main()
+    out = capsys.readouterr().out
+    assert f"Strategy: Rules from {rules}" in out
+    assert "Proposed Actions: 1" in out
+
+    rules.write_text(json.dumps({"rules": [{"dest": "Docs", "size": 1}]}))
+    with patch.object(sys, "argv", argv):
+        main()
+    assert "Cannot load rules" in capsys.readouterr().out
+
+
+def test_cli_organize_by_date_in_a_timezone(tmp_path, capsys):
+    argv = ["smart-organizer", "organize", "--root", str(tmp_path), "--timezone"]
+    with patch.object(sys, "argv", argv + ["UTC"]):
+        main()
+    assert "Strategy: Sort by Date (Year/Month, UTC)" in capsys.readouterr().out
+
+    with patch.object(sys, "argv", argv + ["Not/A_Zone"]):
+        main()
+    assert "Unknown timezone: Not/A_Zone" in capsys.readouterr().out
+
+
+def test_cli_organize_by_content(tmp_path, capsys):
+    root = tmp_path / "root"
+    root.mkdir()
+    (root / "upload_1").write_bytes(b"%PDF-1.4 body")
+    (root / "song.mp3").write_bytes(b"ID3")
+    argv = ["smart-organizer", "organize", "--root", str(root), "--by-content"]
+    with patch.object(sys, "argv", argv):
+        main()
+    out = capsys.readouterr().out
+    assert "Strategy: Sort by Content Type" in out
+    assert "Proposed Actions: 2" in out
+    assert f"{root / 'PDF' / 'upload_1'}" in out
+
+
+def test_cli_similar_reports_edited_copies(tmp_path, capsys):
+    root = tmp_path / "root"
+    root.mkdir()
+    base = random.Random(2).randbytes(256 * 1024)
+    (root / "dump-1.sql").write_bytes(base)
+    (root / "dump-2.sql").write_bytes(base[:50_000] + b"-- edit\n" + base[50_000:])
+    (root / "other.sql").write_bytes(random.Random(3).randbytes(256 * 1024))
+    argv = ["smart-organizer", "similar", "--root", str(root), "--min-size", "64KB"]
+    argv += ["--chunk-size", "4KB"]
+    with patch.object(sys, "argv", argv):
+        main()
+    out = capsys.readouterr().out
+    assert "Similar Pairs: 1" in out
+    assert "other.sql" not in out
+    assert "Chunk index: 0 files reused, 3 chunked" in out
+
+    with patch.object(sys, "argv", argv):
+        main()
+    assert "Chunk index: 3 files reused, 0 chunked" in capsys.readouterr().out
+
+    with patch.object(sys, "argv", argv[:-1] + ["3000"]):
+        main()
+    assert "power of two" in capsys.readouterr().out
@@ -19,3 +19,42 @@ def test_container_dependency_injection():
     # Test Hasher initialization
     assert isinstance(c1.hasher, HashService)
     assert c1.hasher is c1.hasher
+
+
+def test_container_hash_cache(tmp_path):
+    assert ServiceContainer().hash_cache is None
+
+    container = ServiceContainer(cache_dir=tmp_path / "cache")
+    cache = container.hash_cache
+    assert cache is not None
+    assert container.hash_cache is cache
+    container.close()
+    assert (tmp_path / "cache" / "hashes.sqlite3").exists()
+
+
+def test_container_hash_algorithm():
+    assert ServiceContainer().hasher.algorithm == "sha256"
+    assert ServiceContainer(hash_algorithm="blake2b").hasher.algorithm == "blake2b"
+
+
+def test_container_scan_snapshot(tmp_path):
+    assert ServiceContainer().scan_snapshot is None
+
+    container = ServiceContainer(snapshot_dir=tmp_path / "cache")
+    snapshot = container.scan_snapshot
+    assert snapshot is not None
+    assert container.scan_snapshot is snapshot
+    container.close()
+    assert (tmp_path / "cache" / "snapshots.sqlite3").exists()
+
+
+def test_container_chunk_index(tmp_path):
+    assert ServiceContainer().chunk_index is None
+
+    container = ServiceContainer(cache_dir=tmp_path / "cache")
+    index = container.chunk_index
+    assert index is not None
+    assert container.chunk_index is index
+    container.close()
+    assert (tmp_path / "cache" / "chunks.sqlite3").exists()
+    assert not (tmp_path / "cache" / "hashes.sqlite3").exists()
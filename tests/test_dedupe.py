@@ -1,8 +1,25 @@
+import os
+import pytest
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
 from unittest.mock import Mock, patch
 from smart_file_organizer.core.entities import FileNode
-from smart_file_organizer.use_cases.dedupe import DuplicateFinder, _hash_file_helper
+from smart_file_organizer.use_cases.dedupe import (
+    DuplicateFinder,
+    _hash_file_helper,
+    _plan_batches,
+)
+from smart_file_organizer.infra.fs_real import RealFileSystem
 from smart_file_organizer.infra.hashing import HashService
+from smart_file_organizer.use_cases.scanner import DirectoryScanner
+
+
+def run_inline(fn, *args):
+    """Stand-in for Executor.submit that runs the call synchronously."""
+    future = Future()
+    future.set_result(fn(*args))
+    return future
 
 
 def test_dedupe_filtering():
@@ -27,13 +44,14 @@ def test_dedupe_filtering():
 
         # When .map() is called, we just run the function immediately using standard map()
         mock_instance.map.side_effect = map
+        mock_instance.submit.side_effect = run_inline
 
         # Now we mock the helper function so we control the hashes
         with patch(
             "smart_file_organizer.use_cases.dedupe._hash_file_helper"
         ) as mock_helper:
 
-            def side_effect(path):
+            def side_effect(path, algorithm):
                 if path.name == "B":
                     return (path, "hash_X")
                 if path.name == "C":
@@ -91,3 +109,354 @@ def test_dedupe_early_return():
     # Should return empty without even trying to hash (mock_hasher not called)
     assert finder.find_duplicates(files) == {}
     mock_hasher.get_hash.assert_not_called()
+
+
+def test_dedupe_uses_cache_before_hashing(tmp_path):
+    """Cached digests are used directly; only cache misses reach the pool."""
+    from smart_file_organizer.infra.hash_cache import HashCache
+
+    a, b, c = (tmp_path / n for n in ("a", "b", "c"))
+    for f in (a, b, c):
+        f.write_bytes(b"same")
+
+    cache = HashCache(tmp_path / "cache")
+    cache.put(HashCache.key_for(a), "sha256", "hash_S")
+    cache.put(HashCache.key_for(b), "sha256", "hash_S")
+
+    finder = DuplicateFinder(HashService(), cache=cache)
+    files = [FileNode(p, 4, 0) for p in (a, b, c)]
+
+    with patch(
+        "smart_file_organizer.use_cases.dedupe.ProcessPoolExecutor"
+    ) as MockExecutor, patch(
+        "smart_file_organizer.use_cases.dedupe._hash_file_helper",
+        side_effect=lambda path, algorithm: (path, "hash_S"),
+    ) as mock_helper:
+        pool = MockExecutor.return_value.__enter__.return_value
+        pool.map.side_effect = map
+        pool.submit.side_effect = run_inline
+        duplicates = finder.find_duplicates(files)
+
+    assert [n.path for n in duplicates["hash_S"]] == [a, b, c]
+    mock_helper.assert_called_once_with(c, "sha256")
+    assert cache.get(HashCache.key_for(c), "sha256") == "hash_S"  # Written back
+    cache.close()
+
+
+def test_dedupe_prefilter_skips_full_hash_for_sample_mismatches(tmp_path):
+    """Files differing in the head or tail samples never reach the full hash."""
+    size = 64 * 1024
+    base = bytes(size)
+    same_a, same_b = tmp_path / "same_a", tmp_path / "same_b"
+    head_diff, tail_diff = tmp_path / "head_diff", tmp_path / "tail_diff"
+    same_a.write_bytes(base)
+    same_b.write_bytes(base)
+    head_diff.write_bytes(b"X" + base[1:])
+    tail_diff.write_bytes(base[:-1] + b"X")
+
+    finder = DuplicateFinder(HashService(), sample_size=1024)
+    files = [FileNode(p, size, 0) for p in (same_a, same_b, head_diff, tail_diff)]
+
+    with patch(
+        "smart_file_organizer.use_cases.dedupe.ProcessPoolExecutor"
+    ) as MockExecutor, patch(
+        "smart_file_organizer.use_cases.dedupe._hash_file_helper",
+        side_effect=lambda path, algorithm: (path, "full"),
+    ) as mock_helper:
+        pool = MockExecutor.return_value.__enter__.return_value
+        pool.map.side_effect = map
+        pool.submit.side_effect = run_inline
+        duplicates = finder.find_duplicates(files)
+
+    assert [n.path for n in duplicates["full"]] == [same_a, same_b]
+    hashed = {c.args[0] for c in mock_helper.call_args_list}
+    assert hashed == {same_a, same_b}
+
+
+def test_dedupe_rejects_unknown_prefilter_stage():
+    with pytest.raises(ValueError):
+        DuplicateFinder(Mock(spec=HashService), prefilter=["bogus"])
+
+
+def test_dedupe_refuses_a_checksum_as_the_confirming_hash():
+    with pytest.raises(ValueError, match="32-bit checksum"):
+        DuplicateFinder(HashService("crc32"))
+
+
+def test_dedupe_accepts_file_table():
+    """Size grouping runs on the table's columns; only candidates become nodes."""
+    from smart_file_organizer.core.table import FileTable
+
+    table = FileTable.from_nodes(
+        [
+            FileNode(Path("/d/A"), 10, 0),
+            FileNode(Path("/d/B"), 20, 0),
+            FileNode(Path("/d/C"), 20, 0),
+        ]
+    )
+    finder = DuplicateFinder(Mock(spec=HashService))
+
+    with patch(
+        "smart_file_organizer.use_cases.dedupe.ProcessPoolExecutor"
+    ) as MockExecutor, patch(
+        "smart_file_organizer.use_cases.dedupe._hash_file_helper",
+        side_effect=lambda path, algorithm: (path, "hash_X"),
+    ) as mock_helper:
+        pool = MockExecutor.return_value.__enter__.return_value
+        pool.map.side_effect = map
+        pool.submit.side_effect = run_inline
+        duplicates = finder.find_duplicates(table)
+
+    assert [n.path.name for n in duplicates["hash_X"]] == ["B", "C"]
+    assert mock_helper.call_count == 2
+
+
+def test_iter_duplicates_streams_groups_as_completed():
+    """Groups are yielded one at a time, largest files first."""
+    finder = DuplicateFinder(Mock(spec=HashService), batch_files=1)
+
+    def scan():
+        yield FileNode(Path("/d/solo"), 5, 0)
+        yield FileNode(Path("/d/A1"), 10, 0)
+        yield FileNode(Path("/d/A2"), 10, 0)
+        yield FileNode(Path("/d/B1"), 20, 0)
+        yield FileNode(Path("/d/B2"), 20, 0)
+
+    hashed = []
+
+    def helper(path, algorithm):
+        hashed.append(path.name)
+        return path, f"hash_{path.name[0]}"
+
+    with patch(
+        "smart_file_organizer.use_cases.dedupe.ProcessPoolExecutor"
+    ) as MockExecutor, patch(
+        "smart_file_organizer.use_cases.dedupe._hash_file_helper", side_effect=helper
+    ):
+        pool = MockExecutor.return_value.__enter__.return_value
+        pool.map.side_effect = map
+        pool.submit.side_effect = run_inline
+        stream = finder.iter_duplicates(scan())
+        groups = {d: [n.path.name for n in g] for d, g in stream}
+
+    assert groups == {"hash_A": ["A1", "A2"], "hash_B": ["B1", "B2"]}
+    assert hashed == ["B1", "B2", "A1", "A2"]  # Submitted largest first
+
+    assert finder.files_seen == 5
+
+
+def test_stream_size_groups_keeps_singletons_compact():
+    finder = DuplicateFinder(Mock(spec=HashService))
+    nodes = [
+        FileNode(Path("/a"), 1, 1.0),
+        FileNode(Path("/b"), 2, 2.0),
+        FileNode(Path("/c"), 2, 3.0),
+        FileNode(Path("/empty"), 0, 0),
+    ]
+
+    groups = finder._stream_size_groups(iter(nodes))
+
+    assert groups == [[nodes[1], nodes[2]]]
+    assert finder.files_seen == 4
+
+
+def test_fast_checksum_pass_limits_strong_hashing():
+    """A cheap checksum splits groups; only agreeing files get the strong hash."""
+    finder = DuplicateFinder(HashService("blake2b"), fast_algorithm="crc32")
+    files = [FileNode(Path(n), 10, 0) for n in ("A", "B", "C")]
+    calls = []
+
+    def helper(path, algorithm):
+        calls.append((path.name, algorithm))
+        if algorithm == "crc32":
+            return path, "c1" if path.name in "AB" else "c2"
+        return path, "strong"
+
+    with patch(
+        "smart_file_organizer.use_cases.dedupe.ProcessPoolExecutor"
+    ) as MockExecutor, patch(
+        "smart_file_organizer.use_cases.dedupe._hash_file_helper", side_effect=helper
+    ):
+        pool = MockExecutor.return_value.__enter__.return_value
+        pool.map.side_effect = map
+        pool.submit.side_effect = run_inline
+        duplicates = finder.find_duplicates(files)
+
+    assert list(duplicates) == ["strong"]
+    assert [c for c in calls if c[1] == "blake2b"] == [
+        ("A", "blake2b"),
+        ("B", "blake2b"),
+    ]
+    assert len([c for c in calls if c[1] == "crc32"]) == 3
+
+
+def test_hardlinks_are_hashed_once_and_reported_apart(tmp_path):
+    original = tmp_path / "original.bin"
+    original.write_bytes(b"x" * 100)
+    os.link(original, tmp_path / "link.bin")
+    (tmp_path / "copy.bin").write_bytes(b"x" * 100)
+
+    files = list(DirectoryScanner(RealFileSystem()).scan(tmp_path))
+    finder = DuplicateFinder(Mock(spec=HashService), prefilter=[])
+
+    with patch(
+        "smart_file_organizer.use_cases.dedupe.ProcessPoolExecutor"
+    ) as MockExecutor, patch(
+        "smart_file_organizer.use_cases.dedupe._hash_file_helper",
+        side_effect=lambda path, algorithm: (path, "same"),
+    ) as mock_helper:
+        pool = MockExecutor.return_value.__enter__.return_value
+        pool.map.side_effect = map
+        pool.submit.side_effect = run_inline
+        result = finder.find_duplicates(files)
+
+    # One read for the inode behind both links, one for the real copy
+    assert mock_helper.call_count == 2
+    assert len(result["same"]) == 2
+    assert len(finder.hardlink_sets) == 1
+    assert {n.path.name for n in finder.hardlink_sets[0]} == {
+        "original.bin",
+        "link.bin",
+    }
+
+
+def test_hardlinks_alone_are_not_duplicates():
+    files = [
+        FileNode(Path("a"), 10, 0, dev=1, ino=7, nlink=2),
+        FileNode(Path("b"), 10, 0, dev=1, ino=7, nlink=2),
+        FileNode(Path("c"), 20, 0, dev=2, ino=7, nlink=2),
+    ]
+    finder = DuplicateFinder(Mock(spec=HashService))
+
+    with patch(
+        "smart_file_organizer.use_cases.dedupe.ProcessPoolExecutor"
+    ) as MockExecutor:
+        assert finder.find_duplicates(files) == {}
+
+    MockExecutor.assert_not_called()
+    assert [[n.path.name for n in s] for s in finder.hardlink_sets] == [["a", "b"]]
+
+
+def test_plan_batches_packs_small_files_largest_first():
+    files = [FileNode(Path(f"f{size}"), size, 0) for size in (1, 50, 3, 200, 40, 2)]
+
+    batches = _plan_batches(files, max_bytes=100, max_files=2)
+
+    assert [[n.size for n in b] for b in batches] == [[200], [50, 40], [3, 2], [1]]
+
+
+def test_hashing_reports_worker_throughput(capsys):
+    files = [FileNode(Path(f"f{i}"), 1024 * 1024, 0) for i in range(4)]
+    finder = DuplicateFinder(Mock(spec=HashService), prefilter=[])
+
+    with patch(
+        "smart_file_organizer.use_cases.dedupe.ProcessPoolExecutor"
+    ) as MockExecutor, patch(
+        "smart_file_organizer.use_cases.dedupe._hash_file_helper",
+        side_effect=lambda path, algorithm: (path, "same"),
+    ):
+        pool = MockExecutor.return_value.__enter__.return_value
+        pool.submit.side_effect = run_inline
+        finder.find_duplicates(files)
+
+    # Four 1 MiB files fit the default byte budget: one task, not four
+    assert pool.submit.call_count == 1
+    (stats,) = finder.worker_stats.values()
+    assert (stats.files, stats.bytes) == (4, 4 * 1024 * 1024)
+    assert "4 files, 4.0 MB" in capsys.readouterr().out
+
+
+def test_batches_lost_with_a_broken_pool_are_retried_alone(capsys):
+    big = 16 * 1024 * 1024  # Over the batch budget: one file per batch
+    files = [
+        FileNode(Path(name), big * (1 + n // 2), 0) for n, name in enumerate("ABCD")
+    ]
+    finder = DuplicateFinder(Mock(spec=HashService), prefilter=[])
+    calls = []
+
+    def submit(fn, paths, algorithm):
+        # The first batch dies with its worker; C kills every worker it meets
+        calls.append(paths)
+        if len(calls) == 1 or paths == (Path("C"),):
+            raise BrokenProcessPool("A process in the pool was terminated")
+        return run_inline(fn, paths, algorithm)
+
+    with patch(
+        "smart_file_organizer.use_cases.dedupe.ProcessPoolExecutor"
+    ) as MockExecutor, patch(
+        "smart_file_organizer.use_cases.dedupe._hash_file_helper",
+        side_effect=lambda path, algorithm: (path, "same"),
+    ):
+        pool = MockExecutor.return_value.__enter__.return_value
+        pool.submit.side_effect = submit
+        groups = finder.find_duplicates(files)
+
+    assert [[n.path.name for n in g] for g in groups.values()] == [["A", "B"]]
+    assert calls.count((Path("C"),)) == 2  # Retried once, then given up
+    assert sum(1 for c in calls if c == calls[0]) == 2
+    assert "Hashing crashed" in capsys.readouterr().out
+
+
+def test_pipeline_hashes_candidates_while_the_walk_continues():
+    submitted_during_walk = []
+
+    def walk(pool):
+        yield FileNode(Path("a"), 10, 0)
+        yield FileNode(Path("b"), 10, 0)  # Second of its size: both go out
+        submitted_during_walk.append(pool.submit.call_count)
+        yield FileNode(Path("c"), 10, 0)  # Later arrival: sent on its own
+        yield FileNode(Path("d"), 20, 0)  # Unique size: never hashed
+
+    digests = {"a": "x", "b": "x", "c": "y"}
+    finder = DuplicateFinder(Mock(spec=HashService), batch_files=1, pipeline=True)
+    with patch(
+        "smart_file_organizer.use_cases.dedupe.ProcessPoolExecutor"
+    ) as MockExecutor, patch(
+        "smart_file_organizer.use_cases.dedupe._hash_file_helper",
+        side_effect=lambda path, algorithm: (path, digests[str(path)]),
+    ) as mock_helper:
+        pool = MockExecutor.return_value.__enter__.return_value
+        pool.submit.side_effect = run_inline
+        result = finder.find_duplicates(walk(pool))
+
+    assert submitted_during_walk == [2]
+    assert mock_helper.call_count == 3
+    assert {h: [n.path.name for n in g] for h, g in result.items()} == {"x": ["a", "b"]}
+    assert finder.files_seen == 4
+
+
+def test_pipeline_matches_staged_results_with_cache_and_hardlinks(tmp_path):
+    from smart_file_organizer.infra.hash_cache import HashCache
+
+    for name, data in [("a", b"one"), ("b", b"one"), ("c", b"two"), ("d", b"2")]:
+        (tmp_path / name).write_bytes(data)
+    os.link(tmp_path / "a", tmp_path / "a_link")
+    files = list(DirectoryScanner(RealFileSystem()).scan(tmp_path))
+
+    def run(pipeline):
+        cache = HashCache(tmp_path / f"cache-{pipeline}")
+        cache.put(HashCache.key_for(tmp_path / "c"), "sha256", "cached")
+        finder = DuplicateFinder(
+            HashService(), cache=cache, prefilter=[], pipeline=pipeline
+        )
+        with patch(
+            "smart_file_organizer.use_cases.dedupe.ProcessPoolExecutor"
+        ) as MockExecutor, patch(
+            "smart_file_organizer.use_cases.dedupe._hash_file_helper",
+            wraps=_hash_file_helper,
+        ) as helper:
+            pool = MockExecutor.return_value.__enter__.return_value
+            pool.submit.side_effect = run_inline
+            result = finder.find_duplicates(files)
+        cache.close()
+        groups = {frozenset(n.path.name for n in g) for g in result.values()}
+        linked = [{n.path.name for n in s} for s in finder.hardlink_sets]
+        return groups, linked, sorted(call.args[0].name for call in helper.mock_calls)
+
+    staged, piped = run(False), run(True)
+
+    assert piped == staged
+    groups, linked, hashed = piped
+    assert len(groups) == 1 and len(next(iter(groups))) == 2
+    assert linked == [{"a", "a_link"}]
+    assert "c" not in hashed  # Served from the cache
@@ -0,0 +1,92 @@
+import os
+from smart_file_organizer.infra.hash_cache import CacheKey, HashCache
+
+
+def test_cache_roundtrip_persists_across_instances(tmp_path):
+    f = tmp_path / "a.bin"
+    f.write_bytes(b"payload")
+    key = HashCache.key_for(f)
+
+    cache = HashCache(tmp_path / "cache")
+    assert cache.get(key, "sha256") is None
+    cache.put(key, "sha256", "digest-a")
+    cache.close()
+
+    reopened = HashCache(tmp_path / "cache")
+    assert reopened.get(key, "sha256") == "digest-a"
+    assert reopened.hits == 1
+    reopened.close()
+
+
+def test_cache_invalidates_modified_file(tmp_path):
+    f = tmp_path / "a.bin"
+    f.write_bytes(b"v1")
+    cache = HashCache(tmp_path / "cache")
+    cache.put(HashCache.key_for(f), "sha256", "digest-v1")
+    cache.flush()
+
+    f.write_bytes(b"v2-longer")
+    os.utime(f, ns=(1, 1))
+    stale_key = HashCache.key_for(f)
+
+    assert cache.get(stale_key, "sha256") is None
+    cache.flush()
+    row = cache._conn.execute("SELECT COUNT(*) FROM hashes").fetchone()
+    assert row[0] == 0
+    cache.close()
+
+
+def test_cache_batches_writes(tmp_path):
+    cache = HashCache(tmp_path / "cache", batch_size=3)
+    count = lambda: cache._conn.execute("SELECT COUNT(*) FROM hashes").fetchone()[0]
+
+    cache.put(CacheKey(1, 1, 10, 0), "sha256", "x")
+    cache.put(CacheKey(1, 2, 10, 0), "sha256", "y")
+    assert count() == 0  # Still buffered
+    assert cache.get(CacheKey(1, 1, 10, 0), "sha256") == "x"  # Served from the buffer
+
+    cache.put(CacheKey(1, 3, 10, 0), "sha256", "z")
+    assert count() == 3
+    cache.close()
+
+
+def test_cache_prune_removes_old_rows(tmp_path):
+    cache = HashCache(tmp_path / "cache")
+    cache.put(CacheKey(1, 1, 10, 0), "sha256", "x")
+    cache.flush()
+    cache._conn.execute("UPDATE hashes SET last_seen = 0")
+    cache._conn.commit()
+
+    assert cache.prune(max_age_seconds=60) == 1
+    assert cache.get(CacheKey(1, 1, 10, 0), "sha256") is None
+    cache.close()
+
+
+def test_cache_keeps_algorithms_apart(tmp_path):
+    key = CacheKey(1, 1, 10, 0)
+    cache = HashCache(tmp_path / "cache")
+    cache.put(key, "sha256", "strong")
+    cache.flush()
+
+    assert cache.get(key, "crc32") is None
+    cache.put(key, "crc32", "weak")
+    cache.flush()
+    assert cache.get(key, "sha256") == "strong"
+    assert cache.get(key, "crc32") == "weak"
+    cache.close()
+
+
+def test_cache_drops_outdated_schema(tmp_path):
+    import sqlite3
+
+    (tmp_path / "cache").mkdir()
+    conn = sqlite3.connect(str(tmp_path / "cache" / HashCache.DB_NAME))
+    conn.execute("CREATE TABLE hashes (dev, ino, size, mtime_ns, digest, last_seen)")
+    conn.commit()
+    conn.close()
+
+    cache = HashCache(tmp_path / "cache")
+    cache.put(CacheKey(1, 1, 10, 0), "sha256", "x")
+    cache.flush()
+    assert cache.get(CacheKey(1, 1, 10, 0), "sha256") == "x"
+    cache.close()
@@ -1,5 +1,9 @@
+import errno
+import os
 import pytest
+from contextlib import ExitStack
 from pathlib import Path
+from unittest.mock import patch
 from smart_file_organizer.infra.fs_real import RealFileSystem
 from smart_file_organizer.infra.fs_dryrun import DryRunFileSystem
 from smart_file_organizer.infra.hashing import HashService
@@ -104,3 +108,218 @@ def test_dryrun_virtual_state_exists():
 
     # Check if dest exists in virtual state
     assert fs.exists(dest) is True
+
+
+def test_sample_hash_reads_only_requested_windows(tmp_path):
+    service = HashService()
+    a = tmp_path / "a"
+    b = tmp_path / "b"
+    a.write_bytes(b"HEAD" + b"x" * 100 + b"TAIL")
+    b.write_bytes(b"HEAD" + b"y" * 100 + b"TAIL")
+
+    windows = [(0, 4), (104, 4)]
+    assert service.get_sample_hash(a, windows) == service.get_sample_hash(b, windows)
+    assert service.get_sample_hash(a, [(4, 4)]) != service.get_sample_hash(b, [(4, 4)])
+
+
+@pytest.mark.parametrize(
+    "algorithm, expected",
+    [
+        ("md5", "b10a8db164e0754105b7a99be72e3fe5"),
+        ("crc32", "4a17b156"),
+        ("adler32", "180b041d"),
+    ],
+)
+def test_hashing_algorithm_registry(tmp_path, algorithm, expected):
+    f = tmp_path / "test_hash.txt"
+    f.write_bytes(b"Hello World")
+
+    service = HashService(algorithm)
+    assert service.algorithm == algorithm
+    assert service.get_hash(f) == expected
+
+
+def test_hashing_rejects_unknown_algorithm():
+    with pytest.raises(ValueError, match="Unknown hash algorithm"):
+        HashService("sha1024")
+
+
+@pytest.mark.parametrize("size", [0, 1, 65536, 65537, 300_000])
+def test_hashing_readinto_and_mmap_agree_with_hashlib(tmp_path, size):
+    import hashlib
+    import os
+
+    f = tmp_path / "blob.bin"
+    content = os.urandom(size)
+    f.write_bytes(content)
+    expected = hashlib.sha256(content).hexdigest()
+
+    assert HashService().get_hash(f) == expected
+
+    mapped = HashService()
+    mapped.MMAP_THRESHOLD = 1  # Force the mmap path for any non-empty file
+    assert mapped.get_hash(f) == expected
+
+
+def test_hashing_rereads_a_file_that_shrinks_under_the_mmap(tmp_path):
+    import hashlib
+    from types import SimpleNamespace
+
+    f = tmp_path / "blob.bin"
+    content = os.urandom(300_000)
+    f.write_bytes(content)
+    service = HashService()
+    service.MMAP_THRESHOLD = 1
+    real_fstat = os.fstat
+    calls = []
+
+    def fstat(fd):
+        # The first call sizes the file; from then on it looks truncated
+        calls.append(fd)
+        st = real_fstat(fd)
+        return st if len(calls) == 1 else SimpleNamespace(st_size=st.st_size - 1)
+
+    with patch("smart_file_organizer.infra.hashing.os.fstat", fstat), patch.object(
+        service, "_hash_readinto", wraps=service._hash_readinto
+    ) as readinto:
+        assert service.get_hash(f) == hashlib.sha256(content).hexdigest()
+    readinto.assert_called_once()
+    assert len(calls) == 2  # Noticed before the first mapped block
+
+
+def test_hashing_mmap_checks_the_size_once_per_recheck_window(tmp_path):
+    import hashlib
+
+    f = tmp_path / "blob.bin"
+    content = os.urandom(1024 * 1024)  # 4 blocks of 256 KiB
+    f.write_bytes(content)
+    service = HashService()
+    service.MMAP_THRESHOLD = 1
+    service.MMAP_RECHECK_BYTES = 512 * 1024
+
+    with patch("smart_file_organizer.infra.hashing.os.fstat", wraps=os.fstat) as st:
+        assert service.get_hash(f) == hashlib.sha256(content).hexdigest()
+    assert st.call_count == 1 + 2  # Sizing, then before blocks 0 and 2
+
+
+def test_hashing_issues_fadvise_hints(tmp_path):
+    import os
+    from unittest.mock import patch
+
+    if not hasattr(os, "posix_fadvise"):
+        pytest.skip("posix_fadvise not available")
+
+    f = tmp_path / "blob.bin"
+    f.write_bytes(b"x" * 1000)
+
+    with patch("os.posix_fadvise") as fadvise:
+        HashService().get_hash(f)
+    advice = [c.args[3] for c in fadvise.call_args_list]
+    assert advice == [os.POSIX_FADV_SEQUENTIAL, os.POSIX_FADV_DONTNEED]
+
+    with patch("os.posix_fadvise") as fadvise:
+        HashService(drop_cache=False).get_hash(f)
+    assert [c.args[3] for c in fadvise.call_args_list] == [os.POSIX_FADV_SEQUENTIAL]
+
+
+def test_hashing_block_size_grows_with_file_size():
+    service = HashService()
+    small = service.block_size_for(10)
+    medium = service.block_size_for(1024 * 1024)
+    large = service.block_size_for(1024**3)
+    assert small <= medium <= large == HashService.MAX_BLOCK_SIZE
+
+
+def _exdev(*args):
+    raise OSError(errno.EXDEV, "Invalid cross-device link")
+
+
+def test_real_fs_move_across_devices_copies_then_unlinks(tmp_path):
+    src = tmp_path / "big.bin"
+    src.write_bytes(os.urandom(300_000))
+    os.utime(src, (1_000_000, 1_000_000))
+    dest = tmp_path / "elsewhere.bin"
+    fs = RealFileSystem()
+
+    with patch("smart_file_organizer.infra.fs_real.os.rename", side_effect=_exdev):
+        fs.move(src, dest)
+
+    assert not src.exists()
+    assert len(dest.read_bytes()) == 300_000
+    assert dest.stat().st_mtime == 1_000_000
+    stats = fs.transfer_stats()
+    assert (stats.files, stats.bytes) == (1, 300_000)
+
+
+@pytest.mark.parametrize(
+    "unsupported, expected",
+    [
+        (["_reflink"], "copy_file_range"),
+        (["_reflink", "_copy_range"], "sendfile"),
+        (["_reflink", "_copy_range", "_sendfile"], "read/write"),
+    ],
+)
+def test_copy_file_falls_back_in_order(tmp_path, unsupported, expected):
+    from smart_file_organizer.infra import transfer
+
+    src = tmp_path / "src.bin"
+    payload = os.urandom(100_000)
+    src.write_bytes(payload)
+
+    with ExitStack() as stack:
+        for name in unsupported:
+            stack.enter_context(patch.object(transfer, name, return_value=False))
+        assert transfer.copy_file(src, tmp_path / "dest.bin") == expected
+
+    assert (tmp_path / "dest.bin").read_bytes() == payload
+
+
+def test_copy_file_falls_back_when_copy_file_range_copies_nothing(tmp_path):
+    from smart_file_organizer.infra import transfer
+
+    src = tmp_path / "src.bin"
+    payload = os.urandom(100_000)
+    src.write_bytes(payload)
+
+    with patch.object(transfer, "_reflink", return_value=False), patch(
+        "os.copy_file_range", return_value=0, create=True
+    ):
+        assert transfer.copy_file(src, tmp_path / "dest.bin") == "sendfile"
+    assert (tmp_path / "dest.bin").read_bytes() == payload
+
+
+def test_cross_device_move_syncs_the_directory_before_unlinking(tmp_path):
+    from smart_file_organizer.infra import transfer
+
+    src = tmp_path / "src.bin"
+    src.write_bytes(b"x" * 1000)
+    (tmp_path / "other").mkdir()
+    dest = tmp_path / "other" / "dest.bin"
+
+    def fsync_dir(path):
+        assert path == dest.parent
+        assert src.exists() and dest.exists()
+
+    with patch.object(transfer, "_fsync_dir", side_effect=fsync_dir) as synced:
+        transfer.move_across_devices(src, dest, transfer.TransferStats())
+    synced.assert_called_once()
+    assert not src.exists()
+
+
+def test_cross_device_move_keeps_source_when_sizes_differ(tmp_path):
+    from smart_file_organizer.infra import transfer
+
+    src = tmp_path / "src.bin"
+    src.write_bytes(b"x" * 1000)
+    dest = tmp_path / "dest.bin"
+
+    def short_copy(src_path, dest_path):
+        dest_path.write_bytes(b"x" * 10)
+        return "copy_file_range"
+
+    with patch.object(transfer, "copy_file", side_effect=short_copy):
+        with pytest.raises(OSError, match="Size mismatch"):
+            transfer.move_across_devices(src, dest, transfer.TransferStats())
+
+    assert src.read_bytes() == b"x" * 1000
+    assert not dest.exists()
@@ -24,12 +24,11 @@ def test_dry_run_organization():
 
     organizer.execute_plan(plan)
 
-    # 4. Verify Virtual State
+    # 4. Verify the overlay
     # Expectation: /test_root/image.png -> /test_root/PNG/image.png
-    expected_dest_png = root / "PNG" / "image.png"
-    assert expected_dest_png in fs.virtual_state
-    assert fs.virtual_state[expected_dest_png] == root / "image.png"
+    assert fs.exists(root / "PNG" / "image.png")
+    assert [e.name for e in fs.scandir(root / "PNG")] == ["image.png"]
 
     # Expectation: /test_root/doc.pdf -> /test_root/PDF/doc.pdf
-    expected_dest_pdf = root / "PDF" / "doc.pdf"
-    assert expected_dest_pdf in fs.virtual_state
+    assert fs.exists(root / "PDF" / "doc.pdf")
+    assert not fs.exists(root / "doc.pdf")
@@ -0,0 +1,86 @@
+from pathlib import Path
+from smart_file_organizer.core.entities import ActionRecord, ActionType
+from smart_file_organizer.infra.fs_real import RealFileSystem
+from smart_file_organizer.infra.journal import PlanJournal
+from smart_file_organizer.use_cases.organizer import Organizer
+
+
+def _move(src, dest):
+    return ActionRecord(ActionType.MOVE, Path(src), Path(dest), "test")
+
+
+def test_journal_roundtrip_tracks_outcomes(tmp_path):
+    plan = [_move("/a", "/X/a"), _move("/b", "/X/b"), _move("/c", "/X/c")]
+    journal = PlanJournal(tmp_path / "j.jsonl", batch_size=2)
+    journal.begin(plan, Path("/"))
+    journal.mark_done(plan[0])
+    journal.mark_failed(plan[1], "denied")
+    journal.close()
+
+    reopened = PlanJournal(tmp_path / "j.jsonl")
+    assert reopened.root == Path("/")
+    assert reopened.actions == plan
+    assert reopened.outstanding() == plan[1:]
+    assert reopened.completed() == plan[:1]
+
+
+def test_journal_survives_torn_tail(tmp_path):
+    plan = [_move("/a", "/X/a"), _move("/b", "/X/b")]
+    journal = PlanJournal(tmp_path / "j.jsonl")
+    journal.begin(plan, Path("/"))
+    journal.close()
+    with open(tmp_path / "j.jsonl", "a") as f:
+        f.write('{"op": "done", "i')  # Crash mid-write
+
+    resumed = PlanJournal(tmp_path / "j.jsonl")
+    resumed.mark_done(plan[1])
+    resumed.close()
+
+    assert PlanJournal(tmp_path / "j.jsonl").outstanding() == plan[:1]
+
+
+def test_read_only_journal_never_writes(tmp_path):
+    plan = [_move("/a", "/X/a")]
+    journal = PlanJournal(tmp_path / "j.jsonl")
+    journal.begin(plan, Path("/"))
+    journal.close()
+    before = (tmp_path / "j.jsonl").read_bytes()
+
+    dry = PlanJournal(tmp_path / "j.jsonl", read_only=True)
+    dry.mark_done(plan[0])
+    dry.close()
+
+    assert (tmp_path / "j.jsonl").read_bytes() == before
+
+
+def test_resume_skips_moves_finished_before_crash_and_undo_restores(tmp_path):
+    for name in ("a", "b", "c"):
+        (tmp_path / f"{name}.txt").write_text(name)
+    plan = [_move(tmp_path / f"{n}.txt", tmp_path / "TXT" / f"{n}.txt") for n in "abc"]
+    journal = PlanJournal(tmp_path / "j.jsonl")
+    journal.begin(plan, tmp_path)
+    journal.close()
+
+    # 'a' was moved but its outcome never reached the journal
+    (tmp_path / "TXT").mkdir()
+    (tmp_path / "a.txt").rename(tmp_path / "TXT" / "a.txt")
+
+    organizer = Organizer(RealFileSystem())
+    resumed = PlanJournal(tmp_path / "j.jsonl")
+    organizer.resume_plan(resumed)
+    resumed.close()
+
+    assert sorted(p.name for p in (tmp_path / "TXT").iterdir()) == [
+        "a.txt",
+        "b.txt",
+        "c.txt",
+    ]
+    assert PlanJournal(tmp_path / "j.jsonl").outstanding() == []
+
+    undo = PlanJournal(tmp_path / "j.jsonl")
+    organizer.undo_plan(undo)
+    undo.close()
+
+    assert (tmp_path / "b.txt").read_text() == "b"
+    assert list((tmp_path / "TXT").iterdir()) == []
+    assert PlanJournal(tmp_path / "j.jsonl").completed() == []
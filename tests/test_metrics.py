@@ -0,0 +1,102 @@
+import json
+from pathlib import Path
+from smart_file_organizer.core.rules import ExtensionRule
+from smart_file_organizer.infra.fs_real import RealFileSystem
+from smart_file_organizer.infra.hashing import HashService
+from smart_file_organizer.infra.metrics import NULL_METRICS, MetricsRegistry
+from smart_file_organizer.use_cases.organizer import Organizer
+from smart_file_organizer.use_cases.scanner import DirectoryScanner
+
+
+def series(snapshot, name, **labels):
+    for entry in snapshot[name]["series"]:
+        if entry["labels"] == labels:
+            return entry
+    raise KeyError((name, labels))
+
+
+def test_counters_and_histograms_are_keyed_by_labels():
+    metrics = MetricsRegistry()
+    metrics.counter("moves_total", "Moves", result="done").inc(3)
+    metrics.counter("moves_total", result="done").inc()
+    metrics.counter("moves_total", result="failed").inc()
+    hist = metrics.histogram("size_bytes", buckets=(10, 100))
+    for value in (5, 50, 500):
+        hist.observe(value)
+
+    snapshot = metrics.snapshot()
+    assert snapshot["moves_total"]["help"] == "Moves"
+    assert series(snapshot, "moves_total", result="done")["value"] == 4
+    assert series(snapshot, "moves_total", result="failed")["value"] == 1
+    size = series(snapshot, "size_bytes")
+    assert size["count"] == 3
+    assert size["sum"] == 555
+    assert size["buckets"] == {"10.0": 1, "100.0": 2, "+Inf": 3}
+
+
+def test_timer_observes_elapsed_seconds():
+    metrics = MetricsRegistry()
+    with metrics.timer("stage_seconds", stage="scan"):
+        pass
+    timed = series(metrics.snapshot(), "stage_seconds", stage="scan")
+    assert timed["count"] == 1
+    assert timed["sum"] >= 0
+
+
+def test_disabled_registry_records_nothing():
+    metrics = MetricsRegistry(enabled=False)
+    metrics.counter("a_total").inc()
+    metrics.histogram("b").observe(1.0)
+    with metrics.timer("c_seconds"):
+        pass
+    assert metrics.snapshot() == {}
+    # Shared no-op instruments: nothing is allocated per call
+    assert metrics.timer("x") is metrics.timer("y")
+    assert NULL_METRICS.counter("a") is NULL_METRICS.counter("b")
+
+
+def test_prometheus_textfile_format(tmp_path):
+    metrics = MetricsRegistry()
+    metrics.counter("files_total", "Files found", path='a"b\\c').inc(2)
+    metrics.histogram("seconds", buckets=(1.0,)).observe(0.5)
+
+    target = tmp_path / "textfile" / "organizer.prom"
+    metrics.write_prometheus(target)
+    text = target.read_text()
+
+    assert "# HELP smart_organizer_files_total Files found" in text
+    assert "# TYPE smart_organizer_files_total counter" in text
+    assert 'smart_organizer_files_total{path="a\\"b\\\\c"} 2' in text
+    assert 'smart_organizer_seconds_bucket{le="1.0"} 1' in text
+    assert 'smart_organizer_seconds_bucket{le="+Inf"} 1' in text
+    assert "smart_organizer_seconds_count 1" in text
+    # Written via a temp file and rename: nothing else is left behind
+    assert [p.name for p in target.parent.iterdir()] == ["organizer.prom"]
+
+
+def test_stages_report_into_one_registry(tmp_path):
+    root = tmp_path / "root"
+    (root / "sub").mkdir(parents=True)
+    (root / "a.txt").write_bytes(b"abc")
+    (root / "sub" / "b.jpg").write_bytes(b"defg")
+
+    metrics = MetricsRegistry()
+    fs = RealFileSystem()
+    files = list(DirectoryScanner(fs, metrics=metrics).scan(root))
+    HashService(metrics=metrics).get_hash(root / "a.txt")
+    organizer = Organizer(fs, metrics=metrics)
+    organizer.execute_plan(organizer.plan_organization(files, ExtensionRule(), root))
+    organizer.cleanup_empty_dirs(root)
+
+    snapshot = json.loads(metrics.to_json())
+    assert series(snapshot, "scan_files_total")["value"] == 2
+    assert series(snapshot, "scan_bytes_total")["value"] == 7
+    assert series(snapshot, "scan_dirs_total", source="listed")["value"] == 2
+    assert series(snapshot, "fs_syscalls_total", op="stat")["value"] == 2
+    assert series(snapshot, "hash_files_total", algorithm="sha256")["value"] == 1
+    assert series(snapshot, "hash_bytes_total", algorithm="sha256")["value"] == 3
+    assert series(snapshot, "organize_moves_total", result="done")["value"] == 2
+    assert series(snapshot, "organize_dirs_removed_total")["value"] == 1
+    for stage in ("plan", "execute", "cleanup"):
+        assert series(snapshot, "organize_stage_seconds", stage=stage)["count"] == 1
+    assert Path(root / "JPG" / "b.jpg").exists()
@@ -1,12 +1,24 @@
 import pytest
 import logging
+from types import SimpleNamespace
 from unittest.mock import Mock, MagicMock
 from pathlib import Path
 from smart_file_organizer.core.entities import FileNode, ActionRecord, ActionType
+from smart_file_organizer.core.rules import OrganizationRule
 from smart_file_organizer.use_cases.organizer import Organizer
 from smart_file_organizer.infra.interfaces import FileSystemProvider
 
 
+class FixedRule(OrganizationRule):
+    """Sends every file to the same folder."""
+
+    def __init__(self, folder: Path):
+        self.folder = folder
+
+    def get_destination(self, node: FileNode, root: Path) -> Path:
+        return self.folder
+
+
 class MockFS(FileSystemProvider):
     """A controllable mock for testing specific edge cases."""
 
@@ -28,13 +40,20 @@ class MockFS(FileSystemProvider):
         pass
 
     def scandir(self, path):
-        return self.dirs.get(path, [])
+        if path in self.dirs:
+            return self.dirs[path]
+        # Directory listing derived from the files registered as existing
+        return [
+            SimpleNamespace(name=p.name, path=str(p))
+            for p in self.existing_files
+            if p.parent == path
+        ]
 
     def rmdir(self, path):
         pass
 
 
-def test_collision_resolution_linear_probing():
+def test_collision_resolution_skips_taken_names():
     """Verify file.txt becomes file_2.txt if file.txt and file_1.txt exist."""
     fs = MockFS()
     organizer = Organizer(fs)
@@ -100,8 +119,9 @@ def test_execute_plan_error_handling(caplog):
     mock_fs = Mock(spec=FileSystemProvider)
     organizer = Organizer(mock_fs)
 
-    # Make move raise an error
+    # Make move raise an error, whichever path (rename or copy) is taken
     mock_fs.move.side_effect = PermissionError("Access Denied")
+    mock_fs.rename.side_effect = PermissionError("Access Denied")
 
     plan = [ActionRecord(ActionType.MOVE, Path("src"), Path("dest"), "test")]
 
@@ -120,8 +140,7 @@ def test_organizer_skips_same_location():
     # File is already where the rule wants it to be
     node = FileNode(Path("/tmp/TXT/doc.txt"), 100, 1000)
 
-    rule = Mock()
-    rule.get_destination.return_value = Path("/tmp/TXT")
+    rule = FixedRule(Path("/tmp/TXT"))
 
     # This ensures _resolve_collision returns the original path immediately,
     # allowing the 'if safe_target == node.path' check to pass and trigger 'continue'.
@@ -140,7 +159,7 @@ def test_cleanup_early_return():
 
     mock_fs.exists.return_value = False
 
-    organizer._remove_empty_recursive(Path("/missing"))
+    organizer._remove_empty_tree(Path("/missing"))
 
     # Should simply return without error
     mock_fs.scandir.assert_not_called()
@@ -157,7 +176,173 @@ def test_cleanup_exception_handling():
     # Simulate a crash when trying to read directory
     mock_fs.scandir.side_effect = OSError("Locked")
 
-    organizer._remove_empty_recursive(p)
+    organizer._remove_empty_tree(p)
 
     # Should suppress error and finish
     mock_fs.scandir.assert_called_with(p)
+
+
+def test_collision_counter_is_remembered_per_stem():
+    """Each clash costs O(1): one scandir per target, no exists() probing."""
+    fs = MockFS()
+    fs.existing_files.add(Path("/dest/IMG.jpg"))
+    fs.exists = Mock(side_effect=AssertionError("exists() should not be probed"))
+    fs.scandir = Mock(wraps=fs.scandir)
+    organizer = Organizer(fs)
+
+    rule = FixedRule(Path("/dest"))
+    nodes = [FileNode(Path(f"/src/{i}/IMG.jpg"), 1, 0) for i in range(4)]
+    nodes.append(FileNode(Path("/src/other.jpg"), 1, 0))
+
+    plan = organizer.plan_organization(nodes, rule, Path("/"))
+
+    assert [a.dest_path.name for a in plan] == [
+        "IMG_1.jpg",
+        "IMG_2.jpg",
+        "IMG_3.jpg",
+        "IMG_4.jpg",
+        "other.jpg",
+    ]
+    fs.scandir.assert_called_once_with(Path("/dest"))
+
+
+def test_organizer_keeps_file_already_at_target():
+    """A file sitting at its own target is not renamed to name_1."""
+    fs = MockFS()
+    fs.existing_files.add(Path("/tmp/TXT/doc.txt"))
+    rule = FixedRule(Path("/tmp/TXT"))
+
+    plan = Organizer(fs).plan_organization(
+        [FileNode(Path("/tmp/TXT/doc.txt"), 1, 0)], rule, Path("/tmp")
+    )
+
+    assert plan == []
+
+
+def test_plan_asks_the_rule_for_destinations_in_batches(monkeypatch):
+    from smart_file_organizer.core.rules import ExtensionRule
+    from smart_file_organizer.use_cases import organizer as organizer_module
+
+    monkeypatch.setattr(organizer_module, "PLAN_BATCH", 2)
+    rule = ExtensionRule()
+    batches = []
+    batch_call = rule.get_destinations
+    rule.get_destinations = lambda nodes, root: (
+        batches.append(len(nodes)) or batch_call(nodes, root)
+    )
+
+    nodes = (FileNode(Path(f"/in/f{i}.txt"), 1, 0) for i in range(5))
+    plan = Organizer(MockFS()).plan_organization(nodes, rule, Path("/out"))
+
+    assert batches == [2, 2, 1]
+    assert [a.dest_path for a in plan] == [Path(f"/out/TXT/f{i}.txt") for i in range(5)]
+
+
+def test_execute_plan_creates_each_directory_once_and_renames_on_same_device():
+    mock_fs = Mock(spec=FileSystemProvider)
+    mock_fs.device_of.side_effect = lambda p: 2 if p.parts[1] == "usb" else 1
+    organizer = Organizer(mock_fs, workers=4)
+
+    plan = [
+        ActionRecord(
+            ActionType.MOVE, Path(f"/data/{i}.txt"), Path(f"/data/TXT/{i}.txt"), "t"
+        )
+        for i in range(10)
+    ]
+    plan.append(
+        ActionRecord(ActionType.MOVE, Path("/data/a.png"), Path("/usb/a.png"), "t")
+    )
+
+    organizer.execute_plan(plan)
+
+    assert sorted(c.args[0] for c in mock_fs.mkdir.call_args_list) == [
+        Path("/data/TXT"),
+        Path("/usb"),
+    ]
+    assert mock_fs.rename.call_count == 10
+    mock_fs.move.assert_called_once_with(Path("/data/a.png"), Path("/usb/a.png"))
+
+
+def test_execute_plan_real_moves(tmp_path):
+    from smart_file_organizer.infra.fs_real import RealFileSystem
+
+    for i in range(20):
+        (tmp_path / f"{i}.txt").write_text(str(i))
+    plan = [
+        ActionRecord(
+            ActionType.MOVE, tmp_path / f"{i}.txt", tmp_path / "TXT" / f"{i}.txt", "t"
+        )
+        for i in range(20)
+    ]
+
+    Organizer(RealFileSystem(), workers=4).execute_plan(plan)
+
+    assert sorted(p.name for p in (tmp_path / "TXT").iterdir()) == sorted(
+        f"{i}.txt" for i in range(20)
+    )
+    assert (tmp_path / "TXT" / "7.txt").read_text() == "7"
+
+
+def test_execute_plan_reports_cross_device_throughput(tmp_path, capsys):
+    import errno
+    from unittest.mock import patch
+    from smart_file_organizer.infra.fs_real import RealFileSystem
+
+    (tmp_path / "a.bin").write_bytes(b"x" * 2048)
+    plan = [
+        ActionRecord(ActionType.MOVE, tmp_path / "a.bin", tmp_path / "B" / "a.bin", "t")
+    ]
+    exdev = OSError(errno.EXDEV, "Invalid cross-device link")
+
+    with patch("smart_file_organizer.infra.fs_real.os.rename", side_effect=exdev):
+        Organizer(RealFileSystem()).execute_plan(plan)
+
+    assert (tmp_path / "B" / "a.bin").read_bytes() == b"x" * 2048
+    assert "Cross-device Copies: 1" in capsys.readouterr().out
+
+
+def test_cleanup_lists_each_directory_once(tmp_path):
+    from unittest.mock import patch
+    from smart_file_organizer.infra.fs_real import RealFileSystem
+
+    (tmp_path / "a" / "b" / "c").mkdir(parents=True)
+    (tmp_path / "a" / "empty").mkdir()
+    (tmp_path / "keep" / "inner").mkdir(parents=True)
+    (tmp_path / "keep" / "file.txt").touch()
+    fs = RealFileSystem()
+
+    with patch.object(fs, "scandir", wraps=fs.scandir) as scandir:
+        removed = Organizer(fs).cleanup_empty_dirs(tmp_path)
+
+    assert removed == 5  # c, b, empty, a, inner
+    assert scandir.call_count == 7  # Every directory, once
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["keep"]
+    assert [p.name for p in (tmp_path / "keep").iterdir()] == ["file.txt"]
+
+
+def test_cleanup_touched_only_checks_vacated_directories(tmp_path):
+    from unittest.mock import patch
+    from smart_file_organizer.infra.fs_real import RealFileSystem
+
+    (tmp_path / "x" / "y").mkdir(parents=True)
+    (tmp_path / "x" / "y" / "doc.txt").write_text("d")
+    (tmp_path / "untouched_empty").mkdir()
+    fs = RealFileSystem()
+    organizer = Organizer(fs)
+    organizer.execute_plan(
+        [
+            ActionRecord(
+                ActionType.MOVE,
+                tmp_path / "x" / "y" / "doc.txt",
+                tmp_path / "doc.txt",
+                "t",
+            )
+        ]
+    )
+
+    with patch.object(fs, "scandir", wraps=fs.scandir) as scandir:
+        removed = organizer.cleanup_empty_dirs(tmp_path, touched_only=True)
+
+    assert removed == 2
+    assert scandir.call_count == 3  # y, x, then root (which is not empty)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["doc.txt", "untouched_empty"]
@@ -1,7 +1,14 @@
-from datetime import datetime
+import json
+import random
+from datetime import datetime, timezone
 from pathlib import Path
+from zoneinfo import ZoneInfo
+import pytest
 from smart_file_organizer.core.entities import FileNode
+from smart_file_organizer.core.rule_engine import RuleEngine, parse_size
 from smart_file_organizer.core.rules import ExtensionRule, DateRule
+from smart_file_organizer.core.table import FileTable
+from smart_file_organizer.infra.rule_config import load_rules
 
 
 def test_extension_rule():
@@ -30,3 +37,154 @@ def test_date_rule():
     node = FileNode(path=Path("photo.jpg"), size=100, mtime=ts)
     dest = rule.get_destination(node, root)
     assert dest == Path("/tmp/2023/10")
+
+
+DAY = 86400
+NOW = 1_700_000_000.0
+ROOT = Path("/data")
+
+
+def route(engine, name, size=10, age_days=0.0):
+    node = FileNode(path=ROOT / name, size=size, mtime=NOW - age_days * DAY)
+    return engine.get_destination(node, ROOT)
+
+
+def test_rule_engine_first_match_wins():
+    engine = RuleEngine(
+        [
+            {"extensions": ["mp4", ".MOV"], "min_size": "1KB", "dest": "Video/Big"},
+            {"extensions": "mp4", "dest": "Video"},
+            {"glob": "IMG_*", "max_age_days": 30, "dest": "Camera/Recent"},
+            {"regex": r"img_\d+\.jpg", "dest": "Camera"},
+            {"path_prefix": "inbox", "min_age_days": 7, "dest": "Archive"},
+        ],
+        now=NOW,
+    )
+
+    assert route(engine, "a.mp4", size=2048) == Path("/data/Video/Big")
+    assert route(engine, "b.MOV", size=2048) == Path("/data/Video/Big")
+    assert route(engine, "a.mp4", size=10) == Path("/data/Video")
+    assert route(engine, "b.mov", size=10) == Path("/data")  # Unmatched: stays
+    assert route(engine, "IMG_1.jpg") == Path("/data/Camera/Recent")
+    # The glob rule fails on age, so the next name rule gets its turn
+    assert route(engine, "img_1.jpg", age_days=60) == Path("/data/Camera")
+    assert route(engine, "inbox/old.txt", age_days=10) == Path("/data/Archive")
+    assert route(engine, "inbox/new.txt", age_days=1) == Path("/data/inbox")
+    assert route(engine, "inboxes/old.txt", age_days=10) == Path("/data/inboxes")
+
+
+def test_rule_engine_reuses_destination_paths():
+    engine = RuleEngine([{"extensions": ["txt"], "dest": "Text"}])
+    first = route(engine, "a.txt")
+    assert route(engine, "b.txt") is first
+
+
+def test_rule_engine_without_combined_regex_matches_the_same():
+    # Named groups clash across rules, so each pattern is matched on its own
+    specs = [
+        {"regex": r"(?P<n>a)\.txt", "max_size": 5, "dest": "A"},
+        {"regex": r"(?P<n>a|b)\.txt", "dest": "AB"},
+    ]
+    engine = RuleEngine(specs)
+    assert engine._combined is None
+    assert route(engine, "a.txt", size=1) == Path("/data/A")
+    assert route(engine, "a.txt", size=9) == Path("/data/AB")
+    assert route(engine, "c.txt") == Path("/data")
+
+
+def test_rule_engine_rejects_bad_rules():
+    with pytest.raises(ValueError, match="missing 'dest'"):
+        RuleEngine([{"extensions": ["jpg"]}])
+    with pytest.raises(ValueError, match="unknown keys"):
+        RuleEngine([{"dest": "X", "extension": "jpg"}])
+    with pytest.raises(ValueError, match="invalid pattern"):
+        RuleEngine([{"dest": "X", "regex": "("}])
+    with pytest.raises(ValueError, match="Invalid size"):
+        RuleEngine([{"dest": "X", "min_size": "lots"}])
+
+
+@pytest.mark.parametrize("dest", ["/etc", "../out", "Images/../../out"])
+def test_rule_engine_keeps_destinations_inside_the_root(dest):
+    with pytest.raises(ValueError, match="inside the root"):
+        RuleEngine([{"name": "escape", "dest": dest}])
+
+
+@pytest.mark.parametrize(
+    "spec, message",
+    [
+        ({"dest": "X", "min_age_days": None}, "'min_age_days' must be a number"),
+        ({"dest": "X", "max_age_days": "soon"}, "'max_age_days' must be a number"),
+        ({"dest": "X", "extensions": 3}, "'extensions' must be a string or a list"),
+        ({"dest": "X", "glob": ["*.a", 1]}, "'glob' must be a string or a list"),
+        ({"dest": "X", "min_size": None}, "Invalid size"),
+        ({"dest": 7}, "'dest' must be a string"),
+    ],
+)
+def test_rule_engine_names_the_rule_with_a_bad_value(spec, message):
+    with pytest.raises(ValueError, match=message) as exc:
+        RuleEngine([{"name": "broken", **spec}])
+    assert str(exc.value).startswith("broken: ")
+
+
+def test_parse_size():
+    assert parse_size(512) == 512
+    assert parse_size("10MB") == 10 * 1024**2
+    assert parse_size("1.5 GiB") == int(1.5 * 1024**3)
+    assert parse_size("2k") == 2048
+
+
+def test_load_rules_from_toml_and_json(tmp_path):
+    toml_file = tmp_path / "rules.toml"
+    toml_file.write_text('[[rules]]\nextensions = ["pdf"]\ndest = "Docs"\n')
+    json_file = tmp_path / "rules.json"
+    json_file.write_text(json.dumps({"rules": [{"glob": "*.pdf", "dest": "Docs"}]}))
+
+    for path in (toml_file, json_file):
+        assert route(load_rules(path), "x.pdf") == Path("/data/Docs")
+
+    bad = tmp_path / "bad.json"
+    bad.write_text("[]")
+    with pytest.raises(ValueError, match="bad.json"):
+        load_rules(bad)
+
+
+def test_date_rule_batch_matches_single_lookups():
+    rng = random.Random(7)
+    mtimes = [rng.uniform(0, 2_000_000_000) for _ in range(2000)]
+    # Month edges in New York, either side of the instant the month starts
+    for year, month in [(2021, 3), (2021, 11), (2022, 1), (1999, 12)]:
+        start = datetime(year, month, 1, tzinfo=ZoneInfo("America/New_York"))
+        mtimes += [start.timestamp() - 0.5, start.timestamp()]
+    nodes = [FileNode(Path(f"f{i}"), 1, m) for i, m in enumerate(mtimes)]
+    root = Path("/tmp")
+
+    for tz in (None, timezone.utc, ZoneInfo("America/New_York")):
+        rule = DateRule(tz=tz)
+        expected = [DateRule(tz=tz).get_destination(n, root) for n in nodes]
+        assert rule.get_destinations(nodes, root) == expected
+        # A later batch outside the months seen so far extends the table
+        later = [FileNode(Path("g"), 1, 4_000_000_000.0)]
+        assert rule.get_destinations(later, root) == [
+            rule.get_destination(later[0], root)
+        ]
+
+
+def test_date_rule_batch_shares_paths_and_reads_the_mtime_column():
+    ts = datetime(2023, 10, 15, tzinfo=timezone.utc).timestamp()
+    table = FileTable()
+    for i in range(3):
+        table.append("/src", f"f{i}.jpg", 1, ts + i * 60)
+    table.append("/src", "old.jpg", 1, ts - 365 * DAY)
+
+    rule = DateRule(tz=timezone.utc)
+    first, second, third, old = rule.get_destinations(table, Path("/tmp"))
+    assert first == Path("/tmp/2023/10") and old == Path("/tmp/2022/10")
+    assert first is second is third
+    assert rule.get_destinations([], Path("/tmp")) == []
+
+
+def test_extension_rule_batch_shares_paths():
+    nodes = [FileNode(Path(name), 1, 0) for name in ("a.txt", "b.txt", "README")]
+    txt, txt_again, misc = ExtensionRule().get_destinations(nodes, Path("/tmp"))
+    assert txt is txt_again and txt == Path("/tmp/TXT")
+    assert misc == Path("/tmp/Misc")
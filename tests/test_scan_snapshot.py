@@ -0,0 +1,51 @@
+import os
+from pathlib import Path
+from smart_file_organizer.core.entities import FileNode
+from smart_file_organizer.infra.scan_snapshot import DirRecord, ScanSnapshot
+
+LONG_AGO = 10**18
+
+
+def test_snapshot_roundtrip_persists_across_instances(tmp_path):
+    record = DirRecord(
+        mtime_ns=1000,
+        files=[FileNode(Path("/r/d/a.txt"), 3, 1.5, dev=1, ino=2, nlink=1)],
+        subdirs=["/r/d/sub"],
+    )
+    snapshot = ScanSnapshot(tmp_path / "cache")
+    snapshot.put("/r", "/r/d", record, listed_ns=LONG_AGO)
+    snapshot.close()
+
+    reopened = ScanSnapshot(tmp_path / "cache")
+    assert reopened.get("/r", "/r/d") == record
+    assert reopened.get("/other", "/r/d") is None
+    assert reopened.paths("/r") == {"/r/d"}
+
+    reopened.remove("/r", {"/r/d"})
+    assert reopened.get("/r", "/r/d") is None
+    reopened.close()
+
+
+def test_snapshot_marks_racy_mtimes_unstable(tmp_path):
+    snapshot = ScanSnapshot(tmp_path / "cache")
+    snapshot.put("/r", "/r", DirRecord(LONG_AGO, [], []), listed_ns=LONG_AGO + 1)
+
+    record = snapshot.get("/r", "/r")
+    assert record is not None
+    assert record.mtime_ns == ScanSnapshot.UNSTABLE
+    snapshot.close()
+
+
+def test_snapshot_keeps_undecodable_names(tmp_path):
+    name = os.fsdecode(b"caf\xe9.txt")
+    record = DirRecord(1, [FileNode(Path("/r", name), 1, 0.0)], ["/r/" + name])
+
+    snapshot = ScanSnapshot(tmp_path / "cache")
+    snapshot.put("/r", "/r", record, listed_ns=LONG_AGO)
+    snapshot.flush()
+    snapshot.clear("/other")
+
+    assert snapshot.get("/r", "/r") == record
+    snapshot.clear()
+    assert snapshot.get("/r", "/r") is None
+    snapshot.close()
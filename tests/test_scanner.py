@@ -79,3 +79,234 @@ def test_scanner_inner_entry_error():
     assert len(results) == 0
     assert len(scanner.errors) == 1
     assert "Access denied" in scanner.errors[0]
+
+
+def test_parallel_scan_matches_serial(tmp_path):
+    """The threaded walker finds exactly the same files as the serial one."""
+    from smart_file_organizer.infra.fs_real import RealFileSystem
+
+    for i in range(5):
+        branch = tmp_path / f"d{i}" / "nested" / "deeper"
+        branch.mkdir(parents=True)
+        for j in range(3):
+            (branch / f"f{j}.txt").write_text("x" * j)
+            (branch.parent / f"g{j}.bin").write_text("y")
+    (tmp_path / "top.txt").write_text("top")
+
+    serial = DirectoryScanner(RealFileSystem())
+    parallel = DirectoryScanner(RealFileSystem(), workers=4)
+
+    expected = {(n.path, n.size) for n in serial.scan(tmp_path)}
+    found = [(n.path, n.size) for n in parallel.scan(tmp_path)]
+
+    assert len(found) == 31
+    assert set(found) == expected
+    assert parallel.errors == []
+
+
+def test_parallel_scan_records_errors():
+    mock_fs = Mock(spec=FileSystemProvider)
+    scanner = DirectoryScanner(mock_fs, workers=3)
+    mock_fs.exists.return_value = True
+    mock_fs.scandir.side_effect = PermissionError("Access Denied")
+
+    assert list(scanner.scan(Path("/root"))) == []
+    assert scanner.errors == ["Cannot access directory: /root"]
+
+
+def test_parallel_scan_can_be_abandoned(tmp_path):
+    """Closing the generator early stops the worker threads."""
+    from smart_file_organizer.infra.fs_real import RealFileSystem
+
+    for i in range(20):
+        (tmp_path / f"d{i}").mkdir()
+        (tmp_path / f"d{i}" / "f.txt").write_text("x")
+
+    scanner = DirectoryScanner(RealFileSystem(), workers=4)
+    stream = scanner.scan(tmp_path)
+    next(stream)
+    stream.close()  # Must not hang
+
+
+def test_scan_handles_depth_beyond_recursion_limit(tmp_path):
+    """The explicit-stack walker is not bound by sys.getrecursionlimit()."""
+    import os
+    import sys
+    from smart_file_organizer.infra.fs_real import RealFileSystem
+
+    depth = 300
+    deepest = tmp_path
+    for _ in range(depth):
+        deepest = deepest / "d"
+        os.mkdir(deepest)
+    (deepest / "leaf.txt").write_text("leaf")
+
+    scanner = DirectoryScanner(RealFileSystem())
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(depth // 2)
+    try:
+        results = list(scanner.scan(tmp_path))
+    finally:
+        sys.setrecursionlimit(limit)
+
+    assert [n.path for n in results] == [deepest / "leaf.txt"]
+
+
+def test_scan_does_not_resolve_each_file(tmp_path):
+    """Child paths are joined from the resolved root, not resolved one by one."""
+    from smart_file_organizer.infra.fs_real import RealFileSystem
+
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "a.txt").write_text("a")
+    scanner = DirectoryScanner(RealFileSystem())
+
+    with patch.object(Path, "resolve", autospec=True, side_effect=lambda p: p) as r:
+        results = list(scanner.scan(tmp_path))
+
+    assert r.call_count == 1  # The root only
+    assert results[0].path == tmp_path / "sub" / "a.txt"
+
+
+def test_scan_records_inode_identity(tmp_path):
+    import os
+    from smart_file_organizer.infra.fs_real import RealFileSystem
+
+    (tmp_path / "a.txt").write_text("data")
+    os.link(tmp_path / "a.txt", tmp_path / "b.txt")
+
+    nodes = {n.path.name: n for n in DirectoryScanner(RealFileSystem()).scan(tmp_path)}
+
+    assert nodes["a.txt"].inode_key == nodes["b.txt"].inode_key
+    assert nodes["a.txt"].inode_key == (
+        os.stat(tmp_path / "a.txt").st_dev,
+        os.stat(tmp_path / "a.txt").st_ino,
+    )
+    assert nodes["a.txt"].nlink == 2
+
+
+def _age_directories(root, mtime_ns=1_000_000_000):
+    """Push directory mtimes out of the snapshot's racy window."""
+    import os
+
+    for dirpath, _, _ in os.walk(root):
+        os.utime(dirpath, ns=(mtime_ns, mtime_ns))
+
+
+def test_incremental_scan_replays_unchanged_directories(tmp_path):
+    from smart_file_organizer.infra.fs_real import RealFileSystem
+    from smart_file_organizer.infra.scan_snapshot import ScanSnapshot
+
+    tree = tmp_path / "tree"
+    for name in ("a", "b"):
+        (tree / name).mkdir(parents=True)
+        (tree / name / "f.txt").write_text(name)
+    _age_directories(tree)
+    snapshot = ScanSnapshot(tmp_path / "cache")
+
+    first = DirectoryScanner(RealFileSystem(), snapshot=snapshot)
+    expected = sorted(n.path for n in first.scan(tmp_path / "tree"))
+    assert first.dirs_listed == 3
+
+    fs = RealFileSystem()
+    with patch.object(fs, "scandir", wraps=fs.scandir) as scandir:
+        second = DirectoryScanner(fs, snapshot=snapshot)
+        assert sorted(n.path for n in second.scan(tree)) == expected
+
+    scandir.assert_not_called()
+    assert (second.dirs_listed, second.dirs_reused) == (0, 3)
+    snapshot.close()
+
+
+def test_scan_changes_reports_diff_against_snapshot(tmp_path):
+    import shutil
+    from smart_file_organizer.core.entities import ChangeType
+    from smart_file_organizer.infra.fs_real import RealFileSystem
+    from smart_file_organizer.infra.scan_snapshot import ScanSnapshot
+
+    tree = tmp_path / "tree"
+    (tree / "keep").mkdir(parents=True)
+    (tree / "gone").mkdir()
+    (tree / "keep" / "edited.txt").write_text("v1")
+    (tree / "keep" / "deleted.txt").write_text("x")
+    (tree / "gone" / "inside.txt").write_text("x")
+    _age_directories(tree)
+
+    snapshot = ScanSnapshot(tmp_path / "cache")
+    scanner = DirectoryScanner(RealFileSystem(), snapshot=snapshot)
+    first = list(scanner.scan_changes(tree))
+    assert {c.change_type for c in first} == {ChangeType.ADDED}
+    assert len(first) == 3
+
+    (tree / "keep" / "edited.txt").write_text("v2 is longer")
+    (tree / "keep" / "deleted.txt").unlink()
+    (tree / "keep" / "new.txt").write_text("new")
+    shutil.rmtree(tree / "gone")
+    _age_directories(tree, mtime_ns=2_000_000_000)
+
+    changes = {
+        (c.change_type, c.node.path.name)
+        for c in DirectoryScanner(RealFileSystem(), snapshot=snapshot).scan_changes(
+            tree
+        )
+    }
+    assert changes == {
+        (ChangeType.MODIFIED, "edited.txt"),
+        (ChangeType.REMOVED, "deleted.txt"),
+        (ChangeType.ADDED, "new.txt"),
+        (ChangeType.REMOVED, "inside.txt"),
+    }
+    assert snapshot.paths(str(tree)) == {str(tree), str(tree / "keep")}
+    snapshot.close()
+
+
+def test_refresh_replayed_picks_up_files_rewritten_in_place(tmp_path):
+    from smart_file_organizer.infra.fs_real import RealFileSystem
+    from smart_file_organizer.infra.scan_snapshot import ScanSnapshot
+
+    tree = tmp_path / "tree"
+    tree.mkdir()
+    (tree / "grown.bin").write_bytes(b"x")
+    (tree / "same.bin").write_bytes(b"y")
+    _age_directories(tree)
+    snapshot = ScanSnapshot(tmp_path / "cache")
+    list(DirectoryScanner(RealFileSystem(), snapshot=snapshot).scan(tree))
+
+    (tree / "grown.bin").write_bytes(b"x" * 100)
+    _age_directories(tree)  # The directory itself looks untouched
+
+    stale = DirectoryScanner(RealFileSystem(), snapshot=snapshot)
+    assert {n.path.name: n.size for n in stale.scan(tree)}["grown.bin"] == 1
+
+    fs = RealFileSystem()
+    with patch.object(fs, "scandir", wraps=fs.scandir) as scandir:
+        fresh = DirectoryScanner(fs, snapshot=snapshot, refresh_replayed=True)
+        sizes = {n.path.name: n.size for n in fresh.scan(tree)}
+    scandir.assert_not_called()
+    assert sizes == {"grown.bin": 100, "same.bin": 1}
+    assert fresh.dirs_reused == 1
+
+    # The refreshed sizes were written back to the snapshot
+    record = snapshot.get(str(tree), str(tree))
+    assert record is not None
+    assert {n.path.name: n.size for n in record.files}["grown.bin"] == 100
+    snapshot.close()
+
+
+def test_parallel_incremental_scan_counts_every_directory(tmp_path):
+    import sys
+    from smart_file_organizer.infra.fs_real import RealFileSystem
+    from smart_file_organizer.infra.scan_snapshot import ScanSnapshot
+
+    tree = tmp_path / "tree"
+    for i in range(200):
+        (tree / f"d{i}").mkdir(parents=True)
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # Switch threads as often as possible
+    try:
+        snapshot = ScanSnapshot(tmp_path / "cache")
+        scanner = DirectoryScanner(RealFileSystem(), workers=8, snapshot=snapshot)
+        list(scanner.scan(tree))
+    finally:
+        sys.setswitchinterval(interval)
+    assert scanner.dirs_listed == 201
+    snapshot.close()
@@ -0,0 +1,82 @@
+from pathlib import Path
+from unittest.mock import patch
+from smart_file_organizer.core.entities import FileNode
+from smart_file_organizer.core.rules import ContentTypeRule
+from smart_file_organizer.core.signatures import SNIFF_BYTES, identify
+from smart_file_organizer.infra.hash_cache import HashCache
+from smart_file_organizer.infra.sniffing import MAGIC_ALGORITHM, ContentSniffer
+
+
+def test_identify_known_headers():
+    assert identify(b"%PDF-1.7\n") == "pdf"
+    assert identify(b"\x89PNG\r\n\x1a\n....") == "png"
+    assert identify(b"RIFF\x00\x00\x00\x00WEBPVP8 ") == "webp"
+    assert identify(b"RIFF\x00\x00\x00\x00WAVEfmt ") == "wav"
+    assert identify(b"\x00\x00\x00\x18ftypheic") == "heic"
+    assert identify(b"\x00\x00\x00\x18ftypisom") == "mp4"
+    assert identify(b"a" * 257 + b"ustar\x0000") == "tar"
+    assert identify(b"plain text") is None
+    assert identify(b"") is None
+    assert SNIFF_BYTES == 512
+
+
+def test_identify_checks_the_headers_behind_two_byte_magics():
+    # Text that happens to start like a BMP or a DOS executable
+    assert identify(b"MZ is the code of the Mazovia airport.\n" * 4) is None
+    assert identify(b"BMW service notes, 2024 edition\n") is None
+    assert identify(b"BM" + bytes(4) + bytes(4) + b"x" * 10) is None
+
+    bmp = b"BM" + (70).to_bytes(4, "little") + bytes(4) + (54).to_bytes(4, "little")
+    assert identify(bmp + (40).to_bytes(4, "little") + bytes(40)) == "bmp"
+
+    stub = bytearray(0x80)
+    stub[:2] = b"MZ"
+    stub[0x3C:0x40] = (0x80).to_bytes(4, "little")
+    assert identify(bytes(stub) + b"PE\x00\x00" + bytes(20)) == "exe"
+    assert identify(bytes(stub) + b"NE" + bytes(20)) is None
+
+
+def test_sniffer_reads_each_file_once_and_memoises_in_the_cache(tmp_path):
+    (tmp_path / "upload").write_bytes(b"%PDF-1.4" + b"x" * 10_000)
+    (tmp_path / "notes").write_bytes(b"just words")
+    (tmp_path / "photo").write_bytes(b"\xff\xd8\xff\xe0" + b"x" * 100)
+    paths = [tmp_path / n for n in ("upload", "notes", "photo", "missing")]
+
+    cache = HashCache(tmp_path / "cache")
+    sniffer = ContentSniffer(cache, workers=2)
+    with patch("os.read", wraps=__import__("os").read) as reads:
+        assert sniffer(paths) == ["pdf", None, "jpg", None]
+    assert [call.args[1] for call in reads.call_args_list] == [SNIFF_BYTES] * 3
+    assert cache.get(HashCache.key_for(paths[1]), MAGIC_ALGORITHM) == ""
+
+    # Known types and known unknowns both come from the cache now
+    with patch("smart_file_organizer.infra.sniffing._read_head") as read_head:
+        assert sniffer(paths) == ["pdf", None, "jpg", None]
+    read_head.assert_not_called()
+    cache.close()
+
+
+def test_content_type_rule_only_sniffs_missing_or_ambiguous_extensions():
+    sniffed = []
+
+    def sniff(paths):
+        sniffed.append([p.name for p in paths])
+        return ["pdf" if p.name.startswith("doc") else None for p in paths]
+
+    names = ["doc_upload", "doc.bin", "doc.2", "photo.jpg", "other.dat", "doc_b"]
+    nodes = [FileNode(Path("/in") / name, 1, 0) for name in names]
+    folders = ContentTypeRule(sniff).get_destinations(nodes, Path("/out"))
+
+    assert sniffed == [["doc_upload", "doc.bin", "doc.2", "other.dat", "doc_b"]]
+    assert [str(f) for f in folders] == [
+        "/out/PDF",
+        "/out/PDF",
+        "/out/PDF",
+        "/out/JPG",
+        "/out/DAT",  # Unknown content: routed by its extension
+        "/out/PDF",
+    ]
+    assert folders[0] is folders[-1]
+    rule = ContentTypeRule(sniff)
+    assert rule.get_destination(nodes[3], Path("/out")) == Path("/out/JPG")
+    assert len(sniffed) == 1  # A clear extension costs no sniffing
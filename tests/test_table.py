@@ -0,0 +1,45 @@
+import pytest
+from pathlib import Path
+from smart_file_organizer.core.entities import FileNode
+from smart_file_organizer.core.table import FileTable
+
+
+def test_table_roundtrip_and_interning():
+    nodes = [
+        FileNode(Path("/data/photos/a.jpg"), 10, 1.5),
+        FileNode(Path("/data/photos/b.jpg"), 20, 2.5),
+        FileNode(Path("/data/docs/ünïcode.txt"), 30, 3.5),
+        FileNode(Path("/top.txt"), 40, 4.5),
+    ]
+    table = FileTable.from_nodes(nodes)
+
+    assert len(table) == 4
+    assert list(table) == nodes
+    assert table[-1] == nodes[-1]
+    assert table[1:3] == nodes[1:3]
+    assert table.name(2) == "ünïcode.txt"
+    assert list(table.sizes) == [10, 20, 30, 40]
+    assert len(table._dirs) == 3  # /data/photos is stored once
+
+    with pytest.raises(IndexError):
+        table[4]
+
+
+def test_organizer_accepts_table():
+    from smart_file_organizer.core.rules import ExtensionRule
+    from smart_file_organizer.infra.fs_dryrun import DryRunFileSystem
+    from smart_file_organizer.use_cases.organizer import Organizer
+
+    root = Path("/test_root")
+    table = FileTable.from_nodes([FileNode(root / "image.png", 1, 0)])
+    plan = Organizer(DryRunFileSystem()).plan_organization(table, ExtensionRule(), root)
+
+    assert [a.dest_path for a in plan] == [root / "PNG" / "image.png"]
+
+
+def test_table_keeps_inode_identity():
+    node = FileNode(Path("/data/a.bin"), 10, 1.0, dev=3, ino=42, nlink=2)
+    table = FileTable.from_nodes([node])
+
+    assert table[0] == node
+    assert table[0].inode_key == (3, 42)
@@ -0,0 +1,114 @@
+import pytest
+from pathlib import Path
+from unittest.mock import patch
+from smart_file_organizer.core.entities import FileNode
+from smart_file_organizer.core.rules import ExtensionRule
+from smart_file_organizer.infra.fs_dryrun import DryRunFileSystem
+from smart_file_organizer.use_cases.organizer import Organizer
+
+
+def _names(fs, path):
+    return sorted(entry.name for entry in fs.scandir(path))
+
+
+def test_overlay_reflects_planned_moves(tmp_path):
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "a.txt").write_text("a")
+    fs = DryRunFileSystem()
+
+    fs.mkdir(tmp_path / "dest" / "deep")
+    fs.move(tmp_path / "src" / "a.txt", tmp_path / "dest" / "deep" / "a.txt")
+
+    assert not fs.exists(tmp_path / "src" / "a.txt")
+    assert fs.exists(tmp_path / "dest" / "deep" / "a.txt")
+    assert _names(fs, tmp_path / "src") == []
+    assert _names(fs, tmp_path / "dest") == ["deep"]
+    (entry,) = fs.scandir(tmp_path / "dest" / "deep")
+    assert entry.path == str(tmp_path / "dest" / "deep" / "a.txt")
+    assert entry.stat().st_size == 1  # Metadata of the file that was moved
+
+    # Nothing touched the disk
+    assert (tmp_path / "src" / "a.txt").exists()
+    assert not (tmp_path / "dest").exists()
+
+
+def test_overlay_passes_untouched_directories_through(tmp_path):
+    (tmp_path / "d").mkdir()
+    for i in range(50):
+        (tmp_path / "d" / f"{i}.txt").touch()
+    fs = DryRunFileSystem()
+
+    with patch.object(fs._real_fs, "scandir", wraps=fs._real_fs.scandir) as scandir:
+        for i in range(100):
+            assert fs.exists(tmp_path / "d" / f"{i}.txt") == (i < 50)
+        assert fs.stat(tmp_path / "d" / "0.txt").st_size == 0
+        assert len(_names(fs, tmp_path / "d")) == 50
+
+    # Only the explicit listing reached the disk, and nothing was kept
+    assert scandir.call_count == 1
+    assert not any(root.children for root in fs.vfs._roots.values())
+
+
+def test_overlay_copies_in_only_the_directories_a_plan_changes(tmp_path):
+    (tmp_path / "d").mkdir()
+    for i in range(50):
+        (tmp_path / "d" / f"{i}.txt").touch()
+    fs = DryRunFileSystem()
+
+    with patch.object(fs._real_fs, "scandir", wraps=fs._real_fs.scandir) as scandir:
+        fs.mkdir(tmp_path / "out")
+        fs.move(tmp_path / "d" / "0.txt", tmp_path / "out" / "0.txt")
+        for i in range(100):
+            assert fs.exists(tmp_path / "d" / f"{i}.txt") == (0 < i < 50)
+        assert _names(fs, tmp_path / "out") == ["0.txt"]
+
+    # tmp_path (new "out") and d (lost 0.txt); none of their ancestors
+    assert scandir.call_count == 2
+
+
+def test_overlay_remove_and_rmdir(tmp_path):
+    (tmp_path / "d").mkdir()
+    (tmp_path / "d" / "f").touch()
+    fs = DryRunFileSystem()
+
+    with pytest.raises(OSError):
+        fs.rmdir(tmp_path / "d")
+    fs.remove(tmp_path / "d" / "f")
+    fs.rmdir(tmp_path / "d")
+
+    assert not fs.exists(tmp_path / "d")
+    assert _names(fs, tmp_path) == []
+
+
+def test_moved_directory_lists_children_at_new_location(tmp_path):
+    (tmp_path / "old" / "sub").mkdir(parents=True)
+    (tmp_path / "old" / "sub" / "f.txt").touch()
+    fs = DryRunFileSystem()
+
+    fs.move(tmp_path / "old", tmp_path / "new")
+
+    (sub,) = fs.scandir(tmp_path / "new")
+    assert sub.path == str(tmp_path / "new" / "sub")
+    (f,) = fs.scandir(tmp_path / "new" / "sub")
+    assert f.path == str(tmp_path / "new" / "sub" / "f.txt")
+
+
+def test_dry_run_cleanup_and_collisions_see_the_plan(tmp_path):
+    (tmp_path / "in").mkdir()
+    (tmp_path / "in" / "a.txt").write_text("a")
+    (tmp_path / "b").mkdir()
+    (tmp_path / "b" / "a.txt").write_text("b")
+    fs = DryRunFileSystem()
+    organizer = Organizer(fs)
+    files = [
+        FileNode(tmp_path / "in" / "a.txt", 1, 0),
+        FileNode(tmp_path / "b" / "a.txt", 1, 0),
+    ]
+
+    plan = organizer.plan_organization(files, ExtensionRule(), tmp_path)
+    organizer.execute_plan(plan)
+    organizer.cleanup_empty_dirs(tmp_path)
+
+    assert [a.dest_path.name for a in plan] == ["a.txt", "a_1.txt"]
+    assert _names(fs, tmp_path) == ["TXT"]
+    assert _names(fs, tmp_path / "TXT") == ["a.txt", "a_1.txt"]